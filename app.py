@@ -1,11 +1,33 @@
 import os
 import logging
+import time
+import threading
 import uuid
 import requests
-from flask import Flask, render_template, request, flash, redirect, url_for, session, jsonify, Response, send_from_directory
+from flask import Flask, render_template, request, flash, redirect, url_for, session, jsonify, Response, send_from_directory, send_file, stream_with_context, g, has_request_context
+from flask.json.provider import DefaultJSONProvider
 from config import ConfigManager
 from media_tracker import MediaTracker
-from models import api_key_manager, require_api_key
+from models import api_key_manager, require_api_key, require_admin, is_admin_request, require_webhook_token
+from instrumentation import upstream_stats, start_request_timing, end_request_timing, current_request_timing, timed, count_requests
+import metrics
+import profiler
+import artwork_cache
+from dashboard_snapshot import dashboard_snapshots, snapshot_file_for, REBUILD_DELAY as SNAPSHOT_REBUILD_DELAY
+from library_export import library_exports, export_dir_for
+from storage_analysis import storage_analyzer, DEFAULT_MAX_AGE as STORAGE_MAX_AGE, DEFAULT_DUPLICATES_LIMIT, MAX_DUPLICATES_LIMIT
+from dashboard_events import dashboard_events, schedule_key, item_key
+from plex_notifications import PlexNotificationListener, CONNECTED_MAX_AGE
+from search_index import search_index, MAX_PER_PAGE
+from facet_index import facet_index, FACETS, MAX_PER_PAGE as MAX_BROWSE_PER_PAGE
+from sort_index import SORT_FIELDS
+from upstream_servers import plex_server_config, find_plex_server, carry_sources, PRIMARY_PLEX, PRIMARY_SONARR
+from sources import SOURCES, source_scheduler, fetch_library, fetch_schedule
+from webhooks import EventBatcher, plex_webhook_payload, plex_webhook_changes, sonarr_webhook_changes
+import tracemalloc
+from memory_tracer import allocation_tracer, GROUPINGS
+from report_renderer import validate_formats
+from sync_history import SyncHistory, history_file_for, schedule_interval_seconds
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
 from apscheduler.triggers.interval import IntervalTrigger
@@ -16,7 +38,26 @@ from datetime import datetime
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
 
+# Longest schedule window; Sonarr answers any calendar range in one request
+MAX_SCHEDULE_DAYS = 366
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """JSON provider that times serialization and can attach a timing debug block"""
+    
+    def response(self, *args, **kwargs):
+        timing = current_request_timing()
+        if (timing is not None and has_request_context() and len(args) == 1 and not kwargs
+                and isinstance(args[0], dict) and wants_debug_timing()):
+            args = (dict(args[0], _timing=timing.to_dict()),)
+        with timed('serialize'):
+            return super().response(*args, **kwargs)
+
+def wants_debug_timing():
+    """Whether the caller asked for the timing debug block in the JSON body"""
+    return bool(request.headers.get('X-Debug-Timing') or request.args.get('debug_timing'))
+
 app = Flask(__name__)
+app.json = TimedJSONProvider(app)
 app.secret_key = os.environ.get("SESSION_SECRET", "dev-secret-key-change-in-production")
 
 # Initialize configuration manager
@@ -29,6 +70,88 @@ scheduler.start()
 # Register shutdown handler
 atexit.register(lambda: scheduler.shutdown())
 
+# Feed upstream request timings into the metrics registry
+upstream_stats.add_observer(metrics.record_upstream)
+
+# Keep the search and facet indexes in step with the cached library
+dashboard_events.add_observer(search_index.on_publish)
+dashboard_events.add_observer(facet_index.on_publish)
+
+@app.before_request
+def start_request_metrics():
+    """Track in-flight requests and start the latency timer"""
+    g.request_started = time.perf_counter()
+    metrics.http_in_flight.inc()
+
+@app.before_request
+def start_server_timing():
+    """Open the per-request timing context that MediaTracker reports into"""
+    g.request_timing, g.request_timing_token = start_request_timing()
+
+@app.after_request
+def add_server_timing(response):
+    """Expose the request's time breakdown and upstream call count"""
+    request_timing = g.get('request_timing')
+    if request_timing is not None:
+        response.headers['Server-Timing'] = request_timing.server_timing()
+    return response
+
+@app.teardown_request
+def end_server_timing(exc):
+    token = g.pop('request_timing_token', None)
+    if token is not None:
+        end_request_timing(token)
+
+@app.before_request
+def start_request_profile():
+    """Profile this request's thread when an admin sends the X-Profile header"""
+    if request.headers.get('X-Profile') and is_admin_request():
+        g.request_profiler = profiler.request_profiles.start()
+
+@app.after_request
+def finish_request_profile(response):
+    """Store a single-request profile and point the caller at it"""
+    request_profiler = g.pop('request_profiler', None)
+    if request_profiler is not None:
+        request_profiler.stop()
+        profile_id = profiler.request_profiles.store(request_profiler, f'{request.method} {request.full_path.rstrip("?")}')
+        response.headers['X-Profile-Id'] = profile_id
+    return response
+
+@app.before_request
+def start_memory_tracking():
+    """Note traced memory at the start of the request while allocation tracing is on"""
+    if tracemalloc.is_tracing():
+        g.traced_memory_before = tracemalloc.get_traced_memory()[0]
+
+@app.teardown_request
+def record_memory_growth(exc):
+    """Attribute the traced memory still held after the request to its route.
+    Concurrent requests blur the numbers; compare routes under a steady load."""
+    before = g.pop('traced_memory_before', None)
+    if before is None or not tracemalloc.is_tracing():
+        return
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    allocation_tracer.record_request(route, tracemalloc.get_traced_memory()[0] - before)
+
+@app.after_request
+def capture_response_status(response):
+    """Remember the status code for the teardown metrics hook"""
+    g.response_status = response.status_code
+    return response
+
+@app.teardown_request
+def record_request_metrics(exc):
+    """Record request count and latency per route, including failed requests"""
+    started = g.pop('request_started', None)
+    if started is None:
+        return
+    metrics.http_in_flight.dec()
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    status = g.pop('response_status', 500)
+    metrics.http_requests.inc(1, route, request.method, str(status))
+    metrics.http_duration.observe(time.perf_counter() - started, route)
+
 # Initialize scheduler on startup
 def init_scheduler():
     """Initialize scheduler with current configuration on app startup"""
@@ -36,11 +159,17 @@ def init_scheduler():
         update_scheduler()
     except Exception as e:
         logging.error(f"Error initializing scheduler: {e}")
+    try:
+        update_plex_listener()
+    except Exception as e:
+        logging.error(f"Error starting Plex notification listener: {e}")
 
 # Initialize scheduler after all functions are defined
 
 def scheduled_sync():
     """Function to run scheduled daily sync"""
+    started = time.perf_counter()
+    success = False
     try:
         logging.info("Running scheduled daily sync...")
         config = config_manager.get_config()
@@ -48,11 +177,15 @@ def scheduled_sync():
         results = tracker.run_daily_sync()
         
         if results['success']:
+            success = True
             logging.info(f"Scheduled sync completed! Found {results['movies_count']} movies and {results['shows_count']} TV shows.")
+            build_dashboard_snapshot(config)
         else:
             logging.error(f"Scheduled sync failed: {results['error']}")
     except Exception as e:
         logging.error(f"Error in scheduled sync: {str(e)}")
+    finally:
+        metrics.record_job('media_sync', time.perf_counter() - started, success)
 
 def update_scheduler():
     """Update scheduler based on current configuration"""
@@ -103,6 +236,44 @@ def update_scheduler():
                 replace_existing=True
             )
             logging.info(f"Scheduled sync every {interval_hours} hour(s) at the top of the hour (Eastern)")
+            
+        elif schedule_type == 'interval':
+            # Fixed interval in seconds, used by soak tests to compress days of scheduling into hours
+            interval_seconds = int(config.get('interval_seconds', 3600))
+            
+            scheduler.add_job(
+                func=scheduled_sync,
+                trigger=IntervalTrigger(seconds=interval_seconds, timezone=eastern),
+                id='media_sync',
+                name=f'Interval Media Sync (every {interval_seconds}s)',
+                replace_existing=True
+            )
+            logging.info(f"Scheduled sync every {interval_seconds} second(s)")
+    
+    # Nightly library export for bulk consumers
+    try:
+        scheduler.remove_job('library_export')
+    except:
+        pass
+    if config.get('library_export_enabled', False):
+        export_hour = int(config.get('library_export_hour', 3))
+        scheduler.add_job(
+            func=run_library_export,
+            trigger=CronTrigger(hour=export_hour, minute=0, timezone=eastern),
+            id='library_export',
+            name='Nightly Library Export',
+            replace_existing=True
+        )
+        logging.info(f"Scheduled library export for {export_hour:02d}:00 Eastern")
+    
+    # Server-side refresh for live dashboards; a no-op while none are connected
+    scheduler.add_job(
+        func=refresh_dashboard_data,
+        trigger=IntervalTrigger(seconds=int(config.get('dashboard_refresh_seconds', 300)), timezone=eastern),
+        id='dashboard_refresh',
+        name='Live Dashboard Refresh',
+        replace_existing=True
+    )
 
 @app.route('/')
 def index():
@@ -153,6 +324,13 @@ def save_config():
             'dashboard_max_items': int(request.form.get('dashboard_max_items', 100))  # Default to 100 items
         }
         
+        # Reject report formats that would fail while writing the report
+        format_errors = validate_formats(config_data)
+        if format_errors:
+            for error in format_errors:
+                flash(f'Invalid output format - {error}', 'error')
+            return redirect(url_for('index'))
+        
         # Load existing config and merge with new data (allows partial updates)
         existing_config = config_manager.get_config()
         
@@ -175,8 +353,9 @@ def save_config():
         # Save configuration
         config_manager.save_config(existing_config)
         
-        # Update scheduler with new settings
+        # Update scheduler and Plex listener with new settings
         update_scheduler()
+        update_plex_listener()
         
         flash('Configuration saved successfully!', 'success')
         
@@ -306,9 +485,11 @@ def run_daily_sync():
         results = tracker.run_daily_sync()
         
         if results['success']:
+            refresh_dashboard_snapshot()
             return jsonify({
                 'success': True,
-                'message': f"Daily sync completed! Found {results['movies_count']} movies, {results['shows_count']} TV shows, and {results['scheduled_count']} scheduled episodes."
+                'message': f"Daily sync completed in {results['duration']:.1f}s! Found {results['movies_count']} movies, {results['shows_count']} TV shows, and {results['scheduled_count']} scheduled episodes.",
+                'timings': results['timings']
             })
         else:
             return jsonify({
@@ -419,31 +600,71 @@ def api_status():
     if scheduler.get_jobs():
         next_job = scheduler.get_jobs()[0]
         status['scheduler']['next_run'] = next_job.next_run_time.isoformat() if next_job.next_run_time else None
-    
+
     return jsonify(status)
 
+@app.route('/api/sources')
+@require_api_key
+def api_sources():
+    """Registered media sources with their settings and count-only stats, fetched from every active source at once"""
+    config = config_manager.get_config()
+
+    try:
+        runs = source_scheduler.run(config, 'stats')
+        sources = {}
+        for name, source in SOURCES.items():
+            run = runs.get(name) or {}
+            sources[name] = {
+                'fields': list(source.fields),
+                'configured': source.configured(config),
+                'settings': source.settings_for(config),
+                'servers': [server['name'] for server in source.servers(config)],
+                'stats': run.get('result'),
+                'status': run.get('status'),
+                'error': run.get('error'),
+                'seconds': run.get('seconds')
+            }
+        return jsonify({'success': True, 'sources': sources})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
 @app.route('/api/recent')
 @require_api_key
 def api_recent():
-    """Get recent movies and TV shows with detailed information"""
+    """Get movies and TV shows added within a time window, newest first, with detailed information"""
     config = config_manager.get_config()
-    tracker = MediaTracker(config)
+    timezone = pytz.timezone(config.get('timezone', 'US/Eastern'))
     
     try:
-        # Get days parameter, default to 7
-        days = request.args.get('days', 7, type=int)
-        if days < 1 or days > 30:
-            days = 7
+        since = _time_arg('since', timezone)
+        until = _time_arg('until', timezone)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    try:
+        # Without since, the window is the last `days` days, default 7
+        days = None
+        if since is None:
+            days = request.args.get('days', 7, type=int)
+            if days < 1:
+                days = 7
+            since = int(time.time()) - days * 86400
+        limit = request.args.get('limit', type=int)
         
-        movies, tv_shows = tracker.get_plex_recent_content_extended(days=days)
+        # Builds the index from the cached library the first time
+        _library_data(config)
+        recent = facet_index.added_between(since, until, limit)
         return jsonify({
             'success': True,
             'days': days,
-            'movies': movies,
-            'tv_shows': tv_shows,
-            'movies_count': len(movies),
-            'tv_shows_count': len(tv_shows),
-            'timestamp': datetime.now(pytz.timezone(config.get('timezone', 'US/Eastern'))).isoformat()
+            'since': since,
+            'until': until,
+            'total': recent['total'],
+            'movies': recent['movies'],
+            'tv_shows': recent['tv_shows'],
+            'movies_count': len(recent['movies']),
+            'tv_shows_count': len(recent['tv_shows']),
+            'timestamp': datetime.now(timezone).isoformat()
         })
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
@@ -451,42 +672,200 @@ def api_recent():
 @app.route('/api/all_content')
 @require_api_key
 def api_all_content():
-    """Get all movies and TV shows from Plex library"""
+    """Get all movies and TV shows from the Plex libraries, merged across servers"""
     config = config_manager.get_config()
-    tracker = MediaTracker(config)
     
     try:
-        movies, tv_shows = tracker.get_plex_all_content()
+        movies, tv_shows, servers = fetch_library(config)
         return jsonify({
             'success': True,
             'movies': movies,
             'tv_shows': tv_shows,
             'movies_count': len(movies),
             'tv_shows_count': len(tv_shows),
+            'servers': servers,
+            'timestamp': datetime.now(pytz.timezone(config.get('timezone', 'US/Eastern'))).isoformat()
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+@app.route('/api/search')
+@require_api_key
+def api_search():
+    """Search movies and TV shows by title, cast, crew, genre, studio and summary"""
+    config = config_manager.get_config()
+    
+    try:
+        query = request.args.get('q', '').strip()
+        if not query:
+            return jsonify({'success': False, 'error': 'Missing search query (q)'}), 400
+        item_type = request.args.get('type')
+        if item_type not in (None, 'movie', 'show'):
+            return jsonify({'success': False, 'error': 'type must be movie or show'}), 400
+        page = max(1, request.args.get('page', 1, type=int))
+        per_page = max(1, min(request.args.get('per_page', 20, type=int), MAX_PER_PAGE))
+        
+        # Builds the index from the cached library the first time
+        _library_data(config)
+        started = time.perf_counter()
+        with timed('search'):
+            found = search_index.search(query, item_type=item_type, page=page, per_page=per_page)
+        return jsonify({
+            'success': True,
+            'query': query,
+            'type': item_type,
+            'page': page,
+            'per_page': per_page,
+            'total': found['total'],
+            'results': found['results'],
+            'took_ms': round((time.perf_counter() - started) * 1000, 2),
             'timestamp': datetime.now(pytz.timezone(config.get('timezone', 'US/Eastern'))).isoformat()
         })
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
+@app.route('/api/browse')
+@require_api_key
+def api_browse():
+    """Filter and sort movies and TV shows by genre, year, content rating, studio, network and type, with facet counts"""
+    config = config_manager.get_config()
+    
+    try:
+        # Repeated values of one facet match any of them (or all with <facet>_match=all);
+        # different facets must all match
+        filters = {}
+        for facet in FACETS:
+            values = [value for value in request.args.getlist(facet) if value.strip()]
+            if values:
+                filters[facet] = (values, request.args.get(f'{facet}_match', 'any') == 'all')
+        # min_<field>/max_<field> bound sortable fields, e.g. min_year=1990&max_year=1999
+        ranges = {}
+        for field in SORT_FIELDS:
+            low = request.args.get(f'min_{field}', type=float)
+            high = request.args.get(f'max_{field}', type=float)
+            if low is not None or high is not None:
+                ranges[field] = (low, high)
+        sort = request.args.get('sort')
+        if sort is not None and sort not in SORT_FIELDS:
+            return jsonify({'success': False, 'error': f"sort must be one of {', '.join(SORT_FIELDS)}"}), 400
+        order = request.args.get('order', 'desc')
+        if order not in ('asc', 'desc'):
+            return jsonify({'success': False, 'error': 'order must be asc or desc'}), 400
+        page = max(1, request.args.get('page', 1, type=int))
+        # limit is the top-k form of per_page
+        per_page = request.args.get('limit', request.args.get('per_page', 50, type=int), type=int)
+        per_page = max(1, min(per_page, MAX_BROWSE_PER_PAGE))
+        facet_limit = max(0, request.args.get('facet_limit', 50, type=int))
+        
+        # Builds the index from the cached library the first time
+        _library_data(config)
+        started = time.perf_counter()
+        with timed('search'):
+            found = facet_index.query(filters, ranges=ranges, sort=sort, descending=(order == 'desc'),
+                                      page=page, per_page=per_page, facet_limit=facet_limit)
+        return jsonify({
+            'success': True,
+            'filters': {facet: {'values': values, 'match': 'all' if match_all else 'any'}
+                        for facet, (values, match_all) in filters.items()},
+            'ranges': {field: {'min': low, 'max': high} for field, (low, high) in ranges.items()},
+            'sort': sort,
+            'order': order,
+            'page': page,
+            'per_page': per_page,
+            'total': found['total'],
+            'results': found['results'],
+            'facets': found['facets'],
+            'took_ms': round((time.perf_counter() - started) * 1000, 2),
+            'timestamp': datetime.now(pytz.timezone(config.get('timezone', 'US/Eastern'))).isoformat()
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+@app.route('/api/export')
+@require_api_key
+def api_export():
+    """Manifest of the latest library export, with a download URL per file"""
+    config = config_manager.get_config()
+    manifest = library_exports.load(export_dir_for(config))
+    running = library_exports.build_lock.locked()
+    if manifest is None:
+        return jsonify({'success': False, 'error': 'No library export yet', 'running': running}), 404
+    files = {name: dict(entry, url=url_for('api_export_file', name=name)) for name, entry in manifest['files'].items()}
+    return jsonify(dict(manifest, success=True, running=running, files=files))
+
+@app.route('/api/export', methods=['POST'])
+@require_admin
+def api_export_start():
+    """Start a library export in the background"""
+    if library_exports.build_lock.locked():
+        return jsonify({'success': False, 'error': 'Library export already running'}), 409
+    threading.Thread(target=run_library_export, name='library-export', daemon=True).start()
+    return jsonify({'success': True, 'status': url_for('api_export')}), 202
+
+@app.route('/api/storage')
+@require_api_key
+def api_storage():
+    """Disk use per library, codec, resolution, container and year, and titles stored more than once"""
+    config = config_manager.get_config()
+    server = find_plex_server(config, request.args.get('server', PRIMARY_PLEX))
+    if server is None:
+        return jsonify({'success': False, 'error': 'Unknown Plex server'}), 404
+    refresh = request.args.get('refresh', '').lower() in ('1', 'true', 'yes')
+    if refresh and not is_admin_request():
+        return jsonify({'success': False, 'error': 'refresh requires the admin token'}), 403
+    limit = max(0, min(request.args.get('duplicates', DEFAULT_DUPLICATES_LIMIT, type=int), MAX_DUPLICATES_LIMIT))
+    
+    try:
+        max_age = None if refresh else config.get('storage_analysis_max_age', STORAGE_MAX_AGE)
+        report = storage_analyzer.latest(server['name'], max_age) if max_age is not None else None
+        if report is None:
+            report = run_storage_analysis(config, server, max_age)
+        duplicates = dict(report['duplicates'], titles=report['duplicates']['titles'][:limit])
+        return jsonify(dict(report, success=True, duplicates=duplicates))
+    except Exception as e:
+        logging.error(f"Error analyzing storage: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)})
+
+@app.route('/api/export/<name>')
+@require_api_key
+def api_export_file(name):
+    """One export file as a static download: conditional on its checksum, with byte ranges
+    so large downloads can resume"""
+    config = config_manager.get_config()
+    directory = export_dir_for(config)
+    manifest = library_exports.load(directory)
+    # Only files listed in the manifest are served, so the name never reaches the filesystem unchecked
+    entry = manifest['files'].get(name) if manifest else None
+    if entry is None:
+        return jsonify({'success': False, 'error': f'Unknown export file: {name}'}), 404
+    try:
+        response = send_file(os.path.join(directory, name), mimetype='application/gzip', conditional=True,
+                             etag=entry['sha256'], max_age=0, as_attachment=True, download_name=name)
+    except FileNotFoundError:
+        return jsonify({'success': False, 'error': f'Export file missing: {name}'}), 404
+    response.headers['X-Export-Generated'] = manifest['generated_at']
+    response.headers['X-Export-Records'] = str(entry['records'])
+    return response
+
 @app.route('/api/schedule')
 @require_api_key
 def api_schedule():
-    """Get TV schedule with detailed information"""
+    """Get TV schedule with detailed information, merged across Sonarr instances"""
     config = config_manager.get_config()
-    tracker = MediaTracker(config)
     
     try:
         # Get days parameter, default to 7
         days = request.args.get('days', 7, type=int)
-        if days < 1 or days > 30:
+        if days < 1 or days > MAX_SCHEDULE_DAYS:
             days = 7
         
-        scheduled_shows = tracker.get_sonarr_calendar_extended(days=days)
+        scheduled_shows, servers = fetch_schedule(config, days)
         return jsonify({
             'success': True,
             'days': days,
             'scheduled_shows': scheduled_shows,
             'scheduled_count': len(scheduled_shows),
+            'servers': servers,
             'timestamp': datetime.now(pytz.timezone(config.get('timezone', 'US/Eastern'))).isoformat()
         })
     except Exception as e:
@@ -497,16 +876,16 @@ def api_schedule():
 def api_full_sync():
     """Get all data in one call - recent content and schedule"""
     config = config_manager.get_config()
-    tracker = MediaTracker(config)
+    tracker = MediaTracker(config, library_max_age=library_cache_max_age(config))
     
     try:
         # Get days parameter, default to 7
         days = request.args.get('days', 7, type=int)
-        if days < 1 or days > 30:
+        if days < 1 or days > MAX_SCHEDULE_DAYS:
             days = 7
         
         movies, tv_shows = tracker.get_plex_recent_content_extended(days=days)
-        scheduled_shows = tracker.get_sonarr_calendar_extended(days=days)
+        scheduled_shows, _ = fetch_schedule(config, days)
         
         # Get library stats
         library_stats = tracker.get_plex_library_stats()
@@ -580,37 +959,475 @@ def dashboard():
     """Sample dashboard that demonstrates API usage"""
     return render_template('dashboard.html')
 
+def _status_data(config, tracker):
+    """Connection status shown on the dashboard. Every active source is health-checked at
+    once; a source that times out shows its servers as not connected."""
+    sources = {}
+    for name, run in source_scheduler.run(config, 'health_check').items():
+        servers = run['result'] or {server['name']: False for server in SOURCES[name].servers(config)}
+        sources[name] = {
+            'configured': bool(servers),
+            'connected': bool(servers) and all(servers.values()),
+            'servers': servers,
+            'error': run['error']
+        }
+    github_connected = tracker.test_github_connection()
+    not_configured = {'configured': False, 'connected': False, 'servers': {}, 'error': None}
+    
+    return {
+        'plex': sources.get('plex', not_configured),
+        'sonarr': sources.get('sonarr', not_configured),
+        'sources': sources,
+        'github': {
+            'configured': bool(config.get('github_token') and config.get('github_repo')),
+            'connected': github_connected
+        },
+        'scheduler': {
+            'enabled': config.get('scheduler_enabled', False),
+            'type': config.get('schedule_type', 'daily'),
+            'next_run': None
+        }
+    }
+
+def _all_content_data(config):
+    """All Plex movies and TV shows for the dashboard, merged across the configured Plex
+    servers, empty when Plex is unreachable"""
+    # Try to get content, but handle connection gracefully
+    movies = []
+    tv_shows = []
+    servers = {}
+    
+    try:
+        movies, tv_shows, servers = fetch_library(config)
+        
+        # Add debug logging
+        logging.info(f"Retrieved {len(movies)} movies and {len(tv_shows)} TV shows from {len(servers)} Plex server(s)")
+        if movies:
+            logging.info(f"Sample movie: {movies[0]}")
+        if tv_shows:
+            logging.info(f"Sample TV show: {tv_shows[0]}")
+        
+    except Exception as e:
+        logging.error(f"Dashboard Plex connection error: {str(e)}")
+        # Return empty but valid data structure
+        movies = []
+        tv_shows = []
+        
+    return {
+        'success': True,
+        'movies': movies,
+        'tv_shows': tv_shows,
+        'movies_count': len(movies),
+        'tv_shows_count': len(tv_shows),
+        'servers': servers,
+        'timestamp': datetime.now(pytz.timezone(config.get('timezone', 'US/Eastern'))).isoformat()
+    }
+
+def _schedule_data(config, days):
+    """Upcoming episodes for the dashboard schedule, merged across the configured Sonarr instances"""
+    scheduled_shows, servers = fetch_schedule(config, days)
+    return {
+        'success': True,
+        'days': days,
+        'scheduled_shows': scheduled_shows,
+        'count': len(scheduled_shows),
+        'servers': servers,
+        'timestamp': datetime.now(pytz.timezone(config.get('timezone', 'US/Eastern'))).isoformat()
+    }
+
+def _publish_dashboard_data(section, build, require_success=True):
+    """Build a dashboard data section and push any changes to live dashboards.
+    Data fetched while an upstream call failed may be partial, so it is returned but not published."""
+    with count_requests() as counter:
+        data = build()
+    if data.get('success', True) and not (require_success and counter.errors):
+        data['version'] = dashboard_events.event_id(dashboard_events.publish(section, data))
+    else:
+        data['version'] = dashboard_events.event_id()
+    return data
+
+def _library_stats_data(config, tracker):
+    """Library totals for the dashboard stats cards"""
+    # Use the same successful inline approach
+    movies = []
+    tv_shows = []
+    
+    if config.get('plex_url') and config.get('plex_token'):
+        try:
+            from urllib.parse import urljoin
+            import xml.etree.ElementTree as ET
+            
+            # Use the tracker's instrumented session so these calls are counted too; Accept is
+            # sent per request so the shared session's headers are left as they are
+            session = tracker.session
+            
+            url = urljoin(config['plex_url'], '/library/sections')
+            headers = {'X-Plex-Token': config['plex_token'], 'Accept': 'application/xml'}
+            
+            response = session.get(url, headers=headers, timeout=30)
+            response.raise_for_status()
+            
+            root = ET.fromstring(response.content)
+            
+            for library in root.findall('.//Directory'):
+                library_key = library.get('key')
+                library_type = library.get('type')
+                
+                if library_type in ['movie', 'show']:
+                    all_url = urljoin(config['plex_url'], f'/library/sections/{library_key}/all')
+                    all_response = session.get(all_url, headers=headers)
+                    all_response.raise_for_status()
+                    
+                    all_root = ET.fromstring(all_response.content)
+                    
+                    if library_type == 'movie':
+                        movies.extend(all_root.findall('.//Video'))
+                    elif library_type == 'show':
+                        # A show section lists its shows as Directory elements, not Video
+                        tv_shows.extend(d for d in all_root.findall('.//Directory') if d.get('type') == 'show')
+        except Exception as e:
+            logging.error(f"Error getting Plex stats: {str(e)}")
+    
+    stats = {
+        'total_movies': len(movies),
+        'total_shows': len(tv_shows)
+    }
+    return {
+        'success': True,
+        'stats': stats,
+        'timestamp': datetime.now(pytz.timezone(config.get('timezone', 'US/Eastern'))).isoformat()
+    }
+
+def build_dashboard_snapshot(config=None):
+    """Render the dashboard with all of its data inlined and store it for static serving.
+    Returns False without doing anything when another build is already running."""
+    if not dashboard_snapshots.build_lock.acquire(blocking=False):
+        logging.info("Dashboard snapshot build already running, skipping")
+        return False
+    started = time.perf_counter()
+    success = False
+    # The build's own publishes must not schedule another rebuild
+    _snapshot_build.active = True
+    try:
+        config = config or config_manager.get_config()
+        tracker = MediaTracker(config)
+        all_content = _library_data(config)
+        try:
+            schedule = _publish_dashboard_data('schedule', lambda: _schedule_data(config, 7))
+        except Exception as e:
+            logging.error(f"Dashboard snapshot schedule error: {str(e)}")
+            schedule = {'success': False, 'error': str(e)}
+        generated_at = datetime.now(pytz.timezone(config.get('timezone', 'US/Eastern'))).isoformat()
+        snapshot = {
+            'generated_at': generated_at,
+            'status': _publish_dashboard_data('status', lambda: _status_data(config, tracker), require_success=False),
+            'all_content': all_content,
+            'schedule': schedule,
+            'library_stats': {
+                'success': True,
+                'stats': {
+                    'total_movies': all_content['movies_count'],
+                    'total_shows': all_content['tv_shows_count']
+                },
+                'timestamp': generated_at
+            }
+        }
+        with app.app_context():
+            html = render_template('dashboard.html', snapshot=snapshot)
+        meta = dashboard_snapshots.save(snapshot_file_for(config), html, generated_at,
+                                        build_seconds=round(time.perf_counter() - started, 3))
+        logging.info(f"Dashboard snapshot written ({meta['bytes']} bytes, {meta['gzip_bytes']} gzipped)")
+        success = True
+        return True
+    except Exception as e:
+        logging.error(f"Error building dashboard snapshot: {str(e)}")
+        return False
+    finally:
+        _snapshot_build.active = False
+        dashboard_snapshots.build_lock.release()
+        metrics.record_job('dashboard_snapshot', time.perf_counter() - started, success)
+
+def run_library_export(config=None):
+    """Write the cached library (and optionally every episode) to the export directory as gzip
+    NDJSON and CSV with a manifest. Returns the manifest, or None when the export failed or
+    another one is already running."""
+    if not library_exports.build_lock.acquire(blocking=False):
+        logging.info("Library export already running, skipping")
+        return None
+    started = time.perf_counter()
+    success = False
+    try:
+        config = config or config_manager.get_config()
+        library = _library_data(config)
+        if not library.get('success', True):
+            raise RuntimeError(library.get('error') or 'Library unavailable')
+        records = {'movies': library.get('movies', []), 'tv_shows': library.get('tv_shows', [])}
+        if config.get('library_export_episodes', False):
+            records['episodes'] = MediaTracker(config).iter_plex_episodes()
+        generated_at = datetime.now(pytz.timezone(config.get('timezone', 'US/Eastern'))).isoformat()
+        manifest = library_exports.export(export_dir_for(config), records, generated_at)
+        counts = ', '.join(f"{entry['records']} {entry['kind']}" for entry in manifest['files'].values()
+                           if entry['format'] == 'ndjson')
+        logging.info(f"Library export written ({counts})")
+        success = True
+        return manifest
+    except Exception as e:
+        logging.error(f"Error exporting library: {str(e)}")
+        return None
+    finally:
+        library_exports.build_lock.release()
+        metrics.record_job('library_export', time.perf_counter() - started, success)
+
+def run_storage_analysis(config, server, max_age=None):
+    """Storage report of one Plex server from its streamed section listings. Waits for an
+    analysis already running, and returns its report when that is at most max_age seconds old."""
+    with storage_analyzer.build_lock:
+        if max_age is not None:
+            report = storage_analyzer.latest(server['name'], max_age)
+            if report is not None:
+                return report
+        started = time.perf_counter()
+        success = False
+        try:
+            tracker = MediaTracker(plex_server_config(config, server))
+            report = storage_analyzer.analyze(server['name'], tracker.iter_plex_media())
+            logging.info(f"Storage analysis of {server['name']}: {report['totals']['items']} items, "
+                         f"{report['totals']['bytes']} bytes, {report['duplicates']['groups']} duplicated titles")
+            success = True
+            return report
+        finally:
+            metrics.record_job('storage_analysis', time.perf_counter() - started, success)
+
+def refresh_dashboard_data():
+    """Re-fetch dashboard data for connected live dashboards, which then receive only the changes.
+    One server-side refresh replaces every open dashboard polling on its own."""
+    if not dashboard_events.subscribers:
+        return
+    started = time.perf_counter()
+    success = False
+    try:
+        config = config_manager.get_config()
+        tracker = MediaTracker(config)
+        _publish_dashboard_data('status', lambda: _status_data(config, tracker), require_success=False)
+        # Skip the full library sweep while Plex notifications keep the cached copy current
+        if dashboard_events.cached('all_content', library_cache_max_age(config)) is None:
+            _publish_dashboard_data('all_content', lambda: _all_content_data(config))
+        _publish_dashboard_data('schedule', lambda: _schedule_data(config, 7))
+        _publish_dashboard_data('library_stats', lambda: _library_stats_data(config, tracker))
+        success = True
+    except Exception as e:
+        logging.error(f"Error refreshing dashboard data: {str(e)}")
+    finally:
+        metrics.record_job('dashboard_refresh', time.perf_counter() - started, success)
+
+# Plex notification listener, running while plex_notifications_enabled is set
+plex_listener = None
+
+def library_cache_max_age(config):
+    """Seconds cached library data stays servable; much longer while Plex events keep it current"""
+    max_age = int(config.get('library_cache_seconds', 60))
+    if plex_listener is not None and plex_listener.connected:
+        max_age = max(max_age, CONNECTED_MAX_AGE)
+    return max_age
+
+def refresh_library_cache():
+    """Full library sweep into the cache, used while the notification socket is down"""
+    config = config_manager.get_config()
+    _publish_dashboard_data('all_content', lambda: _all_content_data(config))
+
+def _on_plex_item_changed(rating_key, kind):
+    """Refresh one movie or show (seasons and episodes resolve to their show) in the cached library"""
+    tracker = MediaTracker(config_manager.get_config())
+    result = tracker.get_plex_item(rating_key)
+    if result is None:
+        if kind in ('movie', 'show'):
+            _on_plex_item_removed(rating_key, kind, None)
+        return
+    item_type, item = result
+    field = 'movies' if item_type == 'movie' else 'tv_shows'
+    # Notifications come from the primary server; the item keeps its other servers' provenance
+    previous = _cached_list_item('all_content', field, item_key(item), item_key)
+    item = carry_sources(item, previous, {'server': PRIMARY_PLEX, 'plex_key': item.get('plex_key', '')})
+    if dashboard_events.update_item('all_content', field, item):
+        logging.info(f"Refreshed {item_type} {item['title']} from Plex notification")
+
+def _cached_list_item(section, field, key, key_func):
+    """The published item with the given key in a section's list, or None"""
+    data = dashboard_events.state.get(section) or {}
+    return next((item for item in data.get(field, []) if key_func(item) == key), None)
+
+def _on_plex_item_removed(rating_key, kind, parent_key):
+    """Drop a deleted movie or show from the cached library; a deleted season or episode refreshes its show"""
+    if kind in ('season', 'episode'):
+        if parent_key:
+            _on_plex_item_changed(parent_key, 'season')
+        return
+    field = 'movies' if kind == 'movie' else 'tv_shows'
+    plex_key = f'/library/metadata/{rating_key}' + ('/children' if kind == 'show' else '')
+    dashboard_events.update_item('all_content', field, remove_key=plex_key)
+
+def _time_arg(name, timezone):
+    """Epoch seconds from a query parameter given as epoch seconds or an ISO date or datetime
+    (in the configured timezone unless it carries an offset); None when absent"""
+    value = request.args.get(name, '').strip()
+    if not value:
+        return None
+    try:
+        return int(float(value))
+    except ValueError:
+        pass
+    try:
+        moment = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"{name} must be epoch seconds or an ISO date, e.g. 2024-01-31")
+    if moment.tzinfo is None:
+        moment = timezone.localize(moment)
+    return int(moment.timestamp())
+
+def _library_data(config):
+    """The cached library (all_content) while it is fresh, otherwise fetched and published"""
+    data = dashboard_events.cached('all_content', library_cache_max_age(config))
+    metrics.record_cache('library', data is not None)
+    if data is None:
+        data = _publish_dashboard_data('all_content', lambda: _all_content_data(config))
+    return data
+
+def update_plex_listener():
+    """Start, restart or stop the Plex notification listener to match the configuration"""
+    global plex_listener
+    config = config_manager.get_config()
+    plex_url = config.get('plex_url', '').strip()
+    plex_token = config.get('plex_token', '').strip()
+    enabled = bool(config.get('plex_notifications_enabled', False) and plex_url and plex_token)
+    
+    if plex_listener is not None:
+        if enabled and plex_listener.settings == (plex_url, plex_token):
+            return
+        plex_listener.stop()
+        plex_listener = None
+        logging.info("Stopped Plex notification listener")
+    
+    if enabled:
+        plex_listener = PlexNotificationListener(
+            plex_url, plex_token,
+            on_changed=_on_plex_item_changed,
+            on_removed=_on_plex_item_removed,
+            poll=refresh_library_cache,
+            poll_interval=int(config.get('plex_poll_seconds', 300))
+        ).start()
+        logging.info("Started Plex notification listener")
+
+def _apply_plex_webhook_changes(changes):
+    """Refresh each changed movie or show once, however many of its episodes were reported"""
+    for rating_key, kind in changes.items():
+        _on_plex_item_changed(rating_key, kind)
+
+def _apply_sonarr_webhook_changes(changes):
+    """Patch the cached schedule: re-fetch changed episodes in one request, drop deleted series,
+    and re-read the calendar once if a series was added or renamed"""
+    schedule = dashboard_events.state.get('schedule')
+    if schedule is None:
+        return
+    config = config_manager.get_config()
+    tracker = MediaTracker(config)
+    series_changes = {series_id: change for (kind, series_id), change in changes.items() if kind == 'series'}
+    if 'changed' in series_changes.values():
+        _publish_dashboard_data('schedule', lambda: _schedule_data(config, schedule.get('days', 7)))
+        return
+    
+    # Webhooks come from the primary Sonarr, whose IDs are those of items it listed first;
+    # other instances' changes arrive with the next schedule refresh
+    scheduled = {item.get('episode_id'): item for item in schedule.get('scheduled_shows', [])
+                 if item.get('sources', [{}])[0].get('server', PRIMARY_SONARR) == PRIMARY_SONARR}
+    # Only episodes already in the schedule window can change it
+    episode_ids = [episode_id for kind, episode_id in changes if kind == 'episode' and episode_id in scheduled]
+    items = tracker.get_sonarr_episodes(episode_ids) if episode_ids else []
+    items = [carry_sources(item, scheduled.get(item.get('episode_id')),
+                           {'server': PRIMARY_SONARR, 'episode_id': item.get('episode_id'), 'series_id': item.get('series_id')})
+             for item in items]
+    remove_keys = [schedule_key(item) for item in scheduled.values() if item.get('series_id') in series_changes]
+    if items or remove_keys:
+        dashboard_events.update_items('schedule', 'scheduled_shows', items, remove_keys)
+
+# Webhook changes are applied in batches after a burst settles
+plex_webhooks = EventBatcher('plex', _apply_plex_webhook_changes)
+sonarr_webhooks = EventBatcher('sonarr', _apply_sonarr_webhook_changes)
+
+def refresh_dashboard_snapshot():
+    """Rebuild the dashboard snapshot in the background"""
+    threading.Thread(target=build_dashboard_snapshot, name='dashboard-snapshot', daemon=True).start()
+
+# Set on the thread running build_dashboard_snapshot
+_snapshot_build = threading.local()
+
+def _rebuild_dashboard_snapshot():
+    """Debounced rebuild of a stored snapshot; retried later while another build holds the lock"""
+    config = config_manager.get_config()
+    if dashboard_snapshots.load(snapshot_file_for(config)) is None:
+        return
+    if not build_dashboard_snapshot(config) and dashboard_snapshots.build_lock.locked():
+        dashboard_snapshots.schedule_rebuild(_rebuild_dashboard_snapshot, SNAPSHOT_REBUILD_DELAY)
+
+def _on_dashboard_data_changed(section, data, delta):
+    """Keep a stored snapshot in step with the library and schedule it inlines, whichever path
+    changed the cache: refreshes, Plex notifications or webhook batches. Fetch timings in the
+    per-server summaries alone do not count as a change."""
+    if section not in ('all_content', 'schedule') or getattr(_snapshot_build, 'active', False):
+        return
+    if isinstance(delta, dict) and not set(delta) - {'servers'}:
+        return
+    dashboard_snapshots.schedule_rebuild(_rebuild_dashboard_snapshot, SNAPSHOT_REBUILD_DELAY)
+
+dashboard_events.add_observer(_on_dashboard_data_changed)
+
 # Internal dashboard endpoints (no API key required)
+@app.route('/internal/events')
+def internal_events():
+    """Server-Sent Events stream of dashboard data changes"""
+    config = config_manager.get_config()
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    stream = dashboard_events.stream(last_event_id, max_seconds=int(config.get('event_stream_max_seconds', 300)))
+    response = Response(stream_with_context(stream), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Stop reverse proxies from buffering the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/webhooks/plex', methods=['POST'])
+@require_webhook_token
+def plex_webhook():
+    """Receive Plex library webhooks and queue the affected items for a refresh"""
+    try:
+        payload = plex_webhook_payload(request)
+        metrics.webhook_events.inc(1, 'plex', payload.get('event') or 'unknown')
+        changes = plex_webhook_changes(payload)
+        pending = plex_webhooks.add(changes)
+        return jsonify({'success': True, 'queued': len(changes), 'pending': pending})
+    except Exception as e:
+        logging.error(f"Plex webhook error: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+@app.route('/webhooks/sonarr', methods=['POST'])
+@require_webhook_token
+def sonarr_webhook():
+    """Receive Sonarr webhooks and queue the affected episodes and series for a schedule update"""
+    try:
+        payload = request.get_json(force=True)
+        metrics.webhook_events.inc(1, 'sonarr', payload.get('eventType') or 'unknown')
+        changes = sonarr_webhook_changes(payload)
+        pending = sonarr_webhooks.add(changes)
+        return jsonify({'success': True, 'queued': len(changes), 'pending': pending})
+    except Exception as e:
+        logging.error(f"Sonarr webhook error: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 400
+
 @app.route('/internal/status')
 def internal_status():
     """Internal status endpoint for dashboard"""
     try:
         config = config_manager.get_config()
         tracker = MediaTracker(config)
-        
-        plex_connected = tracker.test_plex_connection()
-        sonarr_connected = tracker.test_sonarr_connection()
-        github_connected = tracker.test_github_connection()
-        
-        return jsonify({
-            'plex': {
-                'configured': bool(config.get('plex_url') and config.get('plex_token')),
-                'connected': plex_connected
-            },
-            'sonarr': {
-                'configured': bool(config.get('sonarr_url') and config.get('sonarr_api_key')),
-                'connected': sonarr_connected
-            },
-            'github': {
-                'configured': bool(config.get('github_token') and config.get('github_repo')),
-                'connected': github_connected
-            },
-            'scheduler': {
-                'enabled': config.get('scheduler_enabled', False),
-                'type': config.get('schedule_type', 'daily'),
-                'next_run': None
-            }
-        })
+        return jsonify(_publish_dashboard_data('status', lambda: _status_data(config, tracker), require_success=False))
     except Exception as e:
         return jsonify({'error': str(e)})
 
@@ -619,43 +1436,9 @@ def internal_all_content():
     """Internal endpoint to get all Plex content for dashboard"""
     try:
         config = config_manager.get_config()
-        tracker = MediaTracker(config)
-        
-        # Try to get content, but handle connection gracefully
-        movies = []
-        tv_shows = []
-        
-        try:
-            # Use get_plex_all_content to get all movies and TV shows
-            movies, tv_shows = tracker.get_plex_all_content()
-            
-            # Add debug logging
-            logging.info(f"Retrieved {len(movies)} movies and {len(tv_shows)} TV shows")
-            if movies:
-                logging.info(f"Sample movie: {movies[0]}")
-            if tv_shows:
-                logging.info(f"Sample TV show: {tv_shows[0]}")
-            
-            # Ensure we have valid data structures
-            movies = movies if movies else []
-            tv_shows = tv_shows if tv_shows else []
-            
-        except Exception as e:
-            logging.error(f"Dashboard Plex connection error: {str(e)}")
-            # Return empty but valid data structure
-            movies = []
-            tv_shows = []
-            
-        response_data = {
-            'success': True,
-            'movies': movies,
-            'tv_shows': tv_shows,
-            'movies_count': len(movies),
-            'tv_shows_count': len(tv_shows),
-            'timestamp': datetime.now(pytz.timezone(config.get('timezone', 'US/Eastern'))).isoformat()
-        }
+        response_data = _library_data(config)
         
-        logging.info(f"Sending response with {len(movies)} movies and {len(tv_shows)} TV shows")
+        logging.info(f"Sending response with {response_data['movies_count']} movies and {response_data['tv_shows_count']} TV shows")
         return jsonify(response_data)
         
     except Exception as e:
@@ -667,21 +1450,16 @@ def internal_schedule():
     """Internal endpoint to get TV schedule for dashboard"""
     try:
         config = config_manager.get_config()
-        tracker = MediaTracker(config)
-        
+            
         # Get days parameter, default to 7
         days = request.args.get('days', 7, type=int)
-        if days < 1 or days > 30:
+        if days < 1 or days > MAX_SCHEDULE_DAYS:
             days = 7
             
-        scheduled_shows = tracker.get_sonarr_calendar_extended(days=days)
-        return jsonify({
-            'success': True,
-            'days': days,
-            'scheduled_shows': scheduled_shows,
-            'count': len(scheduled_shows),
-            'timestamp': datetime.now(pytz.timezone(config.get('timezone', 'US/Eastern'))).isoformat()
-        })
+        # Live dashboards follow the default 7-day window
+        if days == 7:
+            return jsonify(_publish_dashboard_data('schedule', lambda: _schedule_data(config, days)))
+        return jsonify(_schedule_data(config, days))
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
@@ -691,67 +1469,80 @@ def internal_library_stats():
     try:
         config = config_manager.get_config()
         tracker = MediaTracker(config)
-        
-        # Use the same successful inline approach
-        movies = []
-        tv_shows = []
-        
+        return jsonify(_publish_dashboard_data('library_stats', lambda: _library_stats_data(config, tracker)))
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+@app.route('/internal/sync_history')
+def internal_sync_history():
+    """Phase timing summary and recent runs of the daily sync"""
+    try:
         config = config_manager.get_config()
-        if config.get('plex_url') and config.get('plex_token'):
-            try:
-                from urllib.parse import urljoin
-                import xml.etree.ElementTree as ET
-                import requests
-                
-                # Use same session setup as working text file generation
-                session = requests.Session()
-                session.headers.update({'Accept': 'application/xml'})
-                
-                url = urljoin(config['plex_url'], '/library/sections')
-                headers = {'X-Plex-Token': config['plex_token']}
-                
-                response = session.get(url, headers=headers, timeout=30)
-                response.raise_for_status()
-                
-                root = ET.fromstring(response.content)
-                
-                for library in root.findall('.//Directory'):
-                    library_key = library.get('key')
-                    library_type = library.get('type')
-                    
-                    if library_type in ['movie', 'show']:
-                        all_url = urljoin(config['plex_url'], f'/library/sections/{library_key}/all')
-                        all_response = requests.get(all_url, headers=headers)
-                        all_response.raise_for_status()
-                        
-                        all_root = ET.fromstring(all_response.content)
-                        items = all_root.findall('.//Video')
-                        
-                        if library_type == 'movie':
-                            movies.extend(items)
-                        elif library_type == 'show':
-                            tv_shows.extend(items)
-            except Exception as e:
-                logging.error(f"Error getting Plex stats: {str(e)}")
+        limit = request.args.get('limit', 50, type=int)
+        limit = min(max(limit, 1), 1000)
         
-        stats = {
-            'total_movies': len(movies),
-            'total_shows': len(tv_shows)
-        }
+        history = SyncHistory(history_file_for(config))
         return jsonify({
             'success': True,
-            'stats': stats,
-            'timestamp': datetime.now(pytz.timezone(config.get('timezone', 'US/Eastern'))).isoformat()
+            'summary': history.summary(limit=limit, interval_seconds=schedule_interval_seconds(config)),
+            'runs': history.load(limit=limit)
         })
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
+def _send_dashboard_snapshot(path, meta, as_attachment=False):
+    """Stored snapshot as a conditional static response, gzipped when the client accepts it"""
+    generated = datetime.fromisoformat(meta['generated_at'])
+    compressed = 'gzip' in request.headers.get('Accept-Encoding', '') and os.path.exists(path + '.gz')
+    response = send_file(path + '.gz' if compressed else path, mimetype='text/html', conditional=True,
+                         etag=meta['etag'] + ('-gz' if compressed else ''), max_age=0,
+                         as_attachment=as_attachment,
+                         download_name=f"media_tracker_dashboard_{generated.strftime('%Y%m%d_%H%M%S')}.html" if as_attachment else None)
+    if compressed:
+        response.headers['Content-Encoding'] = 'gzip'
+    response.vary.add('Accept-Encoding')
+    response.headers['X-Snapshot-Generated'] = meta['generated_at']
+    return response
+
+@app.route('/dashboard/snapshot')
+def dashboard_snapshot():
+    """Pre-rendered dashboard with its data inlined; serving it never calls Plex or Sonarr"""
+    config = config_manager.get_config()
+    path = snapshot_file_for(config)
+    meta = dashboard_snapshots.load(path)
+    if meta is None:
+        # Nothing rendered yet; the live dashboard works in the meantime
+        return redirect(url_for('dashboard'))
+    try:
+        return _send_dashboard_snapshot(path, meta)
+    except FileNotFoundError:
+        return redirect(url_for('dashboard'))
+
+@app.route('/dashboard/snapshot/refresh', methods=['POST'])
+@require_admin
+def dashboard_snapshot_refresh():
+    """Rebuild the dashboard snapshot now"""
+    config = config_manager.get_config()
+    if not build_dashboard_snapshot(config):
+        return jsonify({'success': False, 'error': 'Snapshot build failed or already running'}), 409
+    return jsonify({'success': True, 'snapshot': dashboard_snapshots.load(snapshot_file_for(config))})
+
 @app.route('/dashboard/download')
 def download_dashboard_html():
     """Generate and download dashboard HTML code"""
     from datetime import datetime
     from flask import make_response
     
+    # The stored snapshot is self-contained, so prefer it when one exists
+    config = config_manager.get_config()
+    path = snapshot_file_for(config)
+    meta = dashboard_snapshots.load(path)
+    if meta is not None:
+        try:
+            return _send_dashboard_snapshot(path, meta, as_attachment=True)
+        except FileNotFoundError:
+            pass
+    
     # Get the current dashboard HTML template
     dashboard_html = render_template('dashboard.html')
     
@@ -822,11 +1613,30 @@ ENDPOINTS
    }}
 
 2. GET /api/recent
-   Description: Get recently added movies and TV shows with extended metadata
+   Description: Get movies and TV shows added within a time window, newest first, with extended metadata
    Parameters: 
-     - days (optional): Number of days to look back (1-30, default: 7)
+     - days (optional): Number of days to look back when since is not given (default: 7)
+     - since (optional): Start of the window, as epoch seconds or an ISO date or datetime
+       (in the configured timezone unless it carries an offset)
+     - until (optional): End of the window, in the same formats as since (default: now)
+     - limit (optional): Maximum number of items returned, newest first
    
    Example: /api/recent?days=14
+   Example: /api/recent?since=2024-01-01&until=2024-01-31&limit=50
+   
+   Response Format:
+   {{
+     "success": boolean,
+     "days": number or null,
+     "since": number (epoch seconds),
+     "until": number (epoch seconds) or null,
+     "total": number (items in the window before limit),
+     "movies": [...], // Same format as /api/all_content
+     "tv_shows": [...], // Same format as /api/all_content
+     "movies_count": number,
+     "tv_shows_count": number,
+     "timestamp": string (ISO format)
+   }}
 
 3. GET /api/all_content
    Description: Get all movies and TV shows from your Plex library (no time restrictions)
@@ -850,7 +1660,8 @@ ENDPOINTS
          "poster_url": string,
          "content_rating": string,
          "added_date": string,
-         "library": string
+         "library": string,
+         "sources": [{{"server": string, "plex_key": string}}] // Every Plex server holding the item
        }}
      ],
      "tv_shows": [
@@ -865,17 +1676,24 @@ ENDPOINTS
          "poster_url": string,
          "content_rating": string,
          "added_date": string,
-         "library": string
+         "library": string,
+         "sources": [{{"server": string, "plex_key": string}}]
        }}
      ],
+     "servers": {{ // Per Plex server: items fetched and how the fetch went
+       "<server name>": {{"movies": number, "tv_shows": number, "error": string or null, "seconds": number}}
+     }},
      "timestamp": string (ISO format),
      "timezone": string
    }}
 
+   Items found on several Plex servers are listed once. Items only on a server other than
+   the primary have a plex_key prefixed with that server's name ("<server>:<key>").
+
 3. GET /api/schedule
    Description: Get TV show schedule with extended metadata
    Parameters:
-     - days (optional): Number of days to look ahead (1-30, default: 7)
+     - days (optional): Number of days to look ahead (1-{MAX_SCHEDULE_DAYS}, default: 7)
    
    Example: /api/schedule?days=3
    
@@ -891,9 +1709,13 @@ ENDPOINTS
          "air_date": string,
          "overview": string,
          "series_id": number,
-         "episode_id": number
+         "episode_id": number,
+         "sources": [{{"server": string, "series_id": number, "episode_id": number}}] // Every Sonarr instance listing the episode
        }}
      ],
+     "servers": {{ // Per Sonarr instance: episodes fetched and how the fetch went
+       "<server name>": {{"scheduled_shows": number, "error": string or null, "seconds": number}}
+     }},
      "timestamp": string (ISO format),
      "timezone": string
    }}
@@ -901,7 +1723,7 @@ ENDPOINTS
 4. GET /api/full_sync
    Description: Get all data in one call - recent content and schedule
    Parameters:
-     - days (optional): Number of days for both recent content and schedule (1-30, default: 7)
+     - days (optional): Number of days for both recent content and schedule (1-{MAX_SCHEDULE_DAYS}, default: 7)
    
    Example: /api/full_sync?days=5
    
@@ -963,6 +1785,34 @@ ENDPOINTS
      }}
    }}
 
+7. GET /api/sources
+   Description: Registered media sources (Plex, Sonarr, ...) with their settings, servers and
+   count-only stats, fetched from every active source at once
+   Parameters: None
+   
+   Response Format:
+   {{
+     "success": boolean,
+     "sources": {{
+       "<source name>": {{
+         "fields": [string], // Data the source contributes, e.g. "movies", "scheduled_shows"
+         "configured": boolean,
+         "settings": {{
+           "enabled": boolean,
+           "max_concurrency": number,
+           "time_budget_seconds": number,
+           "cache_seconds": number,
+           "stale_seconds": number
+         }},
+         "servers": [string],
+         "stats": {{"<name>": number}} or null,
+         "status": string or null, // success, failure, timeout, cached or stale
+         "error": string or null,
+         "seconds": number or null
+       }}
+     }}
+   }}
+
 ERROR HANDLING
 --------------
 All endpoints return appropriate HTTP status codes:
@@ -1122,6 +1972,170 @@ def help_page():
     """Comprehensive help documentation"""
     return render_template('help.html')
 
+@app.route('/metrics')
+def prometheus_metrics():
+    """Prometheus scrape endpoint"""
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/admin/profile')
+@require_admin
+def admin_profile():
+    """Sample all threads for N seconds and return collapsed flamegraph stacks"""
+    seconds = request.args.get('seconds', 10, type=float)
+    seconds = min(max(seconds, 0.1), 120)
+    interval_ms = request.args.get('interval_ms', 5, type=float)
+    interval_ms = min(max(interval_ms, 1), 1000)
+    
+    result = profiler.profile_process(seconds, interval=interval_ms / 1000.0)
+    if result is None:
+        return jsonify({'success': False, 'error': 'A profile is already running'}), 409
+    
+    return Response(result.collapsed(), mimetype='text/plain', headers={
+        'X-Profile-Samples': str(result.samples),
+        'Content-Disposition': f'inline; filename=profile-{datetime.now().strftime("%Y%m%d_%H%M%S")}.folded'
+    })
+
+@app.route('/admin/profile/requests')
+@require_admin
+def admin_request_profiles():
+    """List stored single-request profiles"""
+    return jsonify({'success': True, 'profiles': profiler.request_profiles.list()})
+
+@app.route('/admin/profile/requests/<profile_id>')
+@require_admin
+def admin_request_profile(profile_id):
+    """Collapsed stacks for one profiled request"""
+    entry = profiler.request_profiles.get(profile_id)
+    if entry is None:
+        return jsonify({'success': False, 'error': 'Profile not found'}), 404
+    return Response(entry['profiler'].collapsed(), mimetype='text/plain')
+
+def _memory_grouping():
+    group_by = request.args.get('group_by', 'lineno')
+    return group_by if group_by in GROUPINGS else None
+
+@app.route('/admin/memory/start', methods=['POST'])
+@require_admin
+def admin_memory_start():
+    """Start tracemalloc allocation tracing"""
+    nframes = request.args.get('nframes', 25, type=int)
+    allocation_tracer.start(min(max(nframes, 1), 100))
+    return jsonify({'success': True, 'tracing': True, 'nframes': tracemalloc.get_traceback_limit()})
+
+@app.route('/admin/memory/stop', methods=['POST'])
+@require_admin
+def admin_memory_stop():
+    """Stop allocation tracing and drop stored snapshots"""
+    allocation_tracer.stop()
+    return jsonify({'success': True, 'tracing': False})
+
+@app.route('/admin/memory/snapshots', methods=['GET', 'POST'])
+@require_admin
+def admin_memory_snapshots():
+    """List stored snapshots, or take a new one with POST"""
+    if request.method == 'POST':
+        if not allocation_tracer.is_tracing:
+            return jsonify({'success': False, 'error': 'Allocation tracing is not running'}), 409
+        snapshot_id = allocation_tracer.take_snapshot(request.args.get('label', ''))
+        return jsonify({'success': True, 'id': snapshot_id})
+    current, peak = tracemalloc.get_traced_memory() if allocation_tracer.is_tracing else (0, 0)
+    return jsonify({
+        'success': True,
+        'tracing': allocation_tracer.is_tracing,
+        'traced_bytes': current,
+        'peak_bytes': peak,
+        'snapshots': allocation_tracer.list_snapshots()
+    })
+
+@app.route('/admin/memory/top')
+@require_admin
+def admin_memory_top():
+    """Largest live allocation sites, by line, file, Flask route or MediaTracker method"""
+    group_by = _memory_grouping()
+    if group_by is None:
+        return jsonify({'success': False, 'error': f'group_by must be one of {", ".join(GROUPINGS)}'}), 400
+    snapshot_id = request.args.get('snapshot')
+    if snapshot_id:
+        snapshot = allocation_tracer.get_snapshot(snapshot_id)
+        if snapshot is None:
+            return jsonify({'success': False, 'error': 'Snapshot not found'}), 404
+    elif allocation_tracer.is_tracing:
+        snapshot = tracemalloc.take_snapshot()
+    else:
+        return jsonify({'success': False, 'error': 'Allocation tracing is not running'}), 409
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 200)
+    return jsonify({'success': True, 'group_by': group_by, 'sites': allocation_tracer.top(snapshot, group_by, limit, app)})
+
+@app.route('/admin/memory/diff')
+@require_admin
+def admin_memory_diff():
+    """Allocation growth between two snapshots (`to` defaults to a fresh snapshot)"""
+    group_by = _memory_grouping()
+    if group_by is None:
+        return jsonify({'success': False, 'error': f'group_by must be one of {", ".join(GROUPINGS)}'}), 400
+    old_snapshot = allocation_tracer.get_snapshot(request.args.get('from', ''))
+    if old_snapshot is None:
+        return jsonify({'success': False, 'error': 'Snapshot given in from= not found'}), 404
+    to_id = request.args.get('to')
+    if to_id:
+        new_snapshot = allocation_tracer.get_snapshot(to_id)
+        if new_snapshot is None:
+            return jsonify({'success': False, 'error': 'Snapshot given in to= not found'}), 404
+    elif allocation_tracer.is_tracing:
+        new_snapshot = allocation_tracer.get_snapshot(allocation_tracer.take_snapshot('diff'))
+    else:
+        return jsonify({'success': False, 'error': 'Allocation tracing is not running'}), 409
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 200)
+    return jsonify({
+        'success': True,
+        'group_by': group_by,
+        'sites': allocation_tracer.diff(old_snapshot, new_snapshot, group_by, limit, app)
+    })
+
+@app.route('/admin/memory/routes')
+@require_admin
+def admin_memory_routes():
+    """Net traced memory retained per Flask route since tracing started"""
+    return jsonify({'success': True, 'tracing': allocation_tracer.is_tracing, 'routes': allocation_tracer.route_report()})
+
+@app.route('/artwork/<rating_key>')
+def artwork(rating_key):
+    """Plex artwork served from the local cache, so browsers never see the Plex token"""
+    kind = request.args.get('kind', 'thumb')
+    version = request.args.get('v', '')
+    width = request.args.get('width', type=int)
+    if not rating_key.isdigit() or kind not in artwork_cache.KINDS or (version and not version.isdigit()):
+        return jsonify({'success': False, 'error': 'Invalid artwork request'}), 400
+    
+    config = config_manager.get_config()
+    proxy = artwork_cache.proxy_for(config)
+    server = request.args.get('server')
+    if server:
+        plex_server = find_plex_server(config, server)
+        if plex_server is None:
+            return jsonify({'success': False, 'error': 'Unknown Plex server'}), 404
+        config = plex_server_config(config, plex_server)
+    # A concurrent eviction can remove the file between lookup and send; fetch again once
+    for attempt in range(2):
+        try:
+            entry = proxy.get(config, rating_key, kind, version or None, width, server)
+        except Exception as e:
+            logging.error(f"Error fetching artwork {rating_key}/{kind}: {str(e)}")
+            return jsonify({'success': False, 'error': 'Artwork unavailable'}), 502
+        if entry is None:
+            return jsonify({'success': False, 'error': 'Artwork not found'}), 404
+        try:
+            # Versioned URLs change whenever Plex updates the image, so they can be cached for good
+            response = send_file(entry.path, mimetype=entry.content_type, etag=entry.etag, conditional=True,
+                                 max_age=31536000 if version else 86400)
+        except FileNotFoundError:
+            continue
+        response.cache_control.public = True
+        if version:
+            response.cache_control.immutable = True
+        return response
+    return jsonify({'success': False, 'error': 'Artwork unavailable'}), 503
+
 @app.route('/static/<path:filename>')
 def serve_static(filename):
     """Serve static files"""
@@ -0,0 +1,246 @@
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+from urllib.parse import urlencode, urljoin
+
+import metrics
+from instrumentation import InstrumentedSession
+
+DEFAULT_CACHE_DIR = './cache/artwork'
+DEFAULT_MAX_MB = 256
+KINDS = ('thumb', 'art')
+# Requested widths snap up to one of these so the number of cached variants stays bounded
+WIDTHS = (100, 200, 300, 500, 800, 1280, 1920)
+# Height as a fraction of width: posters are 2:3, backgrounds 16:9
+ASPECT = {'thumb': 1.5, 'art': 0.5625}
+EXTENSIONS = {'image/jpeg': 'jpg', 'image/png': 'png', 'image/webp': 'webp', 'image/gif': 'gif'}
+CONTENT_TYPES = {extension: content_type for content_type, extension in EXTENSIONS.items()}
+
+_ARTWORK_PATH = re.compile(r'^/library/metadata/(\d+)/(thumb|art)(?:/(\d+))?$')
+_CACHE_FILE = re.compile(r'^([0-9a-f]{40})-([0-9a-f]{16})\.(\w+)$')
+
+
+def artwork_url(plex_path, server=None):
+    """Proxy URL for a Plex artwork path such as /library/metadata/123/thumb/1699999999.
+    The Plex update timestamp becomes the version, so the URL changes whenever the image does.
+    Artwork from a Plex server other than the primary names its server."""
+    if not plex_path:
+        return None
+    match = _ARTWORK_PATH.match(plex_path.split('?', 1)[0])
+    if not match:
+        return None
+    rating_key, kind, version = match.groups()
+    params = {}
+    if kind != 'thumb':
+        params['kind'] = kind
+    if version:
+        params['v'] = version
+    if server:
+        params['server'] = server
+    return f'/artwork/{rating_key}' + (f'?{urlencode(params)}' if params else '')
+
+
+def snap_width(width):
+    if not width:
+        return None
+    for candidate in WIDTHS:
+        if width <= candidate:
+            return candidate
+    return WIDTHS[-1]
+
+
+class CacheEntry:
+    """An image stored in the artwork cache"""
+
+    def __init__(self, path, etag, content_type, size):
+        self.path = path
+        self.etag = etag
+        self.content_type = content_type
+        self.size = size
+
+
+class ArtworkCache:
+    """Size-bounded least-recently-used image cache on disk"""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_MB * 1024 * 1024):
+        # Absolute, since Flask's send_file resolves relative paths against the app root
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self._fetch_locks = {}
+        self._loaded = False
+
+    def _load(self):
+        """Index files left by a previous run, oldest first"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        found = []
+        for name in os.listdir(self.cache_dir):
+            match = _CACHE_FILE.match(name)
+            if not match or match.group(3) not in CONTENT_TYPES:
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            found.append((stat.st_mtime, match.group(1), CacheEntry(
+                path, match.group(2), CONTENT_TYPES[match.group(3)], stat.st_size)))
+        for _, key_hash, entry in sorted(found, key=lambda item: item[0]):
+            self.entries[key_hash] = entry
+            self.total_bytes += entry.size
+        self._loaded = True
+        self._evict()
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes and self.entries:
+            _, entry = self.entries.popitem(last=False)
+            self.total_bytes -= entry.size
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+    def get(self, key):
+        key_hash = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        with self.lock:
+            if not self._loaded:
+                self._load()
+            entry = self.entries.get(key_hash)
+            if entry is not None:
+                if os.path.exists(entry.path):
+                    self.entries.move_to_end(key_hash)
+                    return entry
+                del self.entries[key_hash]
+                self.total_bytes -= entry.size
+        return None
+
+    def put(self, key, content, content_type):
+        key_hash = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        etag = hashlib.sha1(content).hexdigest()[:16]
+        extension = EXTENSIONS.get(content_type.split(';')[0].strip(), 'jpg')
+        path = os.path.join(self.cache_dir, f'{key_hash}-{etag}.{extension}')
+        with self.lock:
+            if not self._loaded:
+                self._load()
+        fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(content)
+            os.replace(temp_path, path)
+        except OSError:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+        entry = CacheEntry(path, etag, CONTENT_TYPES[extension], len(content))
+        with self.lock:
+            previous = self.entries.pop(key_hash, None)
+            if previous is not None:
+                self.total_bytes -= previous.size
+                if previous.path != path:
+                    try:
+                        os.remove(previous.path)
+                    except OSError:
+                        pass
+            self.entries[key_hash] = entry
+            self.total_bytes += entry.size
+            self._evict()
+        return entry
+
+    def fetch_lock(self, key):
+        """Per-key lock so concurrent misses for one image fetch it from Plex once"""
+        with self.lock:
+            lock = self._fetch_locks.get(key)
+            if lock is None:
+                lock = self._fetch_locks[key] = threading.Lock()
+            return lock
+
+    def release_fetch_lock(self, key):
+        with self.lock:
+            self._fetch_locks.pop(key, None)
+
+
+class ArtworkProxy:
+    """Fetches Plex artwork (resized by the Plex photo transcoder) through the on-disk cache"""
+
+    def __init__(self, cache, session=None, timeout=30):
+        self.cache = cache
+        self.session = session or InstrumentedSession()
+        self.timeout = timeout
+
+    def get(self, config, rating_key, kind='thumb', version=None, width=None, server=None):
+        """CacheEntry for the requested image, fetching it on a miss. Returns None if Plex has no image.
+        config points at the Plex server to fetch from; server names it when it is not the primary."""
+        width = snap_width(width)
+        key = f"{rating_key}/{kind}/{version or 'latest'}/{width or 'original'}"
+        if server:
+            key = f'{server}/{key}'
+        entry = self.cache.get(key)
+        if entry is not None:
+            metrics.record_cache('artwork', True)
+            return entry
+
+        with self.cache.fetch_lock(key):
+            # Another request may have stored it while this one waited
+            entry = self.cache.get(key)
+            if entry is not None:
+                metrics.record_cache('artwork', True)
+                return entry
+            metrics.record_cache('artwork', False)
+            try:
+                fetched = self._fetch(config, rating_key, kind, version, width)
+                if fetched is None:
+                    return None
+                return self.cache.put(key, *fetched)
+            finally:
+                self.cache.release_fetch_lock(key)
+
+    def _fetch(self, config, rating_key, kind, version, width):
+        plex_url = config.get('plex_url', '').strip()
+        plex_token = config.get('plex_token', '').strip()
+        if not plex_url or not plex_token:
+            raise ValueError('Plex URL or token not configured')
+        if not plex_url.startswith(('http://', 'https://')):
+            plex_url = 'http://' + plex_url
+
+        image_path = f'/library/metadata/{rating_key}/{kind}' + (f'/{version}' if version else '')
+        headers = {'X-Plex-Token': plex_token}
+        if width:
+            url = urljoin(plex_url, '/photo/:/transcode')
+            params = {'url': image_path, 'width': width, 'height': int(width * ASPECT[kind]),
+                      'minSize': 1, 'upscale': 0}
+        else:
+            url, params = urljoin(plex_url, image_path), None
+
+        response = self.session.get(url, headers=headers, params=params, timeout=self.timeout)
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        content_type = response.headers.get('Content-Type', 'image/jpeg')
+        if not content_type.startswith('image/'):
+            logging.warning(f"Plex returned {content_type} for artwork {image_path}")
+            return None
+        return response.content, content_type
+
+
+# Shared proxy, rebuilt when the cache settings change
+_proxy = None
+_proxy_lock = threading.Lock()
+
+
+def proxy_for(config):
+    """The process-wide ArtworkProxy for the configured cache directory and size"""
+    global _proxy
+    cache_dir = os.path.abspath(config.get('artwork_cache_dir') or DEFAULT_CACHE_DIR)
+    max_bytes = int(config.get('artwork_cache_max_mb', DEFAULT_MAX_MB)) * 1024 * 1024
+    with _proxy_lock:
+        if _proxy is None or _proxy.cache.cache_dir != cache_dir or _proxy.cache.max_bytes != max_bytes:
+            _proxy = ArtworkProxy(ArtworkCache(cache_dir, max_bytes))
+        return _proxy
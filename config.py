@@ -28,11 +28,23 @@ class ConfigManager:
             'github_repo': '',
             'github_token': '',
             'github_branch': 'main',
+            'github_api_url': 'https://api.github.com',
             'scheduler_enabled': False,
             'schedule_type': 'daily',
             'scheduler_hour': 19,
             'scheduler_minute': 55,
             'interval_hours': 1,
+            'output_formats': ['text'],
+            'artwork_cache_dir': './cache/artwork',
+            'artwork_cache_max_mb': 256,
+            'plex_notifications_enabled': False,
+            'plex_servers': [],
+            'sonarr_servers': [],
+            'sources': {},
+            'library_export_enabled': False,
+            'library_export_hour': 3,
+            'library_export_episodes': False,
+            'storage_analysis_max_age': 3600,
             'output_format': {
                 'movie_format': 'Title: {title}\nYear: {year}\nAdded: {added_date}\n{separator}',
                 'tv_format': 'Title: {title}\nYear: {year}\nAdded: {added_date}\n{separator}',
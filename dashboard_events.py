@@ -0,0 +1,243 @@
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+
+# Deltas kept for clients reconnecting with Last-Event-ID; older clients get a full reset
+HISTORY_SIZE = 256
+HEARTBEAT_SECONDS = 15
+RETRY_MILLISECONDS = 5000
+# Fields that change on every fetch without the data changing
+VOLATILE_FIELDS = ('timestamp', 'version', '_timing')
+
+
+def item_key(item):
+    """Stable identity of a movie or show; must match itemKey() in dashboard.html"""
+    return item.get('plex_key') or item.get('guid') or item.get('title', '')
+
+
+def schedule_key(item):
+    """Identity of a scheduled episode; must match scheduleKey() in dashboard.html"""
+    return f"{item.get('series_title', '')}|{item.get('season', '')}|{item.get('episode', '')}"
+
+
+# List fields diffed item by item, per section; other sections are sent whole when they change
+LIST_FIELDS = {
+    'all_content': {'movies': item_key, 'tv_shows': item_key},
+    'schedule': {'scheduled_shows': schedule_key},
+}
+# Count fields kept in step when a list is patched; '<field>_count' unless listed
+COUNT_FIELDS = {'schedule': {'scheduled_shows': 'count'}}
+
+
+def diff_list(old, new, key):
+    """Added (with the key of the item they follow), changed and removed items, or None"""
+    old_by_key = {key(item): item for item in old}
+    seen = set()
+    added, changed = [], []
+    previous = None
+    for item in new:
+        item_id = key(item)
+        seen.add(item_id)
+        before = old_by_key.get(item_id)
+        if before is None:
+            added.append({'item': item, 'after': previous})
+        elif before != item:
+            changed.append(item)
+        previous = item_id
+    removed = [item_id for item_id in old_by_key if item_id not in seen]
+    if not (added or changed or removed):
+        return None
+    return {'added': added, 'changed': changed, 'removed': removed}
+
+
+def _stable(data):
+    return {k: v for k, v in data.items() if k not in VOLATILE_FIELDS}
+
+
+def _message(event, event_id, data):
+    return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+class DashboardEvents:
+    """Latest dashboard data with a versioned history of deltas, streamed to dashboards
+    as Server-Sent Events. Versions are per process; the instance id in event ids makes
+    clients of a restarted (or different) worker fall back to a full reset."""
+
+    def __init__(self, history_size=HISTORY_SIZE):
+        self.instance = uuid.uuid4().hex[:8]
+        self.version = 0
+        self.state = {}
+        # Monotonic time each section was last published, changed or not
+        self.updated = {}
+        # The timestamp field of each section's last publish, which the stored data drops
+        self.timestamps = {}
+        self.history = deque(maxlen=history_size)
+        self.condition = threading.Condition()
+        self.subscribers = 0
+        self.observers = []
+        self._reset_cache = None
+
+    def add_observer(self, callback):
+        """Register callback(section, data, delta) for every published change. Observers run
+        under the lock, in publish order, so they must not publish themselves."""
+        self.observers.append(callback)
+
+    def event_id(self, version=None):
+        return f"{self.instance}-{self.version if version is None else version}"
+
+    def _delta(self, section, old, new):
+        fields = LIST_FIELDS.get(section)
+        if fields is None:
+            return new if old != new else None
+        delta = {}
+        for field, key in fields.items():
+            changes = diff_list((old or {}).get(field) or [], new.get(field) or [], key)
+            if changes:
+                delta[field] = changes
+        for field, value in new.items():
+            if field not in fields and (old or {}).get(field) != value:
+                delta[field] = value
+        return delta or None
+
+    def publish(self, section, data):
+        """Store a section's latest data and queue a delta for subscribers when it changed.
+        Returns the current version."""
+        timestamp = data.get('timestamp')
+        data = _stable(data)
+        with self.condition:
+            delta = self._delta(section, self.state.get(section), data)
+            self.state[section] = data
+            self.updated[section] = time.monotonic()
+            self.timestamps[section] = timestamp
+            if delta is not None:
+                self._append(section, data, delta)
+            return self.version
+
+    def _append(self, section, data, delta):
+        """Queue a delta for subscribers and observers; the caller holds the lock"""
+        self.version += 1
+        payload = {'version': self.version, 'section': section, 'delta': delta}
+        self.history.append((self.version, _message('delta', self.event_id(), payload)))
+        for observer in self.observers:
+            try:
+                observer(section, data, delta)
+            except Exception as e:
+                logging.error(f"Error in dashboard data observer: {str(e)}")
+        self.condition.notify_all()
+
+    def cached(self, section, max_age):
+        """Copy of a section's latest data if published within max_age seconds, else None.
+        It carries the timestamp of that publish, as the freshly fetched data did."""
+        with self.condition:
+            data = self.state.get(section)
+            if data is None or time.monotonic() - self.updated.get(section, 0) > max_age:
+                return None
+            data = dict(data, version=self.event_id())
+            if self.timestamps.get(section) is not None:
+                data['timestamp'] = self.timestamps[section]
+            return data
+
+    def clear(self):
+        """Drop all published data, so every section is fetched again"""
+        with self.condition:
+            self.state = {}
+            self.updated = {}
+            self.timestamps = {}
+
+    def is_fresh(self, section, max_age):
+        """Whether a section has been published within max_age seconds"""
+        with self.condition:
+            return section in self.state and time.monotonic() - self.updated.get(section, 0) <= max_age
+
+    def update_item(self, section, field, item=None, remove_key=None):
+        """Replace or add one item (matched by key) or remove one by key in a published list.
+        Returns False when the section has not been published yet, so there is nothing to patch."""
+        return self.update_items(section, field, [item] if item is not None else (),
+                                 [remove_key] if remove_key is not None else ())
+
+    def update_items(self, section, field, items=(), remove_keys=()):
+        """Replace or add items (matched by key) and remove others by key in a published list,
+        keeping its count field in step, and publish it all as one change"""
+        key = LIST_FIELDS[section][field]
+        with self.condition:
+            data = self.state.get(section)
+            if data is None:
+                return False
+            by_key = {key(existing): existing for existing in data.get(field) or []}
+            # The delta is built from the patch itself rather than by diffing the whole list
+            removed = [remove_key for remove_key in remove_keys if by_key.pop(remove_key, None) is not None]
+            added, changed = [], []
+            for item in items:
+                item_id = key(item)
+                before = by_key.get(item_id)
+                if before is None:
+                    # New items go at the end
+                    added.append({'item': item, 'after': next(reversed(by_key), None)})
+                elif before != item:
+                    changed.append(item)
+                by_key[item_id] = item
+            if not (added or changed or removed):
+                return True
+            updated = dict(data, **{field: list(by_key.values())})
+            delta = {field: {'added': added, 'changed': changed, 'removed': removed}}
+            count_field = COUNT_FIELDS.get(section, {}).get(field, f'{field}_count')
+            if count_field in updated and updated[count_field] != len(by_key):
+                updated[count_field] = delta[count_field] = len(by_key)
+            # Patches keep the data current without making it any fresher than its last full fetch
+            self.state[section] = updated
+            self._append(section, updated, delta)
+            return True
+
+    def _reset_message(self):
+        if self._reset_cache is None or self._reset_cache[0] != self.version:
+            payload = dict(self.state, version=self.version)
+            self._reset_cache = (self.version, _message('reset', self.event_id(), payload))
+        return self._reset_cache[1]
+
+    def messages_since(self, last_event_id):
+        """Messages a client that last saw last_event_id needs, and the version they bring it to"""
+        with self.condition:
+            instance, _, version = (last_event_id or '').rpartition('-')
+            if instance == self.instance and version.isdigit():
+                since = int(version)
+                oldest = self.history[0][0] if self.history else self.version + 1
+                if since <= self.version and since >= oldest - 1:
+                    return [message for v, message in self.history if v > since], self.version
+            if not self.state:
+                return [], self.version
+            return [self._reset_message()], self.version
+
+    def stream(self, last_event_id=None, max_seconds=300, heartbeat=HEARTBEAT_SECONDS):
+        """SSE body: catch-up messages, then deltas as they are published. Ends after
+        max_seconds so no worker is held forever; EventSource reconnects with Last-Event-ID."""
+        with self.condition:
+            self.subscribers += 1
+        try:
+            yield f"retry: {RETRY_MILLISECONDS}\n\n"
+            messages, version = self.messages_since(last_event_id)
+            for message in messages:
+                yield message
+            deadline = time.monotonic() + max_seconds
+            while time.monotonic() < deadline:
+                with self.condition:
+                    self.condition.wait_for(lambda: self.version > version,
+                                            timeout=min(heartbeat, max(0.0, deadline - time.monotonic())))
+                    fresh = [message for v, message in self.history if v > version]
+                    if self.history and self.history[0][0] > version + 1:
+                        # Fell behind the history; start over from the full state
+                        fresh = [self._reset_message()]
+                    version = self.version
+                if fresh:
+                    for message in fresh:
+                        yield message
+                else:
+                    yield ": keepalive\n\n"
+        finally:
+            with self.condition:
+                self.subscribers -= 1
+
+
+dashboard_events = DashboardEvents()
@@ -0,0 +1,113 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+
+SNAPSHOT_FILE = 'dashboard_snapshot.html'
+# Seconds after a change to the inlined data before the snapshot is rebuilt, so a burst of
+# changes rebuilds it once
+REBUILD_DELAY = 30
+
+
+def snapshot_file_for(config):
+    """Pre-rendered dashboard location, defaulting to the output directory"""
+    return config.get('dashboard_snapshot_file') or os.path.join(
+        config.get('output_directory', './output'), SNAPSHOT_FILE)
+
+
+def _atomic_write_bytes(path, content):
+    directory = os.path.dirname(path) or '.'
+    fd, temp_path = tempfile.mkstemp(prefix='.' + os.path.basename(path) + '.', suffix='.tmp', dir=directory)
+    try:
+        os.chmod(temp_path, 0o644)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+class SnapshotStore:
+    """Self-contained dashboard pages stored on disk, with a gzipped copy and metadata
+    so serving one is a stat and a file send"""
+
+    def __init__(self):
+        self.build_lock = threading.Lock()
+        self._meta = {}
+        self._rebuild_lock = threading.Lock()
+        self._rebuild_timer = None
+
+    def schedule_rebuild(self, rebuild, delay=REBUILD_DELAY):
+        """Call rebuild() on a background timer delay seconds from now. Requests made while one
+        is pending join it, so the snapshot is rebuilt at most once per delay however many
+        changes arrive."""
+        with self._rebuild_lock:
+            if self._rebuild_timer is not None:
+                return False
+            self._rebuild_timer = threading.Timer(delay, self._run_rebuild, args=(rebuild,))
+            self._rebuild_timer.name = 'dashboard-snapshot'
+            self._rebuild_timer.daemon = True
+            self._rebuild_timer.start()
+            return True
+
+    def _run_rebuild(self, rebuild):
+        with self._rebuild_lock:
+            self._rebuild_timer = None
+        try:
+            rebuild()
+        except Exception as e:
+            logging.error(f"Error rebuilding dashboard snapshot: {str(e)}")
+
+    @staticmethod
+    def _meta_path(path):
+        return path + '.json'
+
+    def save(self, path, html, generated_at, build_seconds=None):
+        """Write the page, its gzip variant and metadata; the metadata goes last so readers
+        never see it ahead of the files it describes"""
+        content = html.encode('utf-8')
+        compressed = gzip.compress(content, compresslevel=9, mtime=0)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        meta = {
+            'generated_at': generated_at,
+            'etag': hashlib.sha1(content).hexdigest()[:16],
+            'bytes': len(content),
+            'gzip_bytes': len(compressed),
+            'build_seconds': build_seconds
+        }
+        _atomic_write_bytes(path, content)
+        _atomic_write_bytes(path + '.gz', compressed)
+        _atomic_write_bytes(self._meta_path(path), json.dumps(meta).encode('utf-8'))
+        return meta
+
+    def load(self, path):
+        """Metadata for the stored snapshot, or None when there is none yet. Cached per
+        metadata mtime, so snapshots written by other workers are picked up."""
+        meta_path = self._meta_path(path)
+        try:
+            mtime = os.stat(meta_path).st_mtime_ns
+        except OSError:
+            return None
+        cached = self._meta.get(meta_path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        try:
+            with open(meta_path, 'r') as f:
+                meta = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Could not read dashboard snapshot metadata: {str(e)}")
+            return None
+        self._meta[meta_path] = (mtime, meta)
+        return meta
+
+
+dashboard_snapshots = SnapshotStore()
@@ -1,89 +1,202 @@
 #!/usr/bin/env python3
-"""Debug script to test Plex API calls and understand data retrieval issues"""
+"""
+Plex latency and payload profiler.
+Reads config.json through ConfigManager and times every Plex endpoint the app
+depends on, per library section, over a cold (new) and warm (reused)
+connection. Reports payload size, item count, XML vs JSON parse time and
+server think time, plus the projected cost of a full get_plex_all_content run.
+"""
 
-import requests
+import argparse
+import json
+import statistics
+import sys
+import time
 import xml.etree.ElementTree as ET
-from datetime import datetime, timedelta
 from urllib.parse import urljoin
 
-def test_plex_api():
-    # Your configuration
-    plex_url = "http://localhost:32400"  # Update this if different
-    plex_token = "iwn81nkfedl029j8tk24nh6vv"
-    
-    session = requests.Session()
-    headers = {'X-Plex-Token': plex_token}
-    
-    print("=== Testing Plex API ===")
-    
-    # Test 1: Basic connection
-    try:
-        url = urljoin(plex_url, '/identity')
-        response = session.get(url, headers=headers, timeout=30)
-        print(f"Identity test: {response.status_code}")
-        if response.status_code == 200:
-            print("✓ Basic connection successful")
-        else:
-            print(f"✗ Connection failed: {response.text}")
-            return
-    except Exception as e:
-        print(f"✗ Connection error: {e}")
-        return
-    
-    # Test 2: Get libraries
+import requests
+
+from config import ConfigManager
+
+TIMEOUT = 60
+
+
+def plex_settings(config):
+    """Base URL and token from config, with the protocol added as MediaTracker does"""
+    plex_url = config.get('plex_url', '').strip()
+    plex_token = config.get('plex_token', '').strip()
+    if plex_url and not plex_url.startswith(('http://', 'https://')):
+        plex_url = 'http://' + plex_url
+    return plex_url, plex_token
+
+
+def fetch(session, url, headers, params=None):
+    """One GET split into server think time (until headers arrive) and body transfer"""
+    started = time.perf_counter()
+    response = session.get(url, headers=headers, params=params, stream=True, timeout=TIMEOUT)
+    think = time.perf_counter() - started
+    body = response.content
+    total = time.perf_counter() - started
+    response.raise_for_status()
+    return {'think': think, 'total': total, 'bytes': len(body), 'body': body,
+            'content_type': response.headers.get('Content-Type', '')}
+
+
+def count_items(body, fmt):
+    """Top-level entries in a MediaContainer"""
+    if fmt == 'json':
+        container = json.loads(body).get('MediaContainer', {})
+        return len(container.get('Metadata', container.get('Directory', [])))
+    return len(ET.fromstring(body))
+
+
+def parse_seconds(body, fmt, repeat):
+    """Fastest of `repeat` parses of the body"""
+    parse = json.loads if fmt == 'json' else ET.fromstring
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        parse(body)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def profile_endpoint(plex_url, token, path, params=None, repeat=5):
+    """Cold and warm timings for one endpoint in XML, plus the JSON variant for comparison"""
+    url = urljoin(plex_url, path)
+    xml_headers = {'X-Plex-Token': token}
+    json_headers = {'X-Plex-Token': token, 'Accept': 'application/json'}
+
+    # Cold: a fresh session pays connection (and TLS) setup
+    with requests.Session() as session:
+        cold = fetch(session, url, xml_headers, params)
+
+    with requests.Session() as session:
+        fetch(session, url, xml_headers, params)
+        warm = [fetch(session, url, xml_headers, params) for _ in range(repeat)]
+        json_result = fetch(session, url, json_headers, params)
+
+    xml_body = warm[-1]['body']
+    result = {
+        'path': path,
+        'cold_ms': cold['total'] * 1000,
+        'cold_think_ms': cold['think'] * 1000,
+        'warm_ms': statistics.median(r['total'] for r in warm) * 1000,
+        'think_ms': statistics.median(r['think'] for r in warm) * 1000,
+        'xml_bytes': len(xml_body),
+        'items': count_items(xml_body, 'xml'),
+        'xml_parse_ms': parse_seconds(xml_body, 'xml', repeat) * 1000,
+        'json_bytes': None,
+        'json_parse_ms': None,
+    }
+    # Plex answers JSON when asked; servers or proxies that ignore Accept send XML back
+    if 'json' in json_result['content_type']:
+        result['json_bytes'] = json_result['bytes']
+        result['json_parse_ms'] = parse_seconds(json_result['body'], 'json', repeat) * 1000
+    return result
+
+
+def profile_server(config, sections=None, repeat=5):
+    """Profile the identity, sections and per-section endpoints used by MediaTracker"""
+    plex_url, token = plex_settings(config)
+    if not plex_url or not token:
+        raise ValueError('plex_url and plex_token must be set in the config file')
+
+    report = {'plex_url': plex_url, 'endpoints': [], 'sections': []}
+    report['endpoints'].append(profile_endpoint(plex_url, token, '/identity', repeat=repeat))
+    report['endpoints'].append(profile_endpoint(plex_url, token, '/library/sections', repeat=repeat))
+    report['endpoints'].append(profile_endpoint(
+        plex_url, token, '/library/recentlyAdded',
+        {'X-Plex-Container-Start': '0', 'X-Plex-Container-Size': str(config.get('dashboard_max_items', 100))},
+        repeat=repeat))
+
+    with requests.Session() as session:
+        listing = fetch(session, urljoin(plex_url, '/library/sections'), {'X-Plex-Token': token})
+    for directory in ET.fromstring(listing['body']).findall('.//Directory'):
+        key, section_type = directory.get('key'), directory.get('type')
+        if section_type not in ('movie', 'show') or (sections and key not in sections):
+            continue
+        report['sections'].append({
+            'key': key,
+            'title': directory.get('title', 'Unknown'),
+            'type': section_type,
+            'all': profile_endpoint(plex_url, token, f'/library/sections/{key}/all', repeat=repeat),
+            'recent': profile_endpoint(plex_url, token, f'/library/sections/{key}/recentlyAdded', repeat=repeat),
+        })
+
+    report['projection'] = project_all_content(report)
+    return report
+
+
+def project_all_content(report):
+    """Estimated get_plex_all_content cost: the sections listing plus one /all per section, fetched and parsed"""
+    listing = next(e for e in report['endpoints'] if e['path'] == '/library/sections')
+    parts = [listing] + [section['all'] for section in report['sections']]
+    fetch_ms = sum(part['warm_ms'] for part in parts)
+    parse_ms = sum(part['xml_parse_ms'] for part in parts)
+    # A new process (or a dropped keep-alive) pays connection setup once
+    connect_ms = max(0.0, listing['cold_ms'] - listing['warm_ms'])
+    return {
+        'requests': len(parts),
+        'items': sum(section['all']['items'] for section in report['sections']),
+        'bytes': sum(part['xml_bytes'] for part in parts),
+        'fetch_ms': fetch_ms,
+        'parse_ms': parse_ms,
+        'warm_ms': fetch_ms + parse_ms,
+        'cold_ms': fetch_ms + parse_ms + connect_ms,
+    }
+
+
+def _format_row(label, endpoint):
+    json_bytes = f"{endpoint['json_bytes']:>10}" if endpoint['json_bytes'] is not None else f"{'-':>10}"
+    json_parse = f"{endpoint['json_parse_ms']:>9.2f}" if endpoint['json_parse_ms'] is not None else f"{'-':>9}"
+    return (f"{label:<40}{endpoint['items']:>7}{endpoint['cold_ms']:>9.1f}{endpoint['warm_ms']:>9.1f}"
+            f"{endpoint['think_ms']:>9.1f}{endpoint['xml_bytes']:>10}{endpoint['xml_parse_ms']:>9.2f}"
+            f"{json_bytes}{json_parse}")
+
+
+def print_report(report):
+    print(f"Plex server: {report['plex_url']}\n")
+    print(f"{'endpoint':<40}{'items':>7}{'cold ms':>9}{'warm ms':>9}{'think ms':>9}"
+          f"{'xml B':>10}{'xml ms':>9}{'json B':>10}{'json ms':>9}")
+    for endpoint in report['endpoints']:
+        print(_format_row(endpoint['path'], endpoint))
+    for section in report['sections']:
+        for name in ('all', 'recent'):
+            print(_format_row(f"{section['title']} ({section['type']}) {section[name]['path'].rsplit('/', 1)[1]}",
+                              section[name]))
+
+    projection = report['projection']
+    print(f"\nProjected get_plex_all_content: {projection['requests']} requests, {projection['items']} items, "
+          f"{projection['bytes'] / 1024:.0f} KiB")
+    print(f"  warm connection: {projection['warm_ms']:.0f} ms "
+          f"(fetch {projection['fetch_ms']:.0f} ms + parse {projection['parse_ms']:.0f} ms, before normalization)")
+    print(f"  cold connection: {projection['cold_ms']:.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Profile Plex endpoint latency and payloads used by the media tracker')
+    parser.add_argument('--config', default='config.json', help='Config file with plex_url and plex_token')
+    parser.add_argument('--section', action='append', dest='sections', metavar='KEY',
+                        help='Only profile these library section keys (repeatable)')
+    parser.add_argument('--repeat', type=int, default=5, help='Warm requests and parses per endpoint (median/fastest)')
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+    args = parser.parse_args()
+
+    config = ConfigManager(args.config).get_config()
     try:
-        url = urljoin(plex_url, '/library/sections')
-        response = session.get(url, headers=headers, timeout=30)
-        print(f"\nLibraries test: {response.status_code}")
-        
-        if response.status_code == 200:
-            root = ET.fromstring(response.content)
-            print("✓ Libraries found:")
-            
-            for library in root.findall('.//Directory'):
-                lib_key = library.get('key')
-                lib_title = library.get('title')
-                lib_type = library.get('type')
-                print(f"  - Library {lib_key}: {lib_title} (type: {lib_type})")
-                
-                # Test recent content for movie/show libraries
-                if lib_type in ['movie', 'show']:
-                    print(f"    Testing recent content for {lib_title}...")
-                    recent_url = urljoin(plex_url, f'/library/sections/{lib_key}/recentlyAdded')
-                    recent_response = session.get(recent_url, headers=headers, timeout=30)
-                    
-                    if recent_response.status_code == 200:
-                        recent_root = ET.fromstring(recent_response.content)
-                        items = recent_root.findall('.//Video')
-                        print(f"    Found {len(items)} recently added items")
-                        
-                        # Show details of first few items
-                        today = datetime.now().date()
-                        yesterday = today - timedelta(days=1)
-                        recent_count = 0
-                        
-                        for i, item in enumerate(items[:5]):  # Show first 5 items
-                            title = item.get('title', 'Unknown')
-                            year = item.get('year', 'Unknown')
-                            added_at = item.get('addedAt')
-                            
-                            if added_at:
-                                added_date = datetime.fromtimestamp(int(added_at)).date()
-                                print(f"      {i+1}. {title} ({year}) - Added: {added_date}")
-                                
-                                if added_date >= yesterday:
-                                    recent_count += 1
-                            else:
-                                print(f"      {i+1}. {title} ({year}) - Added: No timestamp")
-                        
-                        print(f"    Items added since yesterday: {recent_count}")
-                    else:
-                        print(f"    ✗ Failed to get recent content: {recent_response.status_code}")
-        else:
-            print(f"✗ Failed to get libraries: {response.text}")
-    
-    except Exception as e:
-        print(f"✗ Library error: {e}")
+        report = profile_server(config, sections=args.sections, repeat=max(1, args.repeat))
+    except (ValueError, requests.RequestException, ET.ParseError) as e:
+        print(f"Error profiling Plex: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
 
 if __name__ == '__main__':
-    test_plex_api()
\ No newline at end of file
+    main()
@@ -0,0 +1,227 @@
+import heapq
+
+from dashboard_events import item_key
+from library_index import LibraryIndex, LIST_TYPES, bits_from_slots, set_bits
+from sort_index import SortIndex
+
+# Facet name -> values of an item; a value absent or 'Unknown' is left out
+FACETS = {
+    'type': None,
+    'genre': lambda item: item.get('genres') or [],
+    'year': lambda item: [item.get('year')],
+    'content_rating': lambda item: [item.get('content_rating')],
+    'studio': lambda item: [item.get('studio')],
+    'network': lambda item: [item.get('network')],
+}
+DEFAULT_FACET_LIMIT = 50
+MAX_PER_PAGE = 200
+# Freed slots are not reused, so results keep library order; compact once this many pile up
+MIN_COMPACT_HOLES = 1024
+
+
+def _normalize(value):
+    return str(value).strip().lower()
+
+
+def facet_values(item, item_type):
+    """{facet: {normalized value: label}} for an item"""
+    values = {}
+    for facet, extract in FACETS.items():
+        raw = [item_type] if extract is None else extract(item)
+        labels = {}
+        for value in raw:
+            if value in (None, '', 'Unknown'):
+                continue
+            labels.setdefault(_normalize(value), str(value).strip())
+        values[facet] = labels
+    return values
+
+
+class FacetIndex(LibraryIndex):
+    """Precomputed bitsets over the cached library: one Python int per facet value with bit n
+    set when the item in slot n has that value. Filters are ORs within a facet and ANDs across
+    facets; counts are popcounts of each value's bitset against the other facets' filters."""
+
+    name = 'facet'
+
+    def __init__(self):
+        super().__init__()
+        self.bitsets = {facet: {} for facet in FACETS}
+        self.labels = {facet: {} for facet in FACETS}
+        self.slots = []
+        self.slot_of = {}
+        self.sorts = SortIndex()
+        self.live = 0
+        self.holes = 0
+
+    def __len__(self):
+        return len(self.slot_of)
+
+    def _set(self, slot, values):
+        bit = 1 << slot
+        for facet, labels in values.items():
+            bitsets = self.bitsets[facet]
+            for value, label in labels.items():
+                bitsets[value] = bitsets.get(value, 0) | bit
+                self.labels[facet].setdefault(value, label)
+
+    def _clear(self, slot, values):
+        mask = ~(1 << slot)
+        for facet, labels in values.items():
+            bitsets = self.bitsets[facet]
+            for value in labels:
+                remaining = bitsets.get(value, 0) & mask
+                if remaining:
+                    bitsets[value] = remaining
+                else:
+                    bitsets.pop(value, None)
+                    self.labels[facet].pop(value, None)
+
+    def build(self, library):
+        """Index every movie and show of an all_content payload from scratch"""
+        with self.lock:
+            members = {facet: {} for facet in FACETS}
+            self.labels = {facet: {} for facet in FACETS}
+            self.slots, self.slot_of = [], {}
+            for field, item_type in LIST_TYPES.items():
+                for item in library.get(field) or []:
+                    key = item_key(item)
+                    if key in self.slot_of:
+                        continue
+                    slot = len(self.slots)
+                    self.slot_of[key] = slot
+                    self.slots.append((item_type, item))
+                    for facet, labels in facet_values(item, item_type).items():
+                        for value, label in labels.items():
+                            members[facet].setdefault(value, []).append(slot)
+                            self.labels[facet].setdefault(value, label)
+            self.bitsets = {facet: {value: bits_from_slots(slots, len(self.slots)) for value, slots in values.items()}
+                            for facet, values in members.items()}
+            self.sorts.build(((slot, item) for slot, (_, item) in enumerate(self.slots)), len(self.slots))
+            self.live = (1 << len(self.slots)) - 1
+            self.holes = 0
+            self._built()
+
+    def _upsert(self, item, item_type):
+        key = item_key(item)
+        slot = self.slot_of.get(key)
+        if slot is None:
+            slot = len(self.slots)
+            self.slot_of[key] = slot
+            self.slots.append((item_type, item))
+            self.live |= 1 << slot
+        else:
+            # A changed item keeps its slot, and with it its place in the results
+            old_type, old_item = self.slots[slot]
+            self._clear(slot, facet_values(old_item, old_type))
+            self.sorts.remove(slot, old_item)
+            self.slots[slot] = (item_type, item)
+        self._set(slot, facet_values(item, item_type))
+        self.sorts.add(slot, item)
+
+    def _remove(self, key):
+        slot = self.slot_of.pop(key, None)
+        if slot is None:
+            return
+        item_type, item = self.slots[slot]
+        self._clear(slot, facet_values(item, item_type))
+        self.sorts.remove(slot, item)
+        self.slots[slot] = None
+        self.live &= ~(1 << slot)
+        self.holes += 1
+
+    def apply_delta(self, delta):
+        """Apply an all_content delta from DashboardEvents: added, changed and removed items"""
+        with self.lock:
+            for field, item_type in LIST_TYPES.items():
+                changes = delta.get(field)
+                if not changes:
+                    continue
+                for key in changes.get('removed', []):
+                    self._remove(key)
+                for added in changes.get('added', []):
+                    self._upsert(added['item'], item_type)
+                for item in changes.get('changed', []):
+                    self._upsert(item, item_type)
+            if self.holes > max(MIN_COMPACT_HOLES, len(self.slots) // 4):
+                self.compact()
+
+    def compact(self):
+        """Rebuild without the slots of removed items"""
+        with self.lock:
+            library = {field: [] for field in LIST_TYPES}
+            fields = {item_type: field for field, item_type in LIST_TYPES.items()}
+            for entry in self.slots:
+                if entry is not None:
+                    library[fields[entry[0]]].append(entry[1])
+            self.build(library)
+
+    def _filter_bits(self, facet, values, match_all):
+        bitsets = self.bitsets[facet]
+        if match_all:
+            bits = self.live
+            for value in values:
+                bits &= bitsets.get(_normalize(value), 0)
+            return bits
+        bits = 0
+        for value in values:
+            bits |= bitsets.get(_normalize(value), 0)
+        return bits
+
+    def query(self, filters=None, ranges=None, sort=None, descending=True, page=1, per_page=50,
+              facet_limit=DEFAULT_FACET_LIMIT):
+        """Items matching every filtered facet and range, with value counts per facet.
+        filters maps facet -> (values, match_all): any of the values unless match_all.
+        ranges maps a sortable field -> (low, high), either end None for open.
+        Results follow the sort field when given, otherwise library order."""
+        filters = {facet: spec for facet, spec in (filters or {}).items() if facet in FACETS and spec[0]}
+        per_page = max(1, min(per_page, MAX_PER_PAGE))
+        page = max(1, page)
+        self.sync()
+        with self.lock:
+            filter_bits = {facet: self._filter_bits(facet, values, match_all)
+                           for facet, (values, match_all) in filters.items()}
+            for field, (low, high) in (ranges or {}).items():
+                filter_bits[('range', field)] = self.sorts.range_bits(field, low, high, len(self.slots))
+            matched = self.live
+            for bits in filter_bits.values():
+                matched &= bits
+
+            facets = {}
+            for facet, bitsets in self.bitsets.items():
+                # Each facet is counted against the other filters, so selecting a value
+                # still shows how many items its alternatives would add
+                base = self.live
+                for other, bits in filter_bits.items():
+                    if other != facet:
+                        base &= bits
+                counts = [(value, (bits & base).bit_count()) for value, bits in bitsets.items()]
+                top = heapq.nsmallest(facet_limit, (entry for entry in counts if entry[1]),
+                                      key=lambda entry: (-entry[1], entry[0]))
+                facets[facet] = [{'value': self.labels[facet].get(value, value), 'count': count}
+                                 for value, count in top]
+
+            start = (page - 1) * per_page
+            if sort:
+                slots = self.sorts.top(sort, matched, descending, start, per_page)
+            else:
+                slots = set_bits(matched, start, per_page)
+            results = [dict(self.slots[slot][1], type=self.slots[slot][0]) for slot in slots]
+            return {'total': matched.bit_count(), 'results': results, 'facets': facets}
+
+    def added_between(self, since=None, until=None, limit=None):
+        """Movies and shows added within [since, until] (epoch seconds, either end None for open),
+        newest first and at most limit in all. The window is a bisect on the sorted added time
+        order, so it is exact for any range and costs O(log n) plus the items returned."""
+        self.sync()
+        with self.lock:
+            slots = self.sorts.orders['added_timestamp'].range(since, until)
+            count = len(slots) if limit is None else max(0, min(limit, len(slots)))
+            lists = {item_type: [] for item_type in LIST_TYPES.values()}
+            for slot in reversed(slots[len(slots) - count:]):
+                item_type, item = self.slots[slot]
+                lists[item_type].append(dict(item))
+            return {'total': len(slots), 'movies': lists['movie'], 'tv_shows': lists['show']}
+
+
+facet_index = FacetIndex()
@@ -0,0 +1,171 @@
+import base64
+import hashlib
+import json
+import logging
+import os
+import threading
+from contextlib import nullcontext
+
+import requests
+
+DEFAULT_API_URL = 'https://api.github.com'
+MANIFEST_FILE = '.github_manifest.json'
+FILE_MODE = '100644'
+# Status of a ref update that is not a fast-forward, i.e. the branch moved
+NOT_FAST_FORWARD = 422
+
+# Serializes publishes to the same manifest within this process
+_publish_lock = threading.Lock()
+
+
+class GitHubPublishError(Exception):
+    """A GitHub API call made while publishing failed; status_code is the HTTP status"""
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def git_blob_sha(content):
+    """SHA-1 git assigns to a blob with this content, as listed in remote trees"""
+    return hashlib.sha1(b'blob %d\0' % len(content) + content).hexdigest()
+
+
+def manifest_file_for(config):
+    """Cached remote manifest location, defaulting to the output directory"""
+    return config.get('github_manifest_file') or os.path.join(
+        config.get('output_directory', './output'), MANIFEST_FILE)
+
+
+class GitHubPublisher:
+    """Publishes local files to a branch in one commit via the git data API, skipping files
+    whose blob sha already matches the remote tree"""
+
+    def __init__(self, owner, repo, token, branch='main', api_url=DEFAULT_API_URL,
+                 manifest_file=None, session=None, timeout=30, phase=None):
+        self.repo_url = f"{api_url.rstrip('/')}/repos/{owner}/{repo}"
+        self.branch = branch
+        self.manifest_file = manifest_file
+        self.session = session or requests.Session()
+        self.timeout = timeout
+        self.phase = phase or (lambda name: nullcontext())
+        self.headers = {
+            'Authorization': f'token {token}',
+            'Accept': 'application/vnd.github.v3+json'
+        }
+
+    @classmethod
+    def from_config(cls, config, session=None, phase=None):
+        return cls(
+            config.get('github_owner', ''),
+            config.get('github_repo', ''),
+            config.get('github_token', ''),
+            branch=config.get('github_branch', 'main') or 'main',
+            api_url=config.get('github_api_url') or DEFAULT_API_URL,
+            manifest_file=manifest_file_for(config),
+            session=session,
+            phase=phase
+        )
+
+    def _request(self, method, path, **kwargs):
+        response = self.session.request(method, self.repo_url + path, headers=self.headers,
+                                        timeout=self.timeout, **kwargs)
+        if response.status_code >= 400:
+            raise GitHubPublishError(f"{method} {path} failed: {response.status_code} - {response.text[:200]}",
+                                     response.status_code)
+        return response.json()
+
+    def _load_manifest(self):
+        if not self.manifest_file or not os.path.exists(self.manifest_file):
+            return None
+        try:
+            with open(self.manifest_file, 'r') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if manifest.get('repo') != self.repo_url or manifest.get('branch') != self.branch:
+            return None
+        return manifest
+
+    def _save_manifest(self, manifest):
+        if not self.manifest_file:
+            return
+        try:
+            directory = os.path.dirname(self.manifest_file)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            temp_file = self.manifest_file + '.tmp'
+            with open(temp_file, 'w') as f:
+                json.dump(manifest, f)
+            os.replace(temp_file, self.manifest_file)
+        except OSError as e:
+            logging.warning(f"Could not save GitHub manifest: {str(e)}")
+
+    def remote_manifest(self):
+        """{'commit', 'tree', 'files': {path: blob sha}} for the branch head. One request when
+        the cached manifest is still current, three when the branch moved."""
+        head = self._request('GET', f'/git/ref/heads/{self.branch}')['object']['sha']
+        manifest = self._load_manifest()
+        if manifest and manifest.get('commit') == head:
+            return manifest
+        tree_sha = self._request('GET', f'/git/commits/{head}')['tree']['sha']
+        tree = self._request('GET', f'/git/trees/{tree_sha}', params={'recursive': '1'})
+        if tree.get('truncated'):
+            logging.warning("GitHub tree listing was truncated; files outside it will always be uploaded")
+        manifest = {
+            'repo': self.repo_url,
+            'branch': self.branch,
+            'commit': head,
+            'tree': tree_sha,
+            'files': {entry['path']: entry['sha'] for entry in tree.get('tree', []) if entry.get('type') == 'blob'}
+        }
+        self._save_manifest(manifest)
+        return manifest
+
+    def _tree_entry(self, path, content):
+        try:
+            return {'path': path, 'mode': FILE_MODE, 'type': 'blob', 'content': content.decode('utf-8')}
+        except UnicodeDecodeError:
+            blob = self._request('POST', '/git/blobs', json={
+                'content': base64.b64encode(content).decode('ascii'), 'encoding': 'base64'})
+            return {'path': path, 'mode': FILE_MODE, 'type': 'blob', 'sha': blob['sha']}
+
+    def publish(self, files, message):
+        """Commit changed files ({remote path: local path}) to the branch.
+        Returns {'commit', 'changed', 'unchanged'}; commit is None when nothing changed."""
+        local = {}
+        for remote_path, local_path in files.items():
+            with open(local_path, 'rb') as f:
+                local[remote_path] = f.read()
+
+        with _publish_lock:
+            for attempt in range(2):
+                with self.phase('github.check'):
+                    manifest = self.remote_manifest()
+                changed = sorted(path for path, content in local.items()
+                                 if manifest['files'].get(path) != git_blob_sha(content))
+                unchanged = sorted(set(local) - set(changed))
+                if not changed:
+                    return {'commit': None, 'changed': [], 'unchanged': unchanged}
+
+                with self.phase('github.upload'):
+                    tree = self._request('POST', '/git/trees', json={
+                        'base_tree': manifest['tree'],
+                        'tree': [self._tree_entry(path, local[path]) for path in changed]
+                    })
+                    commit = self._request('POST', '/git/commits', json={
+                        'message': message, 'tree': tree['sha'], 'parents': [manifest['commit']]})
+                    try:
+                        self._request('PATCH', f'/git/refs/heads/{self.branch}', json={'sha': commit['sha']})
+                    except GitHubPublishError as e:
+                        # The branch moved after we read it; rebuild on the new head once.
+                        # Anything else (auth, missing repo or branch) fails right away.
+                        if attempt == 0 and e.status_code == NOT_FAST_FORWARD:
+                            logging.warning("GitHub branch moved during publish, retrying on the new head")
+                            continue
+                        raise
+
+                files_map = dict(manifest['files'])
+                files_map.update({path: git_blob_sha(local[path]) for path in changed})
+                self._save_manifest(dict(manifest, commit=commit['sha'], tree=tree['sha'], files=files_map))
+                return {'commit': commit['sha'], 'changed': changed, 'unchanged': unchanged}
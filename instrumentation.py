@@ -0,0 +1,276 @@
+import contextvars
+import re
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from urllib.parse import urlparse
+
+import requests
+
+# Name of the MediaTracker operation currently issuing upstream requests
+_current_operation = contextvars.ContextVar('upstream_operation', default=None)
+# Request counters opened with count_requests() in the current context
+_active_counters = contextvars.ContextVar('upstream_counters', default=())
+# Timing breakdown of the web request being handled in the current context
+_request_timing = contextvars.ContextVar('request_timing', default=None)
+
+_ID_SEGMENT = re.compile(r'/\d+(?=/|$)')
+
+
+def endpoint_label(url, headers=None):
+    """Collapse a request URL into a low-cardinality 'service:/path' label"""
+    parsed = urlparse(url)
+    path = _ID_SEGMENT.sub('/*', parsed.path) or '/'
+    headers = headers or {}
+    if 'X-Plex-Token' in headers or 'X-Plex-Token=' in parsed.query:
+        service = 'plex'
+    elif 'X-Api-Key' in headers:
+        service = 'sonarr'
+    elif parsed.hostname == 'api.github.com' or path.startswith('/repos/'):
+        service = 'github'
+        path = re.sub(r'^/repos/[^/]+/[^/]+', '/repos/*/*', path)
+    else:
+        service = parsed.hostname or 'unknown'
+    return f'{service}:{path}'
+
+
+class RequestCount:
+    """Upstream requests, bytes and time observed inside a count_requests() block"""
+
+    def __init__(self):
+        # Upstream instances fetched concurrently report into the same counter
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.bytes = 0
+        self.seconds = 0.0
+        self.errors = 0
+        self.endpoints = {}
+
+    def add(self, endpoint, size, seconds, error):
+        with self.lock:
+            self.requests += 1
+            self.bytes += size
+            self.seconds += seconds
+            self.errors += int(error)
+            self.endpoints[endpoint] = self.endpoints.get(endpoint, 0) + 1
+
+    def to_dict(self):
+        return {
+            'requests': self.requests,
+            'bytes': self.bytes,
+            'seconds': round(self.seconds, 6),
+            'errors': self.errors,
+            'endpoints': dict(self.endpoints)
+        }
+
+
+def _calls(count):
+    return f'{count} call' if count == 1 else f'{count} calls'
+
+
+class RequestTiming:
+    """Where one web request spent its time: upstream services, parsing,
+    normalization and serialization"""
+
+    # Phases reported in Server-Timing, in order
+    PHASES = ('parse', 'normalize', 'search', 'serialize')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.lock = threading.Lock()
+        self.phases = {}
+        self.upstream = {}
+
+    def add(self, name, seconds):
+        with self.lock:
+            self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def add_upstream(self, service, seconds):
+        with self.lock:
+            calls, total = self.upstream.get(service, (0, 0.0))
+            self.upstream[service] = (calls + 1, total + seconds)
+
+    def accounted(self):
+        """Seconds already attributed to upstream calls and parsing"""
+        with self.lock:
+            return sum(total for _, total in self.upstream.values()) + self.phases.get('parse', 0.0)
+
+    def server_timing(self):
+        """Server-Timing header value (durations in milliseconds)"""
+        with self.lock:
+            upstream = sorted(self.upstream.items())
+            phases = dict(self.phases)
+        entries = [
+            f'{service};dur={total * 1000:.1f};desc="{_calls(calls)}"'
+            for service, (calls, total) in upstream
+        ]
+        entries += [f'{name};dur={phases[name] * 1000:.1f}' for name in self.PHASES if name in phases]
+        entries.append(f'upstream;desc="{_calls(sum(calls for _, (calls, _) in upstream))}"')
+        entries.append(f'total;dur={(time.perf_counter() - self.started) * 1000:.1f}')
+        return ', '.join(entries)
+
+    def to_dict(self):
+        with self.lock:
+            return {
+                'elapsed_ms': round((time.perf_counter() - self.started) * 1000, 1),
+                'upstream': {
+                    service: {'calls': calls, 'ms': round(total * 1000, 1)}
+                    for service, (calls, total) in self.upstream.items()
+                },
+                'upstream_calls': sum(calls for calls, _ in self.upstream.values()),
+                'phases_ms': {name: round(seconds * 1000, 1) for name, seconds in self.phases.items()}
+            }
+
+
+def start_request_timing():
+    """Begin timing a web request in the current context; returns (timing, token)"""
+    timing = RequestTiming()
+    return timing, _request_timing.set(timing)
+
+
+def end_request_timing(token):
+    _request_timing.reset(token)
+
+
+def current_request_timing():
+    return _request_timing.get()
+
+
+@contextmanager
+def timed(name):
+    """Add the block's duration to a phase of the current request, if one is being timed"""
+    timing = _request_timing.get()
+    if timing is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing.add(name, time.perf_counter() - started)
+
+
+class UpstreamStats:
+    """Process-wide totals of upstream requests per operation and endpoint"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.observers = []
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.by_operation = {}
+
+    def add_observer(self, callback):
+        """Register callback(operation, endpoint, size, seconds, error) for every request"""
+        self.observers.append(callback)
+
+    def record(self, operation, endpoint, size, seconds, error):
+        key = operation or 'unattributed'
+        with self.lock:
+            counts = self.by_operation.get(key)
+            if counts is None:
+                counts = self.by_operation[key] = RequestCount()
+            counts.add(endpoint, size, seconds, error)
+        for counter in _active_counters.get():
+            counter.add(endpoint, size, seconds, error)
+        timing = _request_timing.get()
+        if timing is not None:
+            timing.add_upstream(endpoint.partition(':')[0], seconds)
+        for callback in self.observers:
+            callback(operation, endpoint, size, seconds, error)
+
+    def snapshot(self):
+        with self.lock:
+            return {operation: counts.to_dict() for operation, counts in self.by_operation.items()}
+
+
+# Global upstream statistics instance
+upstream_stats = UpstreamStats()
+
+
+def current_operation():
+    return _current_operation.get()
+
+
+@contextmanager
+def operation(name):
+    """Attribute upstream requests made inside the block to an operation name.
+    Nested operations keep the outermost name so totals add up per entry point.
+    Time not spent on upstream calls or parsing counts as normalization."""
+    if _current_operation.get() is not None:
+        yield
+        return
+    token = _current_operation.set(name)
+    timing = _request_timing.get()
+    if timing is not None:
+        started = time.perf_counter()
+        accounted = timing.accounted()
+    try:
+        yield
+    finally:
+        _current_operation.reset(token)
+        if timing is not None:
+            elapsed = time.perf_counter() - started
+            timing.add('normalize', max(0.0, elapsed - (timing.accounted() - accounted)))
+
+
+def track_operation(func):
+    """Decorator attributing a method's upstream requests to its name"""
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with operation(func.__name__):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+@contextmanager
+def count_requests():
+    """Count upstream requests issued by the current thread inside the block"""
+    counter = RequestCount()
+    token = _active_counters.set(_active_counters.get() + (counter,))
+    try:
+        yield counter
+    finally:
+        _active_counters.reset(token)
+
+
+def count_failure():
+    """Count a failure that is not one upstream request, such as a source running past its time
+    budget, as an error in every active count_requests() block"""
+    for counter in _active_counters.get():
+        with counter.lock:
+            counter.errors += 1
+
+
+class InstrumentedSession(requests.Session):
+    """requests.Session that reports every request to upstream_stats.
+    A timeout, when given, applies to every request that does not set its own."""
+
+    def __init__(self, timeout=None):
+        super().__init__()
+        self.timeout = timeout
+
+    def request(self, method, url, *args, **kwargs):
+        if self.timeout is not None and kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        headers = dict(self.headers)
+        headers.update(kwargs.get('headers') or {})
+        started = time.perf_counter()
+        response = None
+        try:
+            response = super().request(method, url, *args, **kwargs)
+            return response
+        finally:
+            seconds = time.perf_counter() - started
+            if response is None:
+                size, error = 0, True
+            else:
+                error = response.status_code >= 400
+                if kwargs.get('stream'):
+                    size = int(response.headers.get('Content-Length') or 0)
+                else:
+                    size = len(response.content)
+            upstream_stats.record(_current_operation.get(), endpoint_label(url, headers), size, seconds, error)
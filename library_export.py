@@ -0,0 +1,164 @@
+import csv
+import gzip
+import hashlib
+import io
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+EXPORT_DIR = 'library_export'
+MANIFEST_FILE = 'manifest.json'
+FORMATS = ('ndjson', 'csv')
+# CSV columns per record kind; list values are joined with LIST_SEPARATOR
+CSV_FIELDS = {
+    'movies': ['title', 'original_title', 'year', 'rating', 'content_rating', 'duration', 'added_date',
+               'added_timestamp', 'studio', 'genres', 'director', 'writers', 'actors', 'country',
+               'originally_available_at', 'tagline', 'plex_key', 'guid', 'summary'],
+    'tv_shows': ['title', 'original_title', 'year', 'rating', 'content_rating', 'added_date', 'added_timestamp',
+                 'studio', 'network', 'status', 'genres', 'season_count', 'episode_count',
+                 'originally_available_at', 'plex_key', 'guid', 'summary'],
+    'episodes': ['show_title', 'show_rating_key', 'season', 'episode', 'title', 'duration', 'added_date',
+                 'added_timestamp', 'originally_available_at', 'rating_key', 'plex_key', 'guid'],
+}
+LIST_SEPARATOR = '; '
+HASH_CHUNK_BYTES = 1 << 20
+
+
+def export_dir_for(config):
+    """Export location, defaulting to a directory under the output directory"""
+    return config.get('library_export_dir') or os.path.join(
+        config.get('output_directory', './output'), EXPORT_DIR)
+
+
+def export_file_name(kind, fmt):
+    return f'{kind}.{fmt}.gz'
+
+
+def _csv_value(value):
+    if isinstance(value, list):
+        return LIST_SEPARATOR.join(v.get('name', '') if isinstance(v, dict) else str(v) for v in value)
+    return '' if value is None else value
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class _ExportWriter:
+    """The NDJSON and CSV files of one record kind, each a gzip stream into a temporary file.
+    Gzip headers carry no timestamp, so an unchanged library exports to identical checksums."""
+
+    def __init__(self, directory, kind):
+        self.kind = kind
+        self.records = 0
+        self.paths = {}
+        self._raw, self._text = [], {}
+        for fmt in FORMATS:
+            name = export_file_name(kind, fmt)
+            fd, temp_path = tempfile.mkstemp(prefix='.' + name + '.', suffix='.tmp', dir=directory)
+            raw = os.fdopen(fd, 'wb')
+            self._raw.append(raw)
+            self.paths[fmt] = temp_path
+            compressed = gzip.GzipFile(filename='', mode='wb', fileobj=raw, compresslevel=6, mtime=0)
+            self._text[fmt] = io.TextIOWrapper(compressed, encoding='utf-8', newline='')
+        self._csv = csv.DictWriter(self._text['csv'], CSV_FIELDS[kind], extrasaction='ignore')
+        self._csv.writeheader()
+
+    def write(self, record):
+        self._text['ndjson'].write(json.dumps(record, separators=(',', ':'), ensure_ascii=False) + '\n')
+        self._csv.writerow({field: _csv_value(record.get(field)) for field in CSV_FIELDS[self.kind]})
+        self.records += 1
+
+    def close(self):
+        for text in self._text.values():
+            text.close()
+        for raw in self._raw:
+            raw.close()
+
+    def discard(self):
+        self.close()
+        for temp_path in self.paths.values():
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+
+
+class LibraryExporter:
+    """Library exports stored on disk as gzip NDJSON and CSV per record kind, described by a
+    manifest with record counts, sizes and sha256 checksums, so downloads are plain file sends"""
+
+    def __init__(self):
+        self.build_lock = threading.Lock()
+        self._manifests = {}
+
+    def export(self, directory, records, generated_at):
+        """Write {kind: iterable of records} and the manifest. Records are streamed, so a kind
+        can be a generator over paged upstream requests. Files are moved into place once all
+        are written, and the manifest goes last, so readers never see a partial export."""
+        started = time.perf_counter()
+        os.makedirs(directory, exist_ok=True)
+        writers = []
+        try:
+            for kind, items in records.items():
+                writer = _ExportWriter(directory, kind)
+                writers.append(writer)
+                for record in items:
+                    writer.write(record)
+                writer.close()
+        except BaseException:
+            for writer in writers:
+                writer.discard()
+            raise
+
+        files = {}
+        for writer in writers:
+            for fmt, temp_path in writer.paths.items():
+                name = export_file_name(writer.kind, fmt)
+                os.chmod(temp_path, 0o644)
+                files[name] = {
+                    'kind': writer.kind,
+                    'format': fmt,
+                    'records': writer.records,
+                    'bytes': os.path.getsize(temp_path),
+                    'sha256': _sha256(temp_path)
+                }
+                os.replace(temp_path, os.path.join(directory, name))
+        manifest = {'generated_at': generated_at, 'build_seconds': round(time.perf_counter() - started, 3),
+                    'files': files}
+        fd, temp_path = tempfile.mkstemp(prefix='.' + MANIFEST_FILE + '.', suffix='.tmp', dir=directory)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, os.path.join(directory, MANIFEST_FILE))
+        return manifest
+
+    def load(self, directory):
+        """The latest export's manifest, or None when there is none yet. Cached per manifest
+        mtime, so exports written by other workers are picked up."""
+        path = os.path.join(directory, MANIFEST_FILE)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+        cached = self._manifests.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        try:
+            with open(path, 'r') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Could not read library export manifest: {str(e)}")
+            return None
+        self._manifests[path] = (mtime, manifest)
+        return manifest
+
+
+library_exports = LibraryExporter()
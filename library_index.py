@@ -0,0 +1,110 @@
+import threading
+import time
+
+# List fields of the all_content section, and the item type each holds
+LIST_TYPES = {'movies': 'movie', 'tv_shows': 'show'}
+# Queued changes kept for the next sync(); past this many they are dropped and the next
+# sync() rebuilds from the latest library, so an index nobody queries stays bounded
+MAX_PENDING = 32
+
+
+def bits_from_slots(slots, size):
+    """Bitset with the given slots set, built in a byte buffer rather than one big-int OR per slot"""
+    buffer = bytearray(size // 8 + 1)
+    for slot in slots:
+        buffer[slot >> 3] |= 1 << (slot & 7)
+    return int.from_bytes(buffer, 'little')
+
+
+def set_bits(bits, start=0, count=None):
+    """Positions of set bits in ascending order, skipping the first `start` of them"""
+    positions = []
+    binary = bin(bits)[:1:-1]
+    index = binary.find('1')
+    skipped = 0
+    while index != -1 and (count is None or len(positions) < count):
+        if skipped < start:
+            skipped += 1
+        else:
+            positions.append(index)
+        index = binary.find('1', index + 1)
+    return positions
+
+
+def bit_tester(bits):
+    """Fast membership test for a bitset: looks up a byte instead of shifting the whole int"""
+    mask = bits.to_bytes(bits.bit_length() // 8 + 1, 'little')
+    size = len(mask)
+    return lambda slot: (slot >> 3) < size and (mask[slot >> 3] >> (slot & 7)) & 1
+
+
+class LibraryIndex:
+    """Base for indexes derived from the cached library (the all_content dashboard section).
+    Published changes are queued by on_publish and applied on the next sync(), which queries
+    call first; a warm-up thread builds the index after the first publish, so a large build
+    never holds up the publisher. Subclasses implement build(library) and apply_delta(delta)."""
+
+    name = 'library'
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.built_at = None
+        self._pending_lock = threading.Lock()
+        self._pending = []
+        self._latest = None
+        self._warming = False
+        self._rebuild = False
+
+    def build(self, library):
+        raise NotImplementedError
+
+    def apply_delta(self, delta):
+        raise NotImplementedError
+
+    def _built(self):
+        self.built_at = time.time()
+
+    def has_library(self):
+        """Whether a library has been published to the index, so queries can be answered"""
+        return self.built_at is not None or self._latest is not None
+
+    def reset(self):
+        """Forget the library, so the next publish builds the index from scratch"""
+        with self.lock:
+            with self._pending_lock:
+                self._pending = []
+                self._latest = None
+                self._rebuild = False
+            self.built_at = None
+
+    def on_publish(self, section, data, delta):
+        """DashboardEvents observer: queue the change, and warm the index up after the first publish"""
+        if section != 'all_content':
+            return
+        with self._pending_lock:
+            self._latest = data
+            if self._rebuild or len(self._pending) >= MAX_PENDING:
+                self._pending, self._rebuild = [], True
+            else:
+                self._pending.append(delta)
+            warm = self.built_at is None and not self._warming
+            self._warming = self._warming or warm
+        if warm:
+            threading.Thread(target=self.sync, name=f'{self.name}-index', daemon=True).start()
+
+    def sync(self):
+        """Apply queued changes; build from the latest library when the index has never been built
+        or more changes arrived than are queued"""
+        with self.lock:
+            with self._pending_lock:
+                pending, self._pending = self._pending, []
+                rebuild, self._rebuild = self._rebuild, False
+                latest = self._latest
+                self._warming = False
+            if latest is None:
+                return
+            if self.built_at is None or rebuild:
+                self.build(latest)
+                return
+            for delta in pending:
+                self.apply_delta(delta)
@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+HTTP load generator for the media tracker web app.
+Starts a local Plex/Sonarr stand-in, boots app.py under the Flask dev server
+or gunicorn, drives a weighted mix of endpoints at fixed concurrency and
+reports throughput, latency percentiles, error rates and upstream calls.
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+import requests
+
+from upstream_stub import SyntheticLibrary, UpstreamStub
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+LOAD_TEST_API_KEY = 'loadtest' + 'x' * 24
+
+# name -> (path, requires API key)
+ENDPOINTS = {
+    'internal_status': ('/internal/status', False),
+    'internal_all_content': ('/internal/all_content', False),
+    'internal_schedule': ('/internal/schedule?days=7', False),
+    'internal_library_stats': ('/internal/library_stats', False),
+    'api_recent': ('/api/recent?days=7', True),
+    'api_all_content': ('/api/all_content', True),
+    'api_schedule': ('/api/schedule?days=7', True),
+    'api_full_sync': ('/api/full_sync?days=7', True),
+    'api_library_stats': ('/api/library_stats', True),
+    'dashboard': ('/dashboard', False),
+}
+
+MIXES = {
+    'dashboard': 'dashboard=1,internal_status=1,internal_all_content=1,internal_schedule=1,internal_library_stats=1',
+    'api': 'api_recent=4,api_schedule=4,api_all_content=1,api_library_stats=1,api_full_sync=1',
+    'all': ','.join(f'{name}=1' for name in ENDPOINTS),
+}
+
+
+def parse_mix(spec):
+    """Parse 'name=weight,...' (or a preset name) into a list of (name, weight)"""
+    spec = MIXES.get(spec, spec)
+    mix = []
+    for part in spec.split(','):
+        name, _, weight = part.strip().partition('=')
+        if name not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint '{name}'. Choose from: {', '.join(ENDPOINTS)}")
+        mix.append((name, float(weight or 1)))
+    return mix
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def prepare_workdir(upstream_url, extra_config=None):
+    """Create a throwaway working directory with config.json and api_keys.json"""
+    workdir = tempfile.mkdtemp(prefix='media-tracker-load-')
+    config = {
+        'plex_url': upstream_url,
+        'plex_token': 'load-test-token',
+        'sonarr_url': upstream_url,
+        'sonarr_api_key': 'load-test-key',
+        'output_directory': os.path.join(workdir, 'output'),
+        'github_enabled': False,
+        'scheduler_enabled': False,
+    }
+    config.update(extra_config or {})
+    with open(os.path.join(workdir, 'config.json'), 'w') as f:
+        json.dump(config, f, indent=2)
+    with open(os.path.join(workdir, 'api_keys.json'), 'w') as f:
+        json.dump({LOAD_TEST_API_KEY: {
+            'name': 'load-test',
+            'is_active': True,
+            'created_at': '2025-01-01T00:00:00',
+            'last_used': None,
+            'usage_count': 0
+        }}, f, indent=2)
+    return workdir
+
+
+def start_app(server, workdir, port, workers=2, threads=4):
+    """Start app.py under the chosen server in workdir and return the process"""
+    env = dict(os.environ, PYTHONPATH=REPO_DIR + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    if server == 'gunicorn':
+        cmd = [
+            sys.executable, '-m', 'gunicorn',
+            '--bind', f'127.0.0.1:{port}',
+            '--workers', str(workers),
+            '--threads', str(threads),
+            '--log-level', 'warning',
+            'app:app'
+        ]
+    else:
+        cmd = [
+            sys.executable, '-c',
+            'import logging; from app import app; logging.disable(logging.INFO); '
+            f'app.run(host="127.0.0.1", port={port}, threaded=True, debug=False)'
+        ]
+    return subprocess.Popen(cmd, cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def wait_for_port(port, process, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"App server exited early with code {process.returncode}")
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"App server did not start listening on port {port}")
+
+
+def stop_app(process):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def response_ok(response):
+    """A response counts as an error on non-2xx status or a JSON success=false body"""
+    if response.status_code >= 400:
+        return False
+    if response.headers.get('Content-Type', '').startswith('application/json'):
+        try:
+            body = response.json()
+        except ValueError:
+            return False
+        if isinstance(body, dict) and (body.get('success') is False or 'error' in body):
+            return False
+    return True
+
+
+class LoadRunner:
+    """Drives a weighted endpoint mix against a base URL from N client threads"""
+
+    def __init__(self, base_url, mix, concurrency=4, duration=10.0, requests_limit=None, seed=None):
+        self.base_url = base_url.rstrip('/')
+        self.names = [name for name, _ in mix]
+        self.weights = [weight for _, weight in mix]
+        self.concurrency = concurrency
+        self.duration = duration
+        self.requests_limit = requests_limit
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.issued = 0
+
+    def _next_endpoint(self):
+        with self.lock:
+            if self.requests_limit is not None and self.issued >= self.requests_limit:
+                return None
+            self.issued += 1
+            return self.rng.choices(self.names, self.weights)[0]
+
+    def _worker(self, deadline):
+        session = requests.Session()
+        while time.time() < deadline:
+            name = self._next_endpoint()
+            if name is None:
+                break
+            path, needs_key = ENDPOINTS[name]
+            headers = {'X-API-Key': LOAD_TEST_API_KEY} if needs_key else {}
+            started = time.perf_counter()
+            try:
+                response = session.get(self.base_url + path, headers=headers, timeout=120)
+                ok = response_ok(response)
+            except requests.RequestException:
+                ok = False
+            elapsed = time.perf_counter() - started
+            with self.lock:
+                self.latencies[name].append(elapsed)
+                if not ok:
+                    self.errors[name] += 1
+
+    def run(self):
+        deadline = time.time() + self.duration
+        started = time.perf_counter()
+        threads = [
+            threading.Thread(target=self._worker, args=(deadline,), daemon=True)
+            for _ in range(self.concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - started
+
+
+def summarize(runner, wall_time, upstream_calls):
+    """Build a report dict of per-endpoint and overall statistics"""
+    rows = {}
+    all_latencies = []
+    total_errors = 0
+    for name in runner.names:
+        values = sorted(runner.latencies.get(name, []))
+        if not values:
+            continue
+        all_latencies.extend(values)
+        total_errors += runner.errors.get(name, 0)
+        rows[name] = {
+            'requests': len(values),
+            'errors': runner.errors.get(name, 0),
+            'error_rate': runner.errors.get(name, 0) / len(values),
+            'rps': len(values) / wall_time if wall_time else 0.0,
+            'p50_ms': percentile(values, 50) * 1000,
+            'p95_ms': percentile(values, 95) * 1000,
+            'p99_ms': percentile(values, 99) * 1000,
+        }
+    all_latencies.sort()
+    total = len(all_latencies)
+    return {
+        'duration_s': wall_time,
+        'requests': total,
+        'throughput_rps': total / wall_time if wall_time else 0.0,
+        'error_rate': total_errors / total if total else 0.0,
+        'p50_ms': percentile(all_latencies, 50) * 1000,
+        'p95_ms': percentile(all_latencies, 95) * 1000,
+        'p99_ms': percentile(all_latencies, 99) * 1000,
+        'upstream_calls': upstream_calls,
+        'upstream_calls_per_request': upstream_calls / total if total else 0.0,
+        'endpoints': rows,
+    }
+
+
+def print_report(label, report):
+    print(f"\n=== {label} ===")
+    print(f"Requests: {report['requests']} in {report['duration_s']:.1f}s "
+          f"({report['throughput_rps']:.1f} req/s), error rate {report['error_rate']:.1%}")
+    print(f"Latency p50/p95/p99: {report['p50_ms']:.1f} / {report['p95_ms']:.1f} / {report['p99_ms']:.1f} ms")
+    print(f"Upstream calls: {report['upstream_calls']} ({report['upstream_calls_per_request']:.2f} per request)")
+    print(f"{'endpoint':<24}{'reqs':>7}{'err%':>7}{'rps':>8}{'p50ms':>9}{'p95ms':>9}{'p99ms':>9}")
+    for name, row in report['endpoints'].items():
+        print(f"{name:<24}{row['requests']:>7}{row['error_rate'] * 100:>6.1f}%{row['rps']:>8.1f}"
+              f"{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}")
+
+
+def run_scenario(server, args, stub):
+    """Boot the app under one server configuration, run the load and tear down"""
+    workdir = prepare_workdir(stub.url)
+    port = free_port()
+    process = start_app(server, workdir, port, workers=args.workers, threads=args.threads)
+    try:
+        wait_for_port(port, process)
+        base_url = f'http://127.0.0.1:{port}'
+        mix = parse_mix(args.mix)
+        # Warm up every endpoint once so imports and first-hit costs are excluded
+        for name, _ in mix:
+            requests.get(base_url + ENDPOINTS[name][0], headers={'X-API-Key': LOAD_TEST_API_KEY}, timeout=120)
+        stub.reset_counts()
+        runner = LoadRunner(base_url, mix, concurrency=args.concurrency, duration=args.duration,
+                            requests_limit=args.requests, seed=args.seed)
+        wall_time = runner.run()
+        return summarize(runner, wall_time, stub.total_requests)
+    finally:
+        stop_app(process)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the media tracker Flask endpoints')
+    parser.add_argument('--server', choices=['dev', 'gunicorn', 'both'], default='dev',
+                        help='Server configuration to boot app.py under')
+    parser.add_argument('--url', help='Load an already running instance (point its config at the stand-in to count upstream calls)')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn worker processes')
+    parser.add_argument('--threads', type=int, default=4, help='gunicorn threads per worker')
+    parser.add_argument('--concurrency', type=int, default=4, help='Concurrent client connections')
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds to run each scenario')
+    parser.add_argument('--requests', type=int, help='Stop after this many requests')
+    parser.add_argument('--mix', default='all',
+                        help=f"Preset ({', '.join(MIXES)}) or 'endpoint=weight,...'")
+    parser.add_argument('--movies', type=int, default=200, help='Synthetic library movie count')
+    parser.add_argument('--shows', type=int, default=40, help='Synthetic library show count')
+    parser.add_argument('--upstream-latency', type=float, default=0.0,
+                        help='Seconds of delay the stand-in adds to each upstream response')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+    args = parser.parse_args()
+
+    library = SyntheticLibrary(movies=args.movies, shows=args.shows)
+    reports = {}
+    with UpstreamStub(library, latency=args.upstream_latency) as stub:
+        if args.url:
+            stub.reset_counts()
+            runner = LoadRunner(args.url, parse_mix(args.mix), concurrency=args.concurrency,
+                                duration=args.duration, requests_limit=args.requests, seed=args.seed)
+            wall_time = runner.run()
+            reports['external'] = summarize(runner, wall_time, stub.total_requests)
+        else:
+            servers = ['dev', 'gunicorn'] if args.server == 'both' else [args.server]
+            for server in servers:
+                reports[server] = run_scenario(server, args, stub)
+
+    if args.json:
+        print(json.dumps(reports, indent=2))
+    else:
+        for label, report in reports.items():
+            print_report(label, report)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,17 +2,31 @@ import requests
 import json
 import os
 import logging
-import base64
+import xml.etree.ElementTree as ET
+from contextlib import nullcontext
 from datetime import datetime, timedelta
 from urllib.parse import urljoin
+from artwork_cache import artwork_url
+from dashboard_events import dashboard_events
+from facet_index import facet_index
+from github_publisher import GitHubPublisher, DEFAULT_API_URL
+from instrumentation import InstrumentedSession, track_operation, count_requests, timed
+from report_writers import write_reports
+from sync_history import PhaseTimer, SyncHistory, build_entry, history_file_for
 
 class MediaTracker:
     """Handles API connections and data processing for Plex and Sonarr"""
     
-    def __init__(self, config):
+    def __init__(self, config, library_max_age=None, phase_timer=None):
         self.config = config
-        self.session = requests.Session()
+        self.session = InstrumentedSession(timeout=config.get('upstream_timeout_seconds'))
+        # Seconds the cached library may be old and still answer recently-added queries
+        self.library_max_age = int(config.get('library_cache_seconds', 60)) if library_max_age is None else library_max_age
+        # Timer of the sync run the tracker's calls belong to, if any
+        self.phase_timer = phase_timer
+        self.output_files = []
     
+    @track_operation
     def test_plex_connection(self):
         """Test connection to Plex API"""
         try:
@@ -40,6 +54,7 @@ class MediaTracker:
             logging.error(f"Plex connection failed: {str(e)}")
             return False
     
+    @track_operation
     def test_sonarr_connection(self):
         """Test connection to Sonarr API"""
         try:
@@ -70,6 +85,7 @@ class MediaTracker:
             logging.error(f"Sonarr connection failed: {str(e)}")
             return False
     
+    @track_operation
     def get_plex_recent_content(self):
         """Get movies and TV shows added to Plex today"""
         movies = []
@@ -84,12 +100,12 @@ class MediaTracker:
             url = urljoin(self.config['plex_url'], '/library/sections')
             headers = {'X-Plex-Token': self.config['plex_token']}
             
-            response = self.session.get(url, headers=headers)
-            response.raise_for_status()
-            
-            # Parse XML response (Plex returns XML)
-            import xml.etree.ElementTree as ET
-            root = ET.fromstring(response.content)
+            with self._phase('plex.sections'):
+                response = self.session.get(url, headers=headers)
+                response.raise_for_status()
+                
+                # Parse XML response (Plex returns XML)
+                root = self._parse_xml(response)
             
             today = datetime.now().date()
             yesterday = today - timedelta(days=1)
@@ -104,11 +120,12 @@ class MediaTracker:
                 if library_type in ['movie', 'show']:
                     # Get recently added items from this library
                     recent_url = urljoin(self.config['plex_url'], f'/library/sections/{library_key}/recentlyAdded')
-                    recent_response = self.session.get(recent_url, headers=headers, timeout=30)
-                    recent_response.raise_for_status()
-                    
-                    recent_root = ET.fromstring(recent_response.content)
-                    all_items = recent_root.findall('.//Video')
+                    with self._phase(f'plex.library.{library_title}'):
+                        recent_response = self.session.get(recent_url, headers=headers, timeout=30)
+                        recent_response.raise_for_status()
+                        
+                        recent_root = self._parse_xml(recent_response)
+                        all_items = recent_root.findall('.//Video')
                     logging.info(f"Found {len(all_items)} total items in {library_title}")
                     
                     for item in all_items:
@@ -138,6 +155,7 @@ class MediaTracker:
         
         return movies, tv_shows
     
+    @track_operation
     def get_sonarr_today_schedule(self):
         """Get TV shows scheduled for today from Sonarr"""
         scheduled_shows = []
@@ -152,20 +170,9 @@ class MediaTracker:
             tomorrow = (datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d')
             logging.info(f"Getting Sonarr schedule for {today} to {tomorrow}")
             
-            # First get all series to create a lookup table
-            series_url = urljoin(self.config['sonarr_url'], '/api/v3/series')
             headers = {'X-Api-Key': self.config['sonarr_api_key']}
             
-            logging.info(f"Fetching series from {series_url}")
-            series_response = self.session.get(series_url, headers=headers)
-            series_response.raise_for_status()
-            all_series = series_response.json()
-            logging.info(f"Found {len(all_series)} series in Sonarr")
-            
-            # Create a lookup dictionary for series ID to title
-            series_lookup = {series['id']: series['title'] for series in all_series}
-            
-            # Now get the calendar data with unmonitored=false to get all shows
+            # Get the calendar data with unmonitored=false to get all shows
             calendar_url = urljoin(self.config['sonarr_url'], '/api/v3/calendar')
             params = {
                 'start': today,
@@ -175,12 +182,16 @@ class MediaTracker:
             }
             
             logging.info(f"Fetching calendar from {calendar_url} with params: {params}")
-            calendar_response = self.session.get(calendar_url, headers=headers, params=params)
-            calendar_response.raise_for_status()
-            
-            calendar_data = calendar_response.json()
+            with self._phase('sonarr.calendar'):
+                calendar_response = self.session.get(calendar_url, headers=headers, params=params)
+                calendar_response.raise_for_status()
+                
+                calendar_data = self._parse_json(calendar_response)
             logging.info(f"Found {len(calendar_data)} episodes in calendar")
             
+            # Series come embedded in the calendar (includeSeries=true)
+            series_lookup = self._get_sonarr_series_lookup(self.config['sonarr_url'], headers, calendar_data)
+            
             # Log the first episode's data to see what we're getting
             if calendar_data:
                 first_episode = calendar_data[0]
@@ -200,7 +211,7 @@ class MediaTracker:
                         
                         if air_date_obj.date() == today_obj.date():
                             series_id = episode.get('seriesId')
-                            series_title = series_lookup.get(series_id, 'Unknown Series')
+                            series_title = series_lookup.get(series_id, {}).get('title', 'Unknown Series')
                             logging.info(f"Found episode airing today: {series_title} S{episode.get('seasonNumber')}E{episode.get('episodeNumber')}")
                             
                             scheduled_shows.append({
@@ -223,110 +234,35 @@ class MediaTracker:
         logging.info(f"Returning {len(scheduled_shows)} scheduled shows for today")
         return scheduled_shows
     
+    @track_operation
     def write_to_files(self, movies, tv_shows, scheduled_shows):
-        """Write collected data to text files using custom format"""
+        """Write collected data to every configured report format (text, json, csv, markdown, html)"""
+        self.output_files = []
         try:
             output_dir = self.config['output_directory']
-            os.makedirs(output_dir, exist_ok=True)
-            
-            today_str = datetime.now().strftime('%Y-%m-%d')
-            timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S') if self.config.get('include_timestamps', True) else ''
-            
-            # Get custom formats
-            movie_format = self.config.get('movie_format', 'Title: {title}\nYear: {year}\nAdded: {added_date}\n{separator}')
-            tv_format = self.config.get('tv_format', 'Title: {title}\nYear: {year}\nAdded: {added_date}\n{separator}')
-            schedule_format = self.config.get('schedule_format', 'Series: {series_title}\nEpisode: S{season:02d}E{episode:02d} - {episode_title}\nAir Date: {air_date}\n{separator}')
-            file_naming = self.config.get('file_naming', 'date_suffix')
-            
-            # Single output file
-            if file_naming == 'custom':
-                output_file = os.path.join(output_dir, self.config.get('single_output_file', 'media_tracker.txt'))
-            elif file_naming == 'date_prefix':
-                output_file = os.path.join(output_dir, f'{today_str}_media_tracker.txt')
-            else:  # date_suffix (default)
-                output_file = os.path.join(output_dir, f'media_tracker_{today_str}.txt')
-            
-            # Write all data to single file
-            with open(output_file, 'w') as f:
-                # Header
-                report_title = self.config.get('report_title', 'Media Tracker Report')
-                header = f"{report_title} - {today_str}"
-                if timestamp:
-                    header += f" (Generated: {timestamp})"
-                f.write(header + "\n")
-                f.write("=" * len(header) + "\n\n")
-                
-                logging.info(f"Writing file with: {len(movies)} movies, {len(tv_shows)} TV shows, {len(scheduled_shows)} scheduled shows")
-                logging.info(f"Section toggles - Movies: {self.config.get('include_movies', True)}, TV: {self.config.get('include_tv_shows', True)}, Schedule: {self.config.get('include_tv_calendar', True)}")
-                
-                # Movies section
-                if self.config.get('include_movies', True):
-                    movies_title = self.config.get('movies_title', 'PLEX MOVIES ADDED')
-                    f.write(f"{movies_title}\n")
-                    f.write("=" * len(movies_title) + "\n")
-                    if movies:
-                        for movie in movies:
-                            content = movie_format.format(
-                                title=movie['title'],
-                                year=movie['year'],
-                                added_date=movie['added_date'],
-                                separator="-" * 30
-                            )
-                            f.write(content + "\n")
-                    else:
-                        no_movies_text = self.config.get('no_movies_text', 'No movies added recently.')
-                        f.write(f"{no_movies_text}\n\n")
-                
-                # TV Shows section
-                if self.config.get('include_tv_shows', True):
-                    tv_shows_title = self.config.get('tv_shows_title', 'PLEX TV SHOWS ADDED')
-                    f.write(f"\n{tv_shows_title}\n")
-                    f.write("=" * len(tv_shows_title) + "\n")
-                    if tv_shows:
-                        for show in tv_shows:
-                            content = tv_format.format(
-                                title=show['title'],
-                                year=show['year'],
-                                added_date=show['added_date'],
-                                separator="-" * 30
-                            )
-                            f.write(content + "\n")
-                    else:
-                        no_tv_text = self.config.get('no_tv_text', 'No TV shows added recently.')
-                        f.write(f"{no_tv_text}\n\n")
-                
-                # Schedule section
-                if self.config.get('include_tv_calendar', True):
-                    tv_calendar_title = self.config.get('tv_calendar_title', 'TV SHOWS AIRING TODAY')
-                    f.write(f"\n{tv_calendar_title}\n")
-                    f.write("=" * len(tv_calendar_title) + "\n")
-                    if scheduled_shows:
-                        for show in scheduled_shows:
-                            content = schedule_format.format(
-                                series_title=show['series_title'],
-                                episode_title=show['episode_title'],
-                                season=show['season'],
-                                episode=show['episode'],
-                                air_date=show['air_date'],
-                                separator="-" * 30
-                            )
-                            f.write(content + "\n")
-                    else:
-                        no_schedule_text = self.config.get('no_schedule_text', 'No shows scheduled for today.')
-                        f.write(f"{no_schedule_text}\n")
             
-            logging.info(f"Files written successfully to {output_dir}")
+            logging.info(f"Writing file with: {len(movies)} movies, {len(tv_shows)} TV shows, {len(scheduled_shows)} scheduled shows")
+            logging.info(f"Section toggles - Movies: {self.config.get('include_movies', True)}, TV: {self.config.get('include_tv_shows', True)}, Schedule: {self.config.get('include_tv_calendar', True)}")
+            
+            # All formats render from the same collected data in parallel; each file is replaced atomically
+            with self._phase('report.write'):
+                written, errors, timings = write_reports(self.config, movies, tv_shows, scheduled_shows)
+            self.output_files = list(written.values())
             
-            # Upload to GitHub if enabled
-            if self.config.get('github_enabled', False):
-                self.upload_to_github([output_file])
+            for name, seconds in timings.items():
+                logging.info(f"Wrote {name} report to {written[name]} in {seconds:.3f}s")
+            if errors:
+                logging.error(f"Failed report formats: {', '.join(errors)}")
+                return False
             
+            logging.info(f"Files written successfully to {output_dir}")
             return True
             
         except Exception as e:
             logging.error(f"Error writing files: {str(e)}")
             return False
     
+    @track_operation
     def test_github_connection(self):
         """Test GitHub API connection"""
         try:
@@ -342,7 +278,8 @@ class MediaTracker:
             
             # Test by getting repository info
             full_repo = f"{owner}/{repo}"
-            url = f"https://api.github.com/repos/{full_repo}"
+            api_url = (self.config.get('github_api_url') or DEFAULT_API_URL).rstrip('/')
+            url = f"{api_url}/repos/{full_repo}"
             headers = {
                 'Authorization': f'token {token}',
                 'Accept': 'application/vnd.github.v3+json'
@@ -358,76 +295,58 @@ class MediaTracker:
             logging.error(f"GitHub connection failed: {str(e)}")
             return False
     
+    @track_operation
     def upload_to_github(self, file_paths):
-        """Upload files to GitHub repository"""
+        """Publish report files to GitHub in a single commit, skipping files that are unchanged remotely"""
         try:
             owner = self.config.get('github_owner', '')
             repo = self.config.get('github_repo', '')
             token = self.config.get('github_token', '')
-            branch = self.config.get('github_branch', 'main')
             
             if not owner or not repo or not token:
                 logging.error("GitHub owner, repository, or token not configured")
                 return False
             
-            full_repo = f"{owner}/{repo}"
-            
-            headers = {
-                'Authorization': f'token {token}',
-                'Accept': 'application/vnd.github.v3+json'
-            }
+            # Reports live at the repository root under their file names
+            files = {os.path.basename(path): path for path in file_paths if os.path.exists(path)}
+            if not files:
+                logging.warning("No report files to upload to GitHub")
+                return False
             
-            for file_path in file_paths:
-                if not os.path.exists(file_path):
-                    continue
-                    
-                # Read file content
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                
-                # Encode content to base64
-                content_encoded = base64.b64encode(content.encode('utf-8')).decode('utf-8')
-                
-                # Get just the filename for GitHub
-                filename = os.path.basename(file_path)
-                
-                # Check if file already exists to get SHA
-                check_url = f"https://api.github.com/repos/{full_repo}/contents/{filename}"
-                check_params = {'ref': branch}
-                check_response = self.session.get(check_url, headers=headers, params=check_params, timeout=30)
-                
-                # Prepare the commit data
-                commit_data = {
-                    'message': f'Update media tracker: {filename}',
-                    'content': content_encoded,
-                    'branch': branch
-                }
-                
-                # If file exists, include the SHA for update
-                if check_response.status_code == 200:
-                    existing_file = check_response.json()
-                    commit_data['sha'] = existing_file['sha']
-                
-                # Upload/update the file
-                upload_url = f"https://api.github.com/repos/{full_repo}/contents/{filename}"
-                response = self.session.put(upload_url, headers=headers, json=commit_data, timeout=30)
-                
-                if response.status_code in [200, 201]:
-                    logging.info(f"Successfully uploaded {filename} to GitHub")
-                else:
-                    logging.error(f"Failed to upload {filename} to GitHub: {response.status_code} - {response.text}")
+            publisher = GitHubPublisher.from_config(self.config, session=self.session, phase=self._phase)
+            result = publisher.publish(files, f"Update media tracker reports {datetime.now().strftime('%Y-%m-%d')}")
             
+            if result['commit']:
+                logging.info(f"Committed {len(result['changed'])} changed file(s) to GitHub in {result['commit'][:7]}; "
+                             f"{len(result['unchanged'])} unchanged")
+            else:
+                logging.info(f"All {len(result['unchanged'])} file(s) already up to date on GitHub")
             return True
             
         except Exception as e:
             logging.error(f"Error uploading to GitHub: {str(e)}")
             return False
     
+    def _indexed_recent(self, since, limit=None):
+        """(movies, tv_shows) added since an epoch timestamp, newest first, answered from the
+        library index while the cached library it holds is fresh; None otherwise"""
+        if not facet_index.has_library() or not dashboard_events.is_fresh('all_content', self.library_max_age):
+            return None
+        recent = facet_index.added_between(since, None, limit)
+        return recent['movies'], recent['tv_shows']
+    
+    @track_operation
     def get_plex_recent_content_extended(self, days=7):
-        """Get movies and TV shows added to Plex in the last N days with extended metadata"""
+        """Get movies and TV shows added to Plex in the last N days with extended metadata.
+        Served from the library index while it holds a fresh library; the Plex fallback only
+        sees the 100 most recently added items."""
         movies = []
         tv_shows = []
         
+        indexed = self._indexed_recent(int((datetime.now() - timedelta(days=days)).timestamp()))
+        if indexed is not None:
+            return indexed
+        
         try:
             plex_url = self.config.get('plex_url', '').strip()
             plex_token = self.config.get('plex_token', '').strip()
@@ -447,13 +366,13 @@ class MediaTracker:
             
             # Get recently added content
             url = urljoin(plex_url, '/library/recentlyAdded')
-            headers = {'X-Plex-Token': plex_token}
+            headers = {'X-Plex-Token': plex_token, 'Accept': 'application/json'}
             params = {'X-Plex-Container-Start': '0', 'X-Plex-Container-Size': '100'}
             
             response = self.session.get(url, headers=headers, params=params)
             response.raise_for_status()
             
-            data = response.json()
+            data = self._parse_json(response)
             
             if 'MediaContainer' in data and 'Metadata' in data['MediaContainer']:
                 for item in data['MediaContainer']['Metadata']:
@@ -469,8 +388,8 @@ class MediaTracker:
                             'rating': item.get('rating', 'Not Rated'),
                             'summary': item.get('summary', ''),
                             'duration': item.get('duration', 0),
-                            'thumb': item.get('thumb', ''),
-                            'art': item.get('art', ''),
+                            'thumb': self._artwork_url(item.get('thumb', '')) or '',
+                            'art': self._artwork_url(item.get('art', '')) or '',
                             'genres': [genre.get('tag', '') for genre in item.get('Genre', [])],
                             'studio': item.get('studio', ''),
                             'content_rating': item.get('contentRating', ''),
@@ -508,6 +427,7 @@ class MediaTracker:
         
         return movies, tv_shows
     
+    @track_operation
     def get_plex_all_content(self):
         """Get all movies and TV shows from Plex library"""
         movies = []
@@ -533,16 +453,7 @@ class MediaTracker:
             response.raise_for_status()
             
             # Parse XML response (Plex returns XML)
-            import xml.etree.ElementTree as ET
-            root = ET.fromstring(response.content)
-            
-            # Helper function to get full artwork URL
-            def get_artwork_url(thumb_path):
-                if not thumb_path:
-                    return None
-                if thumb_path.startswith('http'):
-                    return thumb_path
-                return urljoin(plex_url, f'{thumb_path}?X-Plex-Token={plex_token}')
+            root = self._parse_xml(response)
             
             # Iterate through each library section
             for section in root.findall('.//Directory'):
@@ -553,95 +464,25 @@ class MediaTracker:
                 if section_type == 'movie':
                     # Get all movies from this section
                     section_url = urljoin(plex_url, f'/library/sections/{section_key}/all')
-                    section_response = self.session.get(section_url, headers=headers)
+                    section_response = self.session.get(section_url, headers=headers, params={'includeGuids': '1'})
                     section_response.raise_for_status()
                     
-                    section_root = ET.fromstring(section_response.content)
+                    section_root = self._parse_xml(section_response)
                     for item in section_root.findall('.//Video'):
-                        thumb = item.get('thumb', '')
-                        art = item.get('art', '')
-                        
-                        content_item = {
-                            'title': item.get('title', 'Unknown'),
-                            'year': item.get('year', 'Unknown'),
-                            'rating': item.get('rating', 'Not Rated'),
-                            'duration': int(item.get('duration', 0)) if item.get('duration') else 0,
-                            'duration_formatted': self._format_duration(int(item.get('duration', 0)) if item.get('duration') else 0),
-                            'summary': item.get('summary', ''),
-                            'added_date': datetime.fromtimestamp(int(item.get('addedAt', 0))).strftime('%Y-%m-%d') if item.get('addedAt') else 'Unknown',
-                            'studio': item.get('studio', ''),
-                            'content_rating': item.get('contentRating', ''),
-                            'thumb': get_artwork_url(thumb),
-                            'art': get_artwork_url(art),
-                            'genres': [genre.get('tag', '') for genre in item.findall('.//Genre')],
-                            'plex_key': item.get('key', ''),
-                            'guid': item.get('guid', ''),
-                            'director': [director.get('tag', '') for director in item.findall('.//Director')],
-                            'writers': [writer.get('tag', '') for writer in item.findall('.//Writer')],
-                            'actors': [{'name': actor.get('tag', ''), 'role': actor.get('role', '')} for actor in item.findall('.//Role')[:10]],
-                            'country': [country.get('tag', '') for country in item.findall('.//Country')],
-                            'tagline': item.get('tagline', ''),
-                            'originally_available_at': item.get('originallyAvailableAt', '')
-                        }
-                        movies.append(content_item)
+                        movies.append(self._movie_item(item))
                 
                 elif section_type == 'show':
                     # For TV shows, we need to use the correct endpoint
                     section_url = urljoin(plex_url, f'/library/sections/{section_key}/all')
-                    section_response = self.session.get(section_url, headers=headers)
+                    section_response = self.session.get(section_url, headers=headers, params={'includeGuids': '1'})
                     section_response.raise_for_status()
                     
-                    section_root = ET.fromstring(section_response.content)
-                    for show in section_root.findall('.//Directory'):
-                        # Get the show's rating key for detailed info
-                        rating_key = show.get('ratingKey')
-                        if rating_key:
-                            # Get detailed show info using the rating key
-                            show_url = urljoin(plex_url, f'/library/metadata/{rating_key}')
-                            show_response = self.session.get(show_url, headers=headers)
-                            show_response.raise_for_status()
-                            
-                            show_root = ET.fromstring(show_response.content)
-                            show_item = show_root.find('.//Directory')
-                            
-                            if show_item is not None:
-                                thumb = show_item.get('thumb', '')
-                                art = show_item.get('art', '')
-                                
-                                # Get season count
-                                seasons_url = urljoin(plex_url, f'/library/metadata/{rating_key}/children')
-                                seasons_response = self.session.get(seasons_url, headers=headers)
-                                seasons_response.raise_for_status()
-                                seasons_root = ET.fromstring(seasons_response.content)
-                                season_count = len(seasons_root.findall('.//Directory'))
-                                
-                                # Get episode count
-                                episodes_url = urljoin(plex_url, f'/library/metadata/{rating_key}/allLeaves')
-                                episodes_response = self.session.get(episodes_url, headers=headers)
-                                episodes_response.raise_for_status()
-                                episodes_root = ET.fromstring(episodes_response.content)
-                                episode_count = len(episodes_root.findall('.//Video'))
-                                
-                                content_item = {
-                                    'title': show_item.get('title', 'Unknown'),
-                                    'year': show_item.get('year', 'Unknown'),
-                                    'rating': show_item.get('rating', 'Not Rated'),
-                                    'summary': show_item.get('summary', ''),
-                                    'added_date': datetime.fromtimestamp(int(show_item.get('addedAt', 0))).strftime('%Y-%m-%d') if show_item.get('addedAt') else 'Unknown',
-                                    'studio': show_item.get('studio', ''),
-                                    'content_rating': show_item.get('contentRating', ''),
-                                    'thumb': get_artwork_url(thumb),
-                                    'art': get_artwork_url(art),
-                                    'genres': [genre.get('tag', '') for genre in show_item.findall('.//Genre')],
-                                    'plex_key': show_item.get('key', ''),
-                                    'guid': show_item.get('guid', ''),
-                                    'episode_count': episode_count,
-                                    'season_count': season_count,
-                                    'originally_available_at': show_item.get('originallyAvailableAt', ''),
-                                    'network': show_item.get('network', ''),
-                                    'status': show_item.get('status', '')
-                                }
-                                tv_shows.append(content_item)
+                    section_root = self._parse_xml(section_response)
+                    for show_item in section_root.findall('.//Directory'):
+                        # The section listing already carries the show's metadata and
+                        # season/episode counts, so no per-show requests are needed
+                        if show_item.get('ratingKey'):
+                            tv_shows.append(self._show_item(show_item))
             
         except Exception as e:
             logging.error(f"Error getting all Plex content: {str(e)}")
@@ -649,6 +490,72 @@ class MediaTracker:
         
         return movies, tv_shows
     
+    def iter_plex_episodes(self, page_size=5000):
+        """Yield every episode of the Plex TV sections, fetched a page at a time with the
+        section-wide episode listing (type=4) rather than one request per show"""
+        plex_url = self.config.get('plex_url', '').strip()
+        plex_token = self.config.get('plex_token', '').strip()
+        if not plex_url or not plex_token:
+            raise ValueError('Plex URL or token not configured')
+        if not plex_url.startswith(('http://', 'https://')):
+            plex_url = 'http://' + plex_url
+        headers = {'X-Plex-Token': plex_token}
+        
+        response = self.session.get(urljoin(plex_url, '/library/sections'), headers=headers)
+        response.raise_for_status()
+        for section in self._parse_xml(response).findall('.//Directory'):
+            if section.get('type') != 'show':
+                continue
+            section_url = urljoin(plex_url, f"/library/sections/{section.get('key')}/all")
+            start = 0
+            while True:
+                params = {'type': '4', 'X-Plex-Container-Start': str(start), 'X-Plex-Container-Size': str(page_size)}
+                page = self.session.get(section_url, headers=headers, params=params)
+                page.raise_for_status()
+                episodes = self._parse_xml(page).findall('.//Video')
+                for episode in episodes:
+                    yield self._episode_item(episode)
+                start += len(episodes)
+                if len(episodes) < page_size:
+                    break
+
+    def iter_plex_media(self, page_size=5000):
+        """Yield every movie and episode with its media versions and their file sizes. Section
+        listings are fetched a page at a time and streamed through iterparse, each element freed
+        once read, so only one item is held in memory however large the library."""
+        plex_url = self.config.get('plex_url', '').strip()
+        plex_token = self.config.get('plex_token', '').strip()
+        if not plex_url or not plex_token:
+            raise ValueError('Plex URL or token not configured')
+        if not plex_url.startswith(('http://', 'https://')):
+            plex_url = 'http://' + plex_url
+        headers = {'X-Plex-Token': plex_token}
+
+        response = self.session.get(urljoin(plex_url, '/library/sections'), headers=headers)
+        response.raise_for_status()
+        for section in self._parse_xml(response).findall('.//Directory'):
+            if section.get('type') == 'movie':
+                params = {}
+            elif section.get('type') == 'show':
+                params = {'type': '4'}
+            else:
+                continue
+            section_url = urljoin(plex_url, f"/library/sections/{section.get('key')}/all")
+            start = 0
+            while True:
+                page = dict(params, **{'X-Plex-Container-Start': str(start), 'X-Plex-Container-Size': str(page_size)})
+                count = 0
+                with self.session.get(section_url, headers=headers, params=page, stream=True) as response:
+                    response.raise_for_status()
+                    response.raw.decode_content = True
+                    for element in self._iter_elements(response.raw, 'Video'):
+                        count += 1
+                        yield self._media_item(section, element)
+                start += count
+                if count < page_size:
+                    break
+
+    @track_operation
     def get_sonarr_calendar_extended(self, days=7):
         """Get TV shows from Sonarr calendar for the next N days with extended metadata"""
         scheduled_shows = []
@@ -672,21 +579,15 @@ class MediaTracker:
             # Get calendar data
             url = urljoin(sonarr_url, '/api/v3/calendar')
             headers = {'X-Api-Key': sonarr_api_key}
-            params = {'start': start_date, 'end': end_date}
+            params = {'start': start_date, 'end': end_date, 'includeSeries': 'true'}
             
             response = self.session.get(url, headers=headers, params=params)
             response.raise_for_status()
             
-            episodes = response.json()
-            
-            # Get series data for additional metadata
-            series_url = urljoin(sonarr_url, '/api/v3/series')
-            series_response = self.session.get(series_url, headers=headers)
-            series_response.raise_for_status()
-            series_data = series_response.json()
+            episodes = self._parse_json(response)
             
-            # Create series lookup
-            series_lookup = {series['id']: series for series in series_data}
+            # Series metadata comes embedded in each calendar entry
+            series_lookup = self._get_sonarr_series_lookup(sonarr_url, headers, episodes)
             
             for episode in episodes:
                 series_id = episode.get('seriesId')
@@ -694,40 +595,14 @@ class MediaTracker:
                 air_date = episode.get('airDateUtc', '')
                 
                 if air_date:
-                    episode_data = {
-                        'series_title': series.get('title', 'Unknown Series'),
-                        'episode_title': episode.get('title', 'Unknown Episode'),
-                        'season': episode.get('seasonNumber', 'Unknown'),
-                        'episode': episode.get('episodeNumber', 'Unknown'),
-                        'air_date': air_date.split('T')[0] if 'T' in air_date else air_date,
-                        'air_time': air_date.split('T')[1].split('.')[0] if 'T' in air_date else '',
-                        'overview': episode.get('overview', ''),
-                        'series_overview': series.get('overview', ''),
-                        'network': series.get('network', ''),
-                        'status': series.get('status', ''),
-                        'genres': series.get('genres', []),
-                        'year': series.get('year', 0),
-                        'runtime': series.get('runtime', 0),
-                        'certification': series.get('certification', ''),
-                        'image_url': series.get('images', [{}])[0].get('url', '') if series.get('images') else '',
-                        'imdb_id': series.get('imdbId', ''),
-                        'tvdb_id': series.get('tvdbId', ''),
-                        'series_type': series.get('seriesType', ''),
-                        'language': series.get('languageProfileId', ''),
-                        'quality_profile': series.get('qualityProfileId', ''),
-                        'monitored': series.get('monitored', False),
-                        'episode_monitored': episode.get('monitored', False),
-                        'has_file': episode.get('hasFile', False),
-                        'episode_id': episode.get('id', 0),
-                        'series_id': series_id
-                    }
-                    scheduled_shows.append(episode_data)
+                    scheduled_shows.append(self._schedule_item(episode, series))
         
         except Exception as e:
             logging.error(f"Error getting extended Sonarr calendar: {str(e)}")
         
         return scheduled_shows
     
+    @track_operation
     def get_plex_library_stats(self):
         """Get comprehensive Plex library statistics (reuse logic from get_plex_all_content)"""
         stats = {
@@ -757,8 +632,7 @@ class MediaTracker:
             response = self.session.get(url, headers=headers)
             response.raise_for_status()
             
-            import xml.etree.ElementTree as ET
-            root = ET.fromstring(response.content)
+            root = self._parse_xml(response)
             
             for section in root.findall('.//Directory'):
                 section_type = section.get('type')
@@ -774,7 +648,7 @@ class MediaTracker:
                     section_url = urljoin(plex_url, f'/library/sections/{section_key}/all')
                     section_response = self.session.get(section_url, headers=headers)
                     section_response.raise_for_status()
-                    section_root = ET.fromstring(section_response.content)
+                    section_root = self._parse_xml(section_response)
                     count = len(section_root.findall('.//Video'))
                     stats['total_movies'] += count
                     library_info['count'] = count
@@ -782,26 +656,19 @@ class MediaTracker:
                     section_url = urljoin(plex_url, f'/library/sections/{section_key}/all')
                     section_response = self.session.get(section_url, headers=headers)
                     section_response.raise_for_status()
-                    section_root = ET.fromstring(section_response.content)
+                    section_root = self._parse_xml(section_response)
                     shows = [d for d in section_root.findall('.//Directory') if d.get('type') == 'show']
                     count = len(shows)
                     stats['total_shows'] += count
                     library_info['count'] = count
-                    # Count episodes for each show
+                    # Each show in the listing carries its episode count as leafCount
                     for show in shows:
-                        show_key = show.get('ratingKey')
-                        if show_key:
-                            episodes_url = urljoin(plex_url, f'/library/metadata/{show_key}/allLeaves')
-                            episodes_response = self.session.get(episodes_url, headers=headers)
-                            episodes_response.raise_for_status()
-                            episodes_root = ET.fromstring(episodes_response.content)
-                            episode_count = len(episodes_root.findall('.//Video'))
-                            stats['total_episodes'] += episode_count
+                        stats['total_episodes'] += int(show.get('leafCount', 0))
                 elif section_type == 'artist':
                     section_url = urljoin(plex_url, f'/library/sections/{section_key}/all')
                     section_response = self.session.get(section_url, headers=headers)
                     section_response.raise_for_status()
-                    section_root = ET.fromstring(section_response.content)
+                    section_root = self._parse_xml(section_response)
                     count = len(section_root.findall('.//Directory'))
                     stats['total_music'] += count
                     library_info['count'] = count
@@ -814,24 +681,89 @@ class MediaTracker:
             logging.exception("Full traceback:")
             return stats
 
+    @track_operation
+    def get_plex_library_counts(self):
+        """Movie, show and episode totals without listing the library: each section is asked
+        for an empty page, whose totalSize is the count"""
+        counts = {'movies': 0, 'tv_shows': 0, 'episodes': 0}
+        plex_url = self.config.get('plex_url', '').strip()
+        plex_token = self.config.get('plex_token', '').strip()
+        if not plex_url or not plex_token:
+            logging.error("Plex URL or token not configured")
+            return counts
+        if not plex_url.startswith(('http://', 'https://')):
+            plex_url = 'http://' + plex_url
+        headers = {'X-Plex-Token': plex_token}
+
+        def total(section_key, **params):
+            params.update({'X-Plex-Container-Start': '0', 'X-Plex-Container-Size': '0'})
+            response = self.session.get(urljoin(plex_url, f'/library/sections/{section_key}/all'),
+                                        headers=headers, params=params)
+            response.raise_for_status()
+            return int(self._parse_xml(response).get('totalSize', 0))
+
+        try:
+            response = self.session.get(urljoin(plex_url, '/library/sections'), headers=headers)
+            response.raise_for_status()
+            for section in self._parse_xml(response).findall('.//Directory'):
+                if section.get('type') == 'movie':
+                    counts['movies'] += total(section.get('key'))
+                elif section.get('type') == 'show':
+                    counts['tv_shows'] += total(section.get('key'))
+                    counts['episodes'] += total(section.get('key'), type='4')
+        except Exception as e:
+            logging.error(f"Error getting Plex library counts: {str(e)}")
+        return counts
+
+    @track_operation
+    def get_sonarr_series_count(self):
+        """Number of series in Sonarr"""
+        sonarr_url = self.config.get('sonarr_url', '').strip()
+        sonarr_api_key = self.config.get('sonarr_api_key', '').strip()
+        if not sonarr_url or not sonarr_api_key:
+            logging.error("Sonarr not configured - missing URL or API key")
+            return 0
+        try:
+            response = self.session.get(urljoin(sonarr_url, '/api/v3/series'), headers={'X-Api-Key': sonarr_api_key})
+            response.raise_for_status()
+            return len(self._parse_json(response))
+        except Exception as e:
+            logging.error(f"Error getting Sonarr series count: {str(e)}")
+            return 0
+
+    @track_operation
     def run_daily_sync(self):
+        """Run the daily sync, timing each phase and appending the run to the sync history"""
+        self.phase_timer = PhaseTimer()
+        try:
+            with count_requests() as upstream:
+                result = self._run_daily_sync()
+            result['timings'] = self.phase_timer.to_dict()
+            result['duration'] = round(self.phase_timer.total, 4)
+            SyncHistory(history_file_for(self.config)).append(
+                build_entry(self.phase_timer, result, upstream.requests))
+            return result
+        finally:
+            self.phase_timer = None
+
+    def _run_daily_sync(self):
         """Run the complete daily sync process"""
         try:
             logging.info("Starting daily sync...")
-            
-            # Get data from APIs with error handling
-            try:
-                movies, tv_shows = self.get_plex_recent_content()
-            except Exception as e:
-                logging.warning(f"Plex data retrieval failed: {str(e)}")
-                movies, tv_shows = [], []
-            
-            try:
-                scheduled_shows = self.get_sonarr_today_schedule()
-            except Exception as e:
-                logging.warning(f"Sonarr data retrieval failed: {str(e)}")
-                scheduled_shows = []
-            
+
+            # The registered sources run in parallel, each under its own concurrency limit and
+            # time budget; a failed source contributes nothing. sources builds on this module,
+            # so it is imported here.
+            from sources import source_scheduler, merged_fields
+            yesterday = datetime.combine(datetime.now().date() - timedelta(days=1), datetime.min.time())
+            runs = source_scheduler.run(self.config, 'fetch_incremental', int(yesterday.timestamp()),
+                                        phase_timer=self.phase_timer)
+            for name, run in runs.items():
+                if self.phase_timer is not None:
+                    self.phase_timer.add(f'source.{name}', run['seconds'])
+            data, _ = merged_fields(runs, ('movies', 'tv_shows', 'scheduled_shows'))
+            movies, tv_shows, scheduled_shows = data['movies'], data['tv_shows'], data['scheduled_shows']
+
             # Debug logging
             logging.info(f"Daily sync found: {len(movies)} movies, {len(tv_shows)} TV shows, {len(scheduled_shows)} scheduled shows")
             if scheduled_shows:
@@ -845,25 +777,16 @@ class MediaTracker:
                 'movies_count': len(movies),
                 'shows_count': len(tv_shows),
                 'scheduled_count': len(scheduled_shows),
-                'files_written': file_success
+                'files_written': file_success,
+                'sources': {name: {'status': run['status'], 'error': run['error'], 'seconds': run['seconds']}
+                            for name, run in runs.items()}
             }
             
             # Try to upload to GitHub if enabled and configured
             if file_success and self.config.get('github_enabled', False):
                 try:
-                    # Get the file paths that were written
-                    output_dir = self.config.get('output_directory', './output')
-                    file_paths = []
-                    
-                    # Add files based on what was written
-                    if len(movies) > 0:
-                        file_paths.append(f"{output_dir}/movies_today.txt")
-                    if len(tv_shows) > 0:
-                        file_paths.append(f"{output_dir}/tv_shows_today.txt")
-                    if len(scheduled_shows) > 0:
-                        file_paths.append(f"{output_dir}/tv_schedule_today.txt")
-                    
-                    if file_paths and self.upload_to_github(file_paths):
+                    # Publish exactly the report files this run wrote
+                    if self.output_files and self.upload_to_github(self.output_files):
                         result['github_uploaded'] = True
                         logging.info("Files uploaded to GitHub successfully")
                     else:
@@ -885,14 +808,30 @@ class MediaTracker:
             logging.error(f"Daily sync failed: {str(e)}")
             return {'success': False, 'error': str(e)}
 
+    @track_operation
     def get_dashboard_content(self, dashboard_config=None):
-        """Get movies and TV shows for the dashboard with configurable date range"""
+        """Get movies and TV shows for the dashboard with configurable date range.
+        Served from the library index while it holds a fresh library, otherwise from Plex."""
         movies = []
         tv_shows = []
         
+        # Use provided dashboard config or fall back to main config
+        config = dashboard_config or self.config
+        
+        # Get date range from config
+        days = config.get('dashboard_days', 3650)  # Default to showing all content
+        max_items = config.get('dashboard_max_items', 100)  # Default to 100 items
+        
+        # Calculate date range
+        end_date = datetime.now()
+        start_date = end_date - timedelta(days=days)
+        start_timestamp = int(start_date.timestamp())
+        
+        indexed = self._indexed_recent(start_timestamp, max_items)
+        if indexed is not None:
+            return indexed
+        
         try:
-            # Use provided dashboard config or fall back to main config
-            config = dashboard_config or self.config
             plex_url = config.get('plex_url', '').strip()
             plex_token = config.get('plex_token', '').strip()
             
@@ -904,18 +843,9 @@ class MediaTracker:
             if not plex_url.startswith(('http://', 'https://')):
                 plex_url = 'http://' + plex_url
             
-            # Get date range from config
-            days = config.get('dashboard_days', 3650)  # Default to showing all content
-            max_items = config.get('dashboard_max_items', 100)  # Default to 100 items
-            
-            # Calculate date range
-            end_date = datetime.now()
-            start_date = end_date - timedelta(days=days)
-            start_timestamp = int(start_date.timestamp())
-            
             # Get recently added content
             url = urljoin(plex_url, '/library/recentlyAdded')
-            headers = {'X-Plex-Token': plex_token}
+            headers = {'X-Plex-Token': plex_token, 'Accept': 'application/json'}
             params = {
                 'X-Plex-Container-Start': '0',
                 'X-Plex-Container-Size': str(max_items)
@@ -924,7 +854,7 @@ class MediaTracker:
             response = self.session.get(url, headers=headers, params=params)
             response.raise_for_status()
             
-            data = response.json()
+            data = self._parse_json(response)
             
             if 'MediaContainer' in data and 'Metadata' in data['MediaContainer']:
                 for item in data['MediaContainer']['Metadata']:
@@ -941,8 +871,8 @@ class MediaTracker:
                             'summary': item.get('summary', ''),
                             'duration': item.get('duration', 0),
                             'duration_formatted': self._format_duration(item.get('duration', 0)),
-                            'thumb': item.get('thumb', ''),
-                            'art': item.get('art', ''),
+                            'thumb': self._artwork_url(item.get('thumb', '')) or '',
+                            'art': self._artwork_url(item.get('art', '')) or '',
                             'genres': [genre.get('tag', '') for genre in item.get('Genre', [])],
                             'studio': item.get('studio', ''),
                             'content_rating': item.get('contentRating', ''),
@@ -980,6 +910,259 @@ class MediaTracker:
         
         return movies, tv_shows
 
+    def _schedule_item(self, episode, series):
+        """Dashboard/API representation of a Sonarr episode with its series"""
+        air_date = episode.get('airDateUtc', '')
+        series_id = episode.get('seriesId')
+        return {
+            'series_title': series.get('title', 'Unknown Series'),
+            'episode_title': episode.get('title', 'Unknown Episode'),
+            'season': episode.get('seasonNumber', 'Unknown'),
+            'episode': episode.get('episodeNumber', 'Unknown'),
+            'air_date': air_date.split('T')[0] if 'T' in air_date else air_date,
+            'air_time': air_date.split('T')[1].split('.')[0] if 'T' in air_date else '',
+            'overview': episode.get('overview', ''),
+            'series_overview': series.get('overview', ''),
+            'network': series.get('network', ''),
+            'status': series.get('status', ''),
+            'genres': series.get('genres', []),
+            'year': series.get('year', 0),
+            'runtime': series.get('runtime', 0),
+            'certification': series.get('certification', ''),
+            'image_url': series.get('images', [{}])[0].get('url', '') if series.get('images') else '',
+            'imdb_id': series.get('imdbId', ''),
+            'tvdb_id': series.get('tvdbId', ''),
+            'series_type': series.get('seriesType', ''),
+            'language': series.get('languageProfileId', ''),
+            'quality_profile': series.get('qualityProfileId', ''),
+            'monitored': series.get('monitored', False),
+            'episode_monitored': episode.get('monitored', False),
+            'has_file': episode.get('hasFile', False),
+            'episode_id': episode.get('id', 0),
+            'series_id': series_id
+        }
+    
+    @track_operation
+    def get_sonarr_episodes(self, episode_ids):
+        """Schedule items for specific Sonarr episodes, fetched in one request"""
+        sonarr_url = self.config.get('sonarr_url', '').strip()
+        sonarr_api_key = self.config.get('sonarr_api_key', '').strip()
+        if not sonarr_url or not sonarr_api_key:
+            raise ValueError('Sonarr URL or API key not configured')
+        if not sonarr_url.startswith(('http://', 'https://')):
+            sonarr_url = 'http://' + sonarr_url
+        
+        headers = {'X-Api-Key': sonarr_api_key}
+        params = {'episodeIds': sorted(episode_ids), 'includeSeries': 'true'}
+        response = self.session.get(urljoin(sonarr_url, '/api/v3/episode'), headers=headers, params=params)
+        response.raise_for_status()
+        episodes = self._parse_json(response)
+        series_lookup = self._get_sonarr_series_lookup(sonarr_url, headers, episodes)
+        return [self._schedule_item(episode, series_lookup.get(episode.get('seriesId'), {}))
+                for episode in episodes if episode.get('airDateUtc')]
+    
+    def _get_sonarr_series_lookup(self, sonarr_url, headers, episodes):
+        """Build a series ID lookup from calendar entries, downloading /series only if they lack embedded series"""
+        series_lookup = {}
+        for episode in episodes:
+            series = episode.get('series')
+            if series and episode.get('seriesId') is not None:
+                series_lookup[episode['seriesId']] = series
+        
+        if any(episode.get('seriesId') not in series_lookup for episode in episodes):
+            series_url = urljoin(sonarr_url, '/api/v3/series')
+            logging.info(f"Fetching series from {series_url}")
+            with self._phase('sonarr.series'):
+                series_response = self.session.get(series_url, headers=headers)
+                series_response.raise_for_status()
+                series_data = self._parse_json(series_response)
+            for series in series_data:
+                series_lookup.setdefault(series['id'], series)
+        
+        return series_lookup
+
+    def _artwork_url(self, path):
+        """Artwork URL for clients: the /artwork proxy, so the Plex token never reaches them"""
+        if not path:
+            return None
+        if path.startswith('http'):
+            return path
+        return artwork_url(path, self.config.get('plex_server'))
+    
+    @staticmethod
+    def _external_ids(item):
+        """{'imdb': 'tt0133093', 'tmdb': '603', ...} from a Plex item's Guid elements"""
+        ids = {}
+        for guid in item.findall('Guid'):
+            scheme, _, value = guid.get('id', '').partition('://')
+            if scheme and value:
+                ids[scheme] = value
+        return ids
+    
+    def _movie_item(self, item):
+        """Dashboard/API representation of a Plex movie element"""
+        duration = int(item.get('duration', 0)) if item.get('duration') else 0
+        return {
+            'title': item.get('title', 'Unknown'),
+            'original_title': item.get('originalTitle', ''),
+            'year': item.get('year', 'Unknown'),
+            'rating': item.get('rating', 'Not Rated'),
+            'duration': duration,
+            'duration_formatted': self._format_duration(duration),
+            'summary': item.get('summary', ''),
+            'added_date': datetime.fromtimestamp(int(item.get('addedAt', 0))).strftime('%Y-%m-%d') if item.get('addedAt') else 'Unknown',
+            'added_timestamp': int(item.get('addedAt', 0) or 0),
+            'studio': item.get('studio', ''),
+            'content_rating': item.get('contentRating', ''),
+            'thumb': self._artwork_url(item.get('thumb', '')),
+            'art': self._artwork_url(item.get('art', '')),
+            'genres': [genre.get('tag', '') for genre in item.findall('.//Genre')],
+            'plex_key': item.get('key', ''),
+            'guid': item.get('guid', ''),
+            'external_ids': self._external_ids(item),
+            'director': [director.get('tag', '') for director in item.findall('.//Director')],
+            'writers': [writer.get('tag', '') for writer in item.findall('.//Writer')],
+            'actors': [{'name': actor.get('tag', ''), 'role': actor.get('role', '')} for actor in item.findall('.//Role')[:10]],
+            'country': [country.get('tag', '') for country in item.findall('.//Country')],
+            'tagline': item.get('tagline', ''),
+            'originally_available_at': item.get('originallyAvailableAt', '')
+        }
+    
+    def _show_item(self, show_item):
+        """Dashboard/API representation of a Plex show element"""
+        return {
+            'title': show_item.get('title', 'Unknown'),
+            'original_title': show_item.get('originalTitle', ''),
+            'year': show_item.get('year', 'Unknown'),
+            'rating': show_item.get('rating', 'Not Rated'),
+            'summary': show_item.get('summary', ''),
+            'added_date': datetime.fromtimestamp(int(show_item.get('addedAt', 0))).strftime('%Y-%m-%d') if show_item.get('addedAt') else 'Unknown',
+            'added_timestamp': int(show_item.get('addedAt', 0) or 0),
+            'studio': show_item.get('studio', ''),
+            'content_rating': show_item.get('contentRating', ''),
+            'thumb': self._artwork_url(show_item.get('thumb', '')),
+            'art': self._artwork_url(show_item.get('art', '')),
+            'genres': [genre.get('tag', '') for genre in show_item.findall('.//Genre')],
+            'plex_key': show_item.get('key', ''),
+            'guid': show_item.get('guid', ''),
+            'external_ids': self._external_ids(show_item),
+            'episode_count': int(show_item.get('leafCount', 0)),
+            'season_count': int(show_item.get('childCount', 0)),
+            'originally_available_at': show_item.get('originallyAvailableAt', ''),
+            'network': show_item.get('network', ''),
+            'status': show_item.get('status', '')
+        }
+    
+    def _episode_item(self, episode):
+        """Export representation of a Plex episode element"""
+        duration = int(episode.get('duration', 0)) if episode.get('duration') else 0
+        return {
+            'show_title': episode.get('grandparentTitle', ''),
+            'show_rating_key': episode.get('grandparentRatingKey', ''),
+            'season': int(episode.get('parentIndex', 0) or 0),
+            'episode': int(episode.get('index', 0) or 0),
+            'title': episode.get('title', 'Unknown'),
+            'duration': duration,
+            'added_date': datetime.fromtimestamp(int(episode.get('addedAt', 0))).strftime('%Y-%m-%d') if episode.get('addedAt') else 'Unknown',
+            'added_timestamp': int(episode.get('addedAt', 0) or 0),
+            'originally_available_at': episode.get('originallyAvailableAt', ''),
+            'rating_key': episode.get('ratingKey', ''),
+            'plex_key': episode.get('key', ''),
+            'guid': episode.get('guid', '')
+        }
+
+    @staticmethod
+    def _iter_elements(stream, tag):
+        """Yield each complete `tag` element of an XML stream, then drop it from the tree"""
+        root = None
+        for event, element in ET.iterparse(stream, events=('start', 'end')):
+            if root is None:
+                root = element
+            elif event == 'end' and element.tag == tag:
+                yield element
+                root.clear()
+
+    def _media_item(self, section, item):
+        """Storage representation of a Plex movie or episode element: one entry per media
+        version with its resolution, codec, container and the total size of its parts"""
+        media = []
+        for version in item.findall('Media'):
+            sizes = [int(part.get('size') or 0) for part in version.findall('Part')]
+            media.append({
+                'resolution': version.get('videoResolution') or 'unknown',
+                'codec': version.get('videoCodec') or 'unknown',
+                'container': version.get('container') or 'unknown',
+                'parts': len(sizes),
+                'bytes': sum(sizes)
+            })
+        result = {
+            'library': section.get('title', 'Unknown'),
+            'type': item.get('type', section.get('type')),
+            'rating_key': item.get('ratingKey', ''),
+            'guid': item.get('guid', ''),
+            'title': item.get('title', 'Unknown'),
+            'year': item.get('year') or 'Unknown',
+            'media': media
+        }
+        if result['type'] == 'episode':
+            result['show_title'] = item.get('grandparentTitle', '')
+            result['season'] = int(item.get('parentIndex', 0) or 0)
+            result['episode'] = int(item.get('index', 0) or 0)
+        return result
+
+    @track_operation
+    def get_plex_item(self, rating_key):
+        """('movie' or 'show', item) for one Plex item, fetched by rating key.
+        Seasons and episodes resolve to their show. Returns None when Plex no longer has it."""
+        plex_url = self.config.get('plex_url', '').strip()
+        plex_token = self.config.get('plex_token', '').strip()
+        if not plex_url or not plex_token:
+            raise ValueError('Plex URL or token not configured')
+        if not plex_url.startswith(('http://', 'https://')):
+            plex_url = 'http://' + plex_url
+        
+        # A season or episode leads to its show in at most two hops
+        for _ in range(3):
+            response = self.session.get(urljoin(plex_url, f'/library/metadata/{rating_key}'),
+                                        headers={'X-Plex-Token': plex_token})
+            if response.status_code == 404:
+                return None
+            response.raise_for_status()
+            root = self._parse_xml(response)
+            element = next(iter(root), None)
+            if element is None:
+                return None
+            item_type = element.get('type')
+            if item_type == 'movie':
+                return 'movie', self._movie_item(element)
+            if item_type == 'show':
+                return 'show', self._show_item(element)
+            if item_type == 'season':
+                rating_key = element.get('parentRatingKey')
+            elif item_type == 'episode':
+                rating_key = element.get('grandparentRatingKey')
+            else:
+                return None
+            if not rating_key:
+                return None
+        return None
+    
+    def _parse_xml(self, response):
+        """Parse an XML response body, timing it as the request's parse phase"""
+        with timed('parse'):
+            return ET.fromstring(response.content)
+
+    def _parse_json(self, response):
+        """Parse a JSON response body, timing it as the request's parse phase"""
+        with timed('parse'):
+            return response.json()
+
+    def _phase(self, name):
+        """Time a phase of the current sync run (no-op outside run_daily_sync)"""
+        if self.phase_timer is None:
+            return nullcontext()
+        return self.phase_timer.phase(name)
+
     def _format_duration(self, duration_ms):
         """Format duration in milliseconds to human-readable format"""
         if not duration_ms:
@@ -0,0 +1,171 @@
+import inspect
+import linecache
+import os
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import OrderedDict
+
+DEFAULT_NFRAMES = 25
+MAX_SNAPSHOTS = 10
+GROUPINGS = ('lineno', 'filename', 'route', 'method')
+
+# Allocations made by the tracer itself (source lookups for grouping) or the import system are noise
+_IGNORED_FILES = (tracemalloc.__file__, linecache.__file__,
+                  '<frozen importlib._bootstrap>', '<frozen importlib._bootstrap_external>')
+
+
+def _code_ranges(functions):
+    """Map filename -> [(first_line, last_line, label)] for the given {label: function}"""
+    ranges = {}
+    for label, func in functions.items():
+        func = inspect.unwrap(func)
+        try:
+            lines, first_line = inspect.getsourcelines(func)
+            filename = os.path.abspath(inspect.getsourcefile(func))
+        except (OSError, TypeError):
+            continue
+        ranges.setdefault(filename, []).append((first_line, first_line + len(lines) - 1, label))
+    return ranges
+
+
+class AllocationTracer:
+    """tracemalloc snapshots, diffs and per-route memory growth for a live process"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.snapshots = OrderedDict()
+        self.route_growth = {}
+        self._method_ranges = None
+        self._route_ranges = None
+
+    @property
+    def is_tracing(self):
+        return tracemalloc.is_tracing()
+
+    def start(self, nframes=DEFAULT_NFRAMES):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(nframes)
+        with self.lock:
+            self.route_growth = {}
+
+    def stop(self):
+        tracemalloc.stop()
+        with self.lock:
+            self.snapshots.clear()
+
+    def take_snapshot(self, label=''):
+        """Store a filtered snapshot and return its id"""
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, filename) for filename in _IGNORED_FILES])
+        snapshot_id = uuid.uuid4().hex[:8]
+        with self.lock:
+            self.snapshots[snapshot_id] = {'label': label, 'taken_at': time.time(), 'snapshot': snapshot}
+            while len(self.snapshots) > MAX_SNAPSHOTS:
+                self.snapshots.popitem(last=False)
+        return snapshot_id
+
+    def get_snapshot(self, snapshot_id):
+        with self.lock:
+            entry = self.snapshots.get(snapshot_id)
+        return entry['snapshot'] if entry else None
+
+    def list_snapshots(self):
+        with self.lock:
+            return [
+                {
+                    'id': snapshot_id,
+                    'label': entry['label'],
+                    'taken_at': entry['taken_at'],
+                    'traced_bytes': sum(trace.size for trace in entry['snapshot'].traces)
+                }
+                for snapshot_id, entry in self.snapshots.items()
+            ]
+
+    def record_request(self, route, allocated_bytes):
+        """Accumulate net traced memory change observed across one request"""
+        with self.lock:
+            requests, total = self.route_growth.get(route, (0, 0))
+            self.route_growth[route] = (requests + 1, total + allocated_bytes)
+
+    def route_report(self):
+        with self.lock:
+            growth = dict(self.route_growth)
+        return sorted(
+            (
+                {'route': route, 'requests': requests, 'net_bytes': total,
+                 'net_bytes_per_request': total // requests if requests else 0}
+                for route, (requests, total) in growth.items()
+            ),
+            key=lambda row: row['net_bytes'],
+            reverse=True
+        )
+
+    def _load_ranges(self, app):
+        if self._method_ranges is None:
+            from media_tracker import MediaTracker
+            methods = {
+                f'MediaTracker.{name}': func
+                for name, func in inspect.getmembers(MediaTracker, inspect.isfunction)
+            }
+            self._method_ranges = _code_ranges(methods)
+        if self._route_ranges is None and app is not None:
+            rules = {}
+            for rule in app.url_map.iter_rules():
+                rules.setdefault(rule.endpoint, rule.rule)
+            views = {rules.get(endpoint, endpoint): func for endpoint, func in app.view_functions.items()}
+            self._route_ranges = _code_ranges(views)
+
+    def _owner(self, traceback, ranges):
+        """Innermost frame of the traceback that falls inside one of the code ranges"""
+        for frame in reversed(traceback):
+            for first_line, last_line, label in ranges.get(frame.filename, ()):
+                if first_line <= frame.lineno <= last_line:
+                    return label
+        return None
+
+    def _group_key(self, traceback, group_by):
+        if group_by == 'route':
+            return self._owner(traceback, self._route_ranges or {}) or '(outside request handlers)'
+        if group_by == 'method':
+            return self._owner(traceback, self._method_ranges or {}) or '(outside MediaTracker)'
+        frame = traceback[-1] if len(traceback) else None
+        if frame is None:
+            return '(unknown)'
+        if group_by == 'filename':
+            return frame.filename
+        return f'{frame.filename}:{frame.lineno}'
+
+    def _aggregate(self, stats, group_by, limit, diff):
+        grouped = {}
+        for stat in stats:
+            key = self._group_key(stat.traceback, group_by)
+            row = grouped.setdefault(key, {'site': key, 'size': 0, 'count': 0, 'size_diff': 0, 'count_diff': 0})
+            row['size'] += stat.size
+            row['count'] += stat.count
+            if diff:
+                row['size_diff'] += stat.size_diff
+                row['count_diff'] += stat.count_diff
+        rows = list(grouped.values())
+        if diff:
+            rows.sort(key=lambda row: abs(row['size_diff']), reverse=True)
+        else:
+            for row in rows:
+                del row['size_diff'], row['count_diff']
+            rows.sort(key=lambda row: row['size'], reverse=True)
+        return rows[:limit]
+
+    def top(self, snapshot, group_by='lineno', limit=20, app=None):
+        """Largest allocation sites in a snapshot"""
+        self._load_ranges(app)
+        return self._aggregate(snapshot.statistics('traceback'), group_by, limit, diff=False)
+
+    def diff(self, old_snapshot, new_snapshot, group_by='lineno', limit=20, app=None):
+        """Allocation sites that grew or shrank the most between two snapshots"""
+        self._load_ranges(app)
+        return self._aggregate(new_snapshot.compare_to(old_snapshot, 'traceback'), group_by, limit, diff=True)
+
+
+# Global allocation tracer instance
+allocation_tracer = AllocationTracer()
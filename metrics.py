@@ -0,0 +1,224 @@
+import bisect
+import threading
+import time
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+JOB_BUCKETS = (1.0, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0, 3600.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """Base class for a labelled metric family"""
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self.lock = threading.Lock()
+        self.values = {}
+
+    def header(self):
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, *labels):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self):
+        with self.lock:
+            items = sorted(self.values.items())
+        return self.header() + [
+            f'{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}'
+            for labels, value in items
+        ]
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def set(self, value, *labels):
+        with self.lock:
+            self.values[labels] = value
+
+    def inc(self, amount=1, *labels):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def dec(self, amount=1, *labels):
+        self.inc(-amount, *labels)
+
+    render = Counter.render
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.values.get(labels)
+            if series is None:
+                # per-bucket counts (last slot is +Inf), sum
+                series = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self):
+        with self.lock:
+            items = sorted((labels, (list(counts), total)) for labels, (counts, total) in self.values.items())
+        lines = self.header()
+        for labels, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = 'le="' + _format_value(float(bound)) + '"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.label_names, labels, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(self.label_names, labels)} {_format_value(total)}')
+            lines.append(f'{self.name}_count{_format_labels(self.label_names, labels)} {cumulative}')
+        return lines
+
+
+class MetricsRegistry:
+    """Holds metric families and renders them in the Prometheus text format"""
+
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def add_collector(self, callback):
+        """Register a callback run before each render to refresh derived metrics"""
+        self.collectors.append(callback)
+
+    def render(self):
+        for callback in self.collectors:
+            callback()
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+# Global metrics registry
+registry = MetricsRegistry()
+
+http_requests = registry.register(Counter(
+    'mediatracker_http_requests_total', 'HTTP requests handled, by route, method and status.',
+    ('route', 'method', 'status')))
+http_duration = registry.register(Histogram(
+    'mediatracker_http_request_duration_seconds', 'HTTP request latency by route.', ('route',)))
+http_in_flight = registry.register(Gauge(
+    'mediatracker_http_requests_in_flight', 'HTTP requests currently being handled.'))
+
+upstream_requests = registry.register(Counter(
+    'mediatracker_upstream_requests_total', 'Upstream API requests by service and endpoint.',
+    ('service', 'endpoint')))
+upstream_duration = registry.register(Histogram(
+    'mediatracker_upstream_request_duration_seconds', 'Upstream API request latency by service and endpoint.',
+    ('service', 'endpoint')))
+upstream_bytes = registry.register(Counter(
+    'mediatracker_upstream_response_bytes_total', 'Upstream API response bytes by service and endpoint.',
+    ('service', 'endpoint')))
+upstream_errors = registry.register(Counter(
+    'mediatracker_upstream_errors_total', 'Failed upstream API requests by service and endpoint.',
+    ('service', 'endpoint')))
+
+cache_requests = registry.register(Counter(
+    'mediatracker_cache_requests_total', 'Cache lookups by cache and result (hit or miss).',
+    ('cache', 'result')))
+cache_hit_ratio = registry.register(Gauge(
+    'mediatracker_cache_hit_ratio', 'Fraction of cache lookups that were hits.', ('cache',)))
+
+job_duration = registry.register(Histogram(
+    'mediatracker_scheduler_job_duration_seconds', 'Scheduler job run time.', ('job',), buckets=JOB_BUCKETS))
+job_runs = registry.register(Counter(
+    'mediatracker_scheduler_job_runs_total', 'Scheduler job runs by result.', ('job', 'result')))
+job_last_success = registry.register(Gauge(
+    'mediatracker_scheduler_job_last_success_timestamp_seconds', 'Unix time of the last successful job run.',
+    ('job',)))
+
+source_duration = registry.register(Histogram(
+    'mediatracker_source_duration_seconds', 'Source plugin operation run time.', ('source', 'operation')))
+source_runs = registry.register(Counter(
+    'mediatracker_source_runs_total',
+    'Source plugin operations by result (success, failure, timeout, cached or stale).',
+    ('source', 'operation', 'result')))
+
+plex_notifications_connected = registry.register(Gauge(
+    'mediatracker_plex_notifications_connected', 'Whether the Plex notification websocket is connected (1) or not (0).'))
+plex_notification_events = registry.register(Counter(
+    'mediatracker_plex_notification_events_total', 'Plex library timeline events applied, by action.', ('action',)))
+webhook_events = registry.register(Counter(
+    'mediatracker_webhook_events_total', 'Webhook events received, by source and event type.', ('source', 'event')))
+
+
+def record_upstream(operation, endpoint, size, seconds, error):
+    """Observer for instrumentation.upstream_stats"""
+    service, _, path = endpoint.partition(':')
+    upstream_requests.inc(1, service, path)
+    upstream_duration.observe(seconds, service, path)
+    upstream_bytes.inc(size, service, path)
+    if error:
+        upstream_errors.inc(1, service, path)
+
+
+def record_cache(cache, hit):
+    """Count a cache lookup as a hit or miss"""
+    cache_requests.inc(1, cache, 'hit' if hit else 'miss')
+
+
+def record_job(job, seconds, success):
+    """Record a scheduler job run"""
+    job_duration.observe(seconds, job)
+    job_runs.inc(1, job, 'success' if success else 'failure')
+    if success:
+        job_last_success.set(time.time(), job)
+
+
+def record_source(source, operation, seconds, result):
+    """Record a source plugin operation run by the source scheduler"""
+    if result in ('success', 'failure', 'timeout'):
+        source_duration.observe(seconds, source, operation)
+    source_runs.inc(1, source, operation, result)
+
+
+def _update_cache_ratios():
+    with cache_requests.lock:
+        counts = dict(cache_requests.values)
+    for cache in {labels[0] for labels in counts}:
+        hits = counts.get((cache, 'hit'), 0)
+        total = hits + counts.get((cache, 'miss'), 0)
+        cache_hit_ratio.set(hits / total if total else 0.0, cache)
+
+
+registry.add_collector(_update_cache_ratios)
@@ -1,3 +1,4 @@
+import hmac
 import json
 import os
 import secrets
@@ -105,4 +106,67 @@ def require_api_key(f):
         
         return f(*args, **kwargs)
     
-    return decorated_function
\ No newline at end of file
+    return decorated_function
+
+
+def is_admin_request():
+    """Check the request's admin token against the ADMIN_TOKEN environment variable"""
+    admin_token = os.environ.get('ADMIN_TOKEN')
+    if not admin_token:
+        return False
+    provided = request.headers.get('X-Admin-Token') or request.args.get('admin_token') or ''
+    return hmac.compare_digest(provided.encode('utf-8'), admin_token.encode('utf-8'))
+
+
+def require_admin(f):
+    """Decorator to restrict diagnostic endpoints to holders of the admin token"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not os.environ.get('ADMIN_TOKEN'):
+            return jsonify({
+                'error': 'Admin endpoints disabled',
+                'message': 'Set the ADMIN_TOKEN environment variable to enable admin endpoints'
+            }), 403
+        
+        if not is_admin_request():
+            return jsonify({
+                'error': 'Invalid admin token',
+                'message': 'Provide the admin token in X-Admin-Token header or admin_token parameter'
+            }), 403
+        
+        return f(*args, **kwargs)
+    
+    return decorated_function
+
+
+def is_webhook_request():
+    """Check a webhook's token against the WEBHOOK_TOKEN environment variable. Plex webhooks can
+    only carry it in the URL (?token=); Sonarr can also send it as the basic auth password."""
+    webhook_token = os.environ.get('WEBHOOK_TOKEN')
+    if not webhook_token:
+        return False
+    provided = request.headers.get('X-Webhook-Token') or request.args.get('token')
+    if not provided and request.authorization:
+        provided = request.authorization.password
+    return hmac.compare_digest((provided or '').encode('utf-8'), webhook_token.encode('utf-8'))
+
+
+def require_webhook_token(f):
+    """Decorator to accept webhook calls only when they carry the webhook token"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not os.environ.get('WEBHOOK_TOKEN'):
+            return jsonify({
+                'error': 'Webhooks disabled',
+                'message': 'Set the WEBHOOK_TOKEN environment variable to enable webhooks'
+            }), 403
+        
+        if not is_webhook_request():
+            return jsonify({
+                'error': 'Invalid webhook token',
+                'message': 'Provide the webhook token in the token parameter, X-Webhook-Token header or basic auth password'
+            }), 401
+        
+        return f(*args, **kwargs)
+    
+    return decorated_function
@@ -0,0 +1,323 @@
+import base64
+import hashlib
+import json
+import logging
+import os
+import random
+import socket
+import ssl
+import struct
+import threading
+import time
+from urllib.parse import urlparse
+
+import metrics
+
+NOTIFICATIONS_PATH = '/:/websockets/notifications'
+WEBSOCKET_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+OP_CONTINUATION, OP_TEXT, OP_BINARY, OP_CLOSE, OP_PING, OP_PONG = 0x0, 0x1, 0x2, 0x8, 0x9, 0xA
+MAX_MESSAGE_BYTES = 16 * 1024 * 1024
+
+# Plex timeline entries: metadata types and processing states
+LIBRARY_IDENTIFIER = 'com.plexapp.plugins.library'
+TIMELINE_TYPES = {1: 'movie', 2: 'show', 3: 'season', 4: 'episode'}
+STATE_DONE = 5
+STATE_DELETED = 9
+
+# While the socket is connected, cached library data is kept current by events
+CONNECTED_MAX_AGE = 3600
+
+
+class WebSocketError(Exception):
+    """The websocket handshake or framing failed"""
+
+
+def websocket_accept(key):
+    """Sec-WebSocket-Accept value the server must answer a handshake key with"""
+    return base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode('ascii')).digest()).decode('ascii')
+
+
+def encode_frame(opcode, payload=b''):
+    """Masked client-to-server frame"""
+    length = len(payload)
+    if length < 126:
+        header = struct.pack('!BB', 0x80 | opcode, 0x80 | length)
+    elif length < 65536:
+        header = struct.pack('!BBH', 0x80 | opcode, 0x80 | 126, length)
+    else:
+        header = struct.pack('!BBQ', 0x80 | opcode, 0x80 | 127, length)
+    mask = os.urandom(4)
+    return header + mask + bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+
+
+class WebSocketConnection:
+    """Minimal RFC 6455 client: handshake, masked control frames, fragmented text messages,
+    ping/pong keepalive and close. Enough for Plex's notification stream."""
+
+    def __init__(self, url, headers=None, timeout=10, ping_interval=30):
+        self.url = urlparse(url)
+        self.headers = headers or {}
+        self.timeout = timeout
+        self.ping_interval = ping_interval
+        self.sock = None
+        self.buffer = bytearray()
+        self._awaiting_pong = False
+
+    def connect(self):
+        secure = self.url.scheme in ('https', 'wss')
+        host = self.url.hostname
+        port = self.url.port or (443 if secure else 80)
+        sock = socket.create_connection((host, port), timeout=self.timeout)
+        if secure:
+            sock = ssl.create_default_context().wrap_socket(sock, server_hostname=host)
+        self.sock = sock
+
+        key = base64.b64encode(os.urandom(16)).decode('ascii')
+        path = (self.url.path or '/') + (f'?{self.url.query}' if self.url.query else '')
+        lines = [
+            f'GET {path} HTTP/1.1',
+            f'Host: {self.url.netloc}',
+            'Upgrade: websocket',
+            'Connection: Upgrade',
+            f'Sec-WebSocket-Key: {key}',
+            'Sec-WebSocket-Version: 13',
+        ] + [f'{name}: {value}' for name, value in self.headers.items()]
+        sock.sendall(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+
+        while b'\r\n\r\n' not in self.buffer:
+            self._fill()
+            if len(self.buffer) > 65536:
+                raise WebSocketError('Handshake response too large')
+        head, _, rest = bytes(self.buffer).partition(b'\r\n\r\n')
+        self.buffer = bytearray(rest)
+        status_line, *header_lines = head.decode('latin-1').split('\r\n')
+        if len(status_line.split()) < 2 or status_line.split()[1] != '101':
+            raise WebSocketError(f'Handshake refused: {status_line}')
+        response_headers = {}
+        for line in header_lines:
+            name, _, value = line.partition(':')
+            response_headers[name.strip().lower()] = value.strip()
+        if response_headers.get('sec-websocket-accept') != websocket_accept(key):
+            raise WebSocketError('Handshake accept key mismatch')
+        # Reads now time out every ping interval so a dead connection is noticed
+        sock.settimeout(self.ping_interval)
+        return self
+
+    def _fill(self):
+        chunk = self.sock.recv(65536)
+        if not chunk:
+            raise WebSocketError('Connection closed by server')
+        self.buffer += chunk
+
+    def _read_exact(self, size):
+        while len(self.buffer) < size:
+            try:
+                self._fill()
+            except socket.timeout:
+                if self._awaiting_pong:
+                    raise WebSocketError('No pong from server')
+                self._awaiting_pong = True
+                self.send(OP_PING, b'keepalive')
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        return data
+
+    def read_frame(self):
+        """(fin, opcode, payload) of the next frame"""
+        first, second = self._read_exact(2)
+        fin, opcode = bool(first & 0x80), first & 0x0F
+        length = second & 0x7F
+        if length == 126:
+            length = struct.unpack('!H', self._read_exact(2))[0]
+        elif length == 127:
+            length = struct.unpack('!Q', self._read_exact(8))[0]
+        if length > MAX_MESSAGE_BYTES:
+            raise WebSocketError(f'Frame of {length} bytes exceeds the limit')
+        mask = self._read_exact(4) if second & 0x80 else None
+        payload = self._read_exact(length)
+        if mask:
+            payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+        # Any frame from the server shows the connection is alive
+        self._awaiting_pong = False
+        return fin, opcode, payload
+
+    def receive(self):
+        """Next text message, or None once the server closes the connection"""
+        fragments = []
+        while True:
+            fin, opcode, payload = self.read_frame()
+            if opcode == OP_PING:
+                self.send(OP_PONG, payload)
+            elif opcode == OP_PONG:
+                continue
+            elif opcode == OP_CLOSE:
+                try:
+                    self.send(OP_CLOSE, payload[:2])
+                except OSError:
+                    pass
+                return None
+            elif opcode in (OP_TEXT, OP_BINARY, OP_CONTINUATION):
+                fragments.append(payload)
+                if sum(len(fragment) for fragment in fragments) > MAX_MESSAGE_BYTES:
+                    raise WebSocketError('Message exceeds the size limit')
+                if fin:
+                    return b''.join(fragments).decode('utf-8')
+
+    def send(self, opcode, payload=b''):
+        self.sock.sendall(encode_frame(opcode, payload))
+
+    def close(self):
+        if self.sock is None:
+            return
+        try:
+            self.send(OP_CLOSE, struct.pack('!H', 1000))
+        except OSError:
+            pass
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+
+def timeline_changes(message):
+    """(changed, removed) from a Plex notification message: {rating key: type} of library items
+    that finished processing, and {rating key: (type, parent key)} of deleted ones"""
+    container = json.loads(message).get('NotificationContainer', {})
+    changed, removed = {}, {}
+    if container.get('type') != 'timeline':
+        return changed, removed
+    for entry in container.get('TimelineEntry', []):
+        if entry.get('identifier', LIBRARY_IDENTIFIER) != LIBRARY_IDENTIFIER:
+            continue
+        kind = TIMELINE_TYPES.get(int(entry.get('type', 0)))
+        rating_key = str(entry.get('itemID', ''))
+        if not kind or not rating_key:
+            continue
+        state = int(entry.get('state', -1))
+        if state == STATE_DELETED:
+            changed.pop(rating_key, None)
+            removed[rating_key] = (kind, str(entry.get('parentItemID', '')) or None)
+        elif state == STATE_DONE:
+            removed.pop(rating_key, None)
+            changed[rating_key] = kind
+    return changed, removed
+
+
+class PlexNotificationListener:
+    """Background thread following Plex's notification websocket. Library timeline events become
+    on_changed(rating_key, kind) / on_removed(rating_key, kind, parent_key) calls. The socket
+    reconnects with exponential backoff; while it is down, poll() runs every poll_interval
+    seconds, and once more after reconnecting to catch events missed in between."""
+
+    def __init__(self, plex_url, token, on_changed, on_removed, poll=None, poll_interval=300,
+                 min_backoff=1.0, max_backoff=60.0, ping_interval=30, timeout=10):
+        self.settings = (plex_url, token)
+        if not plex_url.startswith(('http://', 'https://')):
+            plex_url = 'http://' + plex_url
+        self.url = plex_url.rstrip('/') + NOTIFICATIONS_PATH
+        self.token = token
+        self.on_changed = on_changed
+        self.on_removed = on_removed
+        self.poll = poll
+        self.poll_interval = poll_interval
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.ping_interval = ping_interval
+        self.timeout = timeout
+        self.connected = False
+        self.stats = {'connects': 0, 'failures': 0, 'messages': 0, 'changed': 0, 'removed': 0, 'polls': 0}
+        self._stop = threading.Event()
+        self._connection = None
+        self._thread = None
+        self._last_poll = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='plex-notifications', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        connection = self._connection
+        if connection is not None:
+            connection.close()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run_poll(self, reason):
+        if self.poll is None:
+            return
+        self._last_poll = time.monotonic()
+        self.stats['polls'] += 1
+        logging.info(f"Polling Plex ({reason})")
+        try:
+            self.poll()
+        except Exception as e:
+            logging.error(f"Error polling Plex: {str(e)}")
+
+    def _run(self):
+        backoff = self.min_backoff
+        down_since = time.monotonic()
+        # Failed connects in the current outage; the first of each outage is a warning
+        outage_failures = 0
+        while not self._stop.is_set():
+            connection = WebSocketConnection(self.url, {'X-Plex-Token': self.token}, timeout=self.timeout,
+                                             ping_interval=self.ping_interval)
+            try:
+                connection.connect()
+            except (OSError, WebSocketError) as e:
+                self.stats['failures'] += 1
+                outage_failures += 1
+                log = logging.warning if outage_failures == 1 else logging.debug
+                log(f"Plex notification socket unavailable: {str(e)}")
+                connection.close()
+                if time.monotonic() - max(down_since, self._last_poll or down_since) >= self.poll_interval:
+                    self._run_poll('notification socket down')
+                # Full jitter keeps many instances from reconnecting in lockstep
+                self._stop.wait(random.uniform(backoff / 2, backoff))
+                backoff = min(backoff * 2, self.max_backoff)
+                continue
+
+            self._connection = connection
+            self.connected = True
+            metrics.plex_notifications_connected.set(1)
+            self.stats['connects'] += 1
+            outage_failures = 0
+            backoff = self.min_backoff
+            logging.info("Connected to Plex notifications")
+            if self.stats['connects'] > 1:
+                self._run_poll('resync after reconnect')
+            try:
+                while not self._stop.is_set():
+                    message = connection.receive()
+                    if message is None:
+                        break
+                    self._handle(message)
+            except (OSError, WebSocketError, ValueError) as e:
+                if not self._stop.is_set():
+                    logging.warning(f"Plex notification socket dropped: {str(e)}")
+            finally:
+                self.connected = False
+                metrics.plex_notifications_connected.set(0)
+                self._connection = None
+                connection.close()
+                down_since = time.monotonic()
+
+    def _handle(self, message):
+        self.stats['messages'] += 1
+        changed, removed = timeline_changes(message)
+        for rating_key, (kind, parent_key) in removed.items():
+            self.stats['removed'] += 1
+            metrics.plex_notification_events.inc(1, 'removed')
+            try:
+                self.on_removed(rating_key, kind, parent_key)
+            except Exception as e:
+                logging.error(f"Error applying Plex removal of {rating_key}: {str(e)}")
+        for rating_key, kind in changed.items():
+            self.stats['changed'] += 1
+            metrics.plex_notification_events.inc(1, 'changed')
+            try:
+                self.on_changed(rating_key, kind)
+            except Exception as e:
+                logging.error(f"Error refreshing Plex item {rating_key}: {str(e)}")
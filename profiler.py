@@ -0,0 +1,123 @@
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+
+DEFAULT_INTERVAL = 0.005
+MAX_STORED_PROFILES = 20
+
+# Only one whole-process profile may run at a time
+_profile_lock = threading.Lock()
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    filename = os.path.basename(code.co_filename)
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(';', ':')
+
+
+def _collapse(frame, thread_name):
+    """Root-first 'thread;outer;...;inner' stack string for a frame"""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.append(thread_name.replace(';', ':').replace(' ', '_'))
+    return ';'.join(reversed(labels))
+
+
+class SamplingProfiler:
+    """Samples Python stacks of running threads on a background thread"""
+
+    def __init__(self, interval=DEFAULT_INTERVAL, thread_ids=None):
+        self.interval = interval
+        self.thread_ids = set(thread_ids) if thread_ids else None
+        self.stacks = Counter()
+        self.samples = 0
+        self.started_at = None
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.started_at = time.time()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.duration = time.time() - self.started_at if self.started_at else 0.0
+        return self
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                if self.thread_ids is not None and thread_id not in self.thread_ids:
+                    continue
+                self.stacks[_collapse(frame, names.get(thread_id, f'thread-{thread_id}'))] += 1
+            self.samples += 1
+
+    def collapsed(self):
+        """Stacks in the collapsed format read by flamegraph.pl and speedscope"""
+        return '\n'.join(f'{stack} {count}' for stack, count in self.stacks.most_common()) + '\n'
+
+
+def profile_process(seconds, interval=DEFAULT_INTERVAL):
+    """Profile every thread for `seconds`. Returns None if a profile is already running."""
+    if not _profile_lock.acquire(blocking=False):
+        return None
+    try:
+        profiler = SamplingProfiler(interval=interval).start()
+        time.sleep(seconds)
+        return profiler.stop()
+    finally:
+        _profile_lock.release()
+
+
+class RequestProfiles:
+    """Keeps the most recent single-request profiles for later download"""
+
+    def __init__(self, limit=MAX_STORED_PROFILES):
+        self.limit = limit
+        self.lock = threading.Lock()
+        self.profiles = OrderedDict()
+
+    def start(self, interval=DEFAULT_INTERVAL):
+        return SamplingProfiler(interval=interval, thread_ids=[threading.get_ident()]).start()
+
+    def store(self, profiler, label):
+        profile_id = uuid.uuid4().hex[:12]
+        with self.lock:
+            self.profiles[profile_id] = {'label': label, 'profiler': profiler}
+            while len(self.profiles) > self.limit:
+                self.profiles.popitem(last=False)
+        return profile_id
+
+    def get(self, profile_id):
+        with self.lock:
+            return self.profiles.get(profile_id)
+
+    def list(self):
+        with self.lock:
+            return [
+                {
+                    'id': profile_id,
+                    'label': entry['label'],
+                    'samples': entry['profiler'].samples,
+                    'duration': round(entry['profiler'].duration, 3)
+                }
+                for profile_id, entry in reversed(self.profiles.items())
+            ]
+
+
+# Global store for per-request profiles
+request_profiles = RequestProfiles()
@@ -0,0 +1,174 @@
+import string
+from datetime import datetime
+
+SEPARATOR = '-' * 30
+BUFFER_SIZE = 64 * 1024
+
+DEFAULT_FORMATS = {
+    'movie_format': 'Title: {title}\nYear: {year}\nAdded: {added_date}\n{separator}',
+    'tv_format': 'Title: {title}\nYear: {year}\nAdded: {added_date}\n{separator}',
+    'schedule_format': 'Series: {series_title}\nEpisode: S{season:02d}E{episode:02d} - {episode_title}\nAir Date: {air_date}\n{separator}',
+}
+
+# Placeholders each format may use, with sample values for checking format specs
+FORMAT_FIELDS = {
+    'movie_format': {'title': 'Title', 'year': '2024', 'added_date': '2024-01-01', 'separator': SEPARATOR},
+    'tv_format': {'title': 'Title', 'year': '2024', 'added_date': '2024-01-01', 'separator': SEPARATOR},
+    'schedule_format': {'series_title': 'Series', 'episode_title': 'Episode', 'season': 1, 'episode': 1,
+                        'air_date': '2024-01-01', 'separator': SEPARATOR},
+}
+
+_CONVERSIONS = {None: lambda value: value, 'r': repr, 's': str, 'a': ascii}
+
+
+class TemplateError(ValueError):
+    """A report format string that cannot be compiled"""
+
+
+def _escape(literal):
+    return literal.replace('{', '{{').replace('}', '}}')
+
+
+class CompiledTemplate:
+    """A report format string parsed and validated once, then rendered per item"""
+
+    def __init__(self, name, template, fields):
+        self.name = name
+        self.template = template
+        self.parts = []
+        pattern = []
+        try:
+            parsed = list(string.Formatter().parse(template))
+        except ValueError as e:
+            raise TemplateError(f"{name}: {e}")
+
+        for literal, field, spec, conversion in parsed:
+            if field is None:
+                self.parts.append((literal, None, '', None))
+                pattern.append(_escape(literal))
+                continue
+            if field == '' or field.isdigit():
+                raise TemplateError(f"{name}: positional placeholder '{{{field}}}' is not supported, use a field name")
+            if field not in fields:
+                raise TemplateError(f"{name}: unknown placeholder '{{{field}}}'; available: {', '.join(fields)}")
+            if conversion not in _CONVERSIONS:
+                raise TemplateError(f"{name}: unknown conversion '!{conversion}' for '{{{field}}}'")
+            if '{' in spec:
+                raise TemplateError(f"{name}: nested placeholders in the format spec of '{{{field}}}' are not supported")
+            try:
+                format(_CONVERSIONS[conversion](fields[field]), spec)
+            except (ValueError, TypeError) as e:
+                raise TemplateError(f"{name}: invalid format spec '{spec}' for '{{{field}}}': {e}")
+
+            if field == 'separator' and not spec and conversion is None:
+                # Constant for every item, so fold it into the literal text
+                literal += SEPARATOR
+                field = None
+            self.parts.append((literal, field, spec, conversion))
+            pattern.append(_escape(literal))
+            if field is not None:
+                pattern.append('{' + field + (f'!{conversion}' if conversion else '') + (f':{spec}' if spec else '') + '}')
+
+        self.pattern = ''.join(pattern)
+        self.fields = tuple(dict.fromkeys(field for _, field, _, _ in self.parts if field))
+
+    def render(self, item):
+        """Format one item; values that do not fit a format spec (e.g. 'Unknown' for {season:02d})
+        are written as plain text instead of failing the whole report"""
+        try:
+            return self.pattern.format_map(item)
+        except (KeyError, ValueError, TypeError):
+            return self._render_lenient(item)
+
+    def _render_lenient(self, item):
+        chunks = []
+        for literal, field, spec, conversion in self.parts:
+            chunks.append(literal)
+            if field is None:
+                continue
+            value = SEPARATOR if field == 'separator' else item.get(field, '')
+            try:
+                chunks.append(format(_CONVERSIONS[conversion](value), spec))
+            except (ValueError, TypeError):
+                chunks.append(str(value))
+        return ''.join(chunks)
+
+
+def compile_formats(config):
+    """Compile the movie, TV and schedule formats from config; raises TemplateError"""
+    return {
+        name: CompiledTemplate(name, config.get(name) or default, FORMAT_FIELDS[name])
+        for name, default in DEFAULT_FORMATS.items()
+    }
+
+
+def validate_formats(config):
+    """List of error messages for the format strings in config (empty when all compile)"""
+    errors = []
+    for name, default in DEFAULT_FORMATS.items():
+        try:
+            CompiledTemplate(name, config.get(name) or default, FORMAT_FIELDS[name])
+        except TemplateError as e:
+            errors.append(str(e))
+    return errors
+
+
+class ReportRenderer:
+    """Text report built from compiled templates and streamed in buffered chunks"""
+
+    def __init__(self, config):
+        self.config = config
+        self.templates = compile_formats(config)
+
+    def header(self, now=None):
+        now = now or datetime.now()
+        header = f"{self.config.get('report_title', 'Media Tracker Report')} - {now.strftime('%Y-%m-%d')}"
+        if self.config.get('include_timestamps', True):
+            header += f" (Generated: {now.strftime('%Y-%m-%d %H:%M:%S')})"
+        return header
+
+    def _section(self, title, template, items, empty_text, lead='\n'):
+        yield f"{lead}{title}\n" + "=" * len(title) + "\n"
+        render = template.render
+        empty = True
+        for item in items:
+            empty = False
+            yield render(item) + "\n"
+        if empty:
+            yield empty_text
+
+    def chunks(self, movies, tv_shows, scheduled_shows, now=None):
+        """Generate the report text piece by piece; items may be any iterables"""
+        header = self.header(now)
+        yield header + "\n" + "=" * len(header) + "\n\n"
+
+        config = self.config
+        if config.get('include_movies', True):
+            yield from self._section(
+                config.get('movies_title', 'PLEX MOVIES ADDED'), self.templates['movie_format'], movies,
+                f"{config.get('no_movies_text', 'No movies added recently.')}\n\n", lead='')
+        if config.get('include_tv_shows', True):
+            yield from self._section(
+                config.get('tv_shows_title', 'PLEX TV SHOWS ADDED'), self.templates['tv_format'], tv_shows,
+                f"{config.get('no_tv_text', 'No TV shows added recently.')}\n\n")
+        if config.get('include_tv_calendar', True):
+            yield from self._section(
+                config.get('tv_calendar_title', 'TV SHOWS AIRING TODAY'), self.templates['schedule_format'],
+                scheduled_shows, f"{config.get('no_schedule_text', 'No shows scheduled for today.')}\n")
+
+    def write(self, f, movies, tv_shows, scheduled_shows, now=None, buffer_size=BUFFER_SIZE):
+        """Write the report to an open text file in chunks of about buffer_size characters"""
+        buffer = []
+        buffered = 0
+        written = 0
+        for chunk in self.chunks(movies, tv_shows, scheduled_shows, now):
+            buffer.append(chunk)
+            buffered += len(chunk)
+            if buffered >= buffer_size:
+                f.write(''.join(buffer))
+                written += buffered
+                buffer, buffered = [], 0
+        if buffer:
+            f.write(''.join(buffer))
+            written += buffered
+        return written
@@ -0,0 +1,231 @@
+import csv
+import html
+import json
+import logging
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from report_renderer import BUFFER_SIZE, ReportRenderer
+
+DEFAULT_OUTPUT_FORMATS = ['text']
+
+MOVIE_FIELDS = ('title', 'year', 'added_date')
+SCHEDULE_FIELDS = ('series_title', 'episode_title', 'season', 'episode', 'air_date')
+CSV_COLUMNS = ('section', 'title', 'year', 'added_date', 'series_title', 'episode_title', 'season', 'episode', 'air_date')
+
+# Registered writers by format name
+WRITERS = {}
+
+
+def register_writer(cls):
+    """Class decorator adding a ReportWriter to the registry under its format name"""
+    WRITERS[cls.format] = cls
+    return cls
+
+
+class ReportData:
+    """Collected report content shared read-only by every writer"""
+
+    def __init__(self, config, movies, tv_shows, scheduled_shows, now=None):
+        self.config = config
+        self.now = now or datetime.now()
+        self.movies = movies if config.get('include_movies', True) else None
+        self.tv_shows = tv_shows if config.get('include_tv_shows', True) else None
+        self.scheduled_shows = scheduled_shows if config.get('include_tv_calendar', True) else None
+        self.title = config.get('report_title', 'Media Tracker Report')
+
+    def sections(self):
+        """(key, title, items, fields, empty text) for each enabled section"""
+        config = self.config
+        sections = [
+            ('movies', config.get('movies_title', 'PLEX MOVIES ADDED'), self.movies, MOVIE_FIELDS,
+             config.get('no_movies_text', 'No movies added recently.')),
+            ('tv_shows', config.get('tv_shows_title', 'PLEX TV SHOWS ADDED'), self.tv_shows, MOVIE_FIELDS,
+             config.get('no_tv_text', 'No TV shows added recently.')),
+            ('schedule', config.get('tv_calendar_title', 'TV SHOWS AIRING TODAY'), self.scheduled_shows,
+             SCHEDULE_FIELDS, config.get('no_schedule_text', 'No shows scheduled for today.')),
+        ]
+        return [section for section in sections if section[2] is not None]
+
+
+class ReportWriter:
+    """Base class for a report output format"""
+    format = None
+    extension = None
+    newline = None
+
+    def __init__(self, config):
+        self.config = config
+
+    def write(self, f, data):
+        raise NotImplementedError
+
+
+@register_writer
+class TextWriter(ReportWriter):
+    """The configurable plain-text report"""
+    format = 'text'
+    extension = '.txt'
+
+    def __init__(self, config):
+        super().__init__(config)
+        self.renderer = ReportRenderer(config)
+
+    def write(self, f, data):
+        self.renderer.write(f, data.movies or (), data.tv_shows or (), data.scheduled_shows or (), now=data.now)
+
+
+@register_writer
+class JsonWriter(ReportWriter):
+    format = 'json'
+    extension = '.json'
+
+    def write(self, f, data):
+        report = {
+            'title': data.title,
+            'date': data.now.strftime('%Y-%m-%d'),
+            'generated_at': data.now.isoformat(timespec='seconds'),
+        }
+        for key, _, items, _, _ in data.sections():
+            report[key] = items
+        json.dump(report, f, indent=2)
+        f.write('\n')
+
+
+@register_writer
+class CsvWriter(ReportWriter):
+    """One row per item, tagged with its section"""
+    format = 'csv'
+    extension = '.csv'
+    newline = ''
+
+    def write(self, f, data):
+        writer = csv.DictWriter(f, fieldnames=CSV_COLUMNS, extrasaction='ignore')
+        writer.writeheader()
+        for key, _, items, _, _ in data.sections():
+            for item in items:
+                writer.writerow(dict(item, section=key))
+
+
+def _markdown_cell(value):
+    return str(value).replace('|', '\\|').replace('\n', ' ')
+
+
+@register_writer
+class MarkdownWriter(ReportWriter):
+    format = 'markdown'
+    extension = '.md'
+
+    def write(self, f, data):
+        f.write(f"# {data.title} - {data.now.strftime('%Y-%m-%d')}\n")
+        for _, title, items, fields, empty_text in data.sections():
+            f.write(f"\n## {title}\n\n")
+            if not items:
+                f.write(f"{empty_text}\n")
+                continue
+            f.write('| ' + ' | '.join(fields) + ' |\n')
+            f.write('|' + '---|' * len(fields) + '\n')
+            f.writelines(
+                '| ' + ' | '.join(_markdown_cell(item.get(field, '')) for field in fields) + ' |\n'
+                for item in items
+            )
+
+
+@register_writer
+class HtmlWriter(ReportWriter):
+    format = 'html'
+    extension = '.html'
+
+    def write(self, f, data):
+        heading = html.escape(f"{data.title} - {data.now.strftime('%Y-%m-%d')}")
+        f.write(f'<!DOCTYPE html>\n<html lang="en">\n<head>\n<meta charset="utf-8">\n<title>{heading}</title>\n</head>\n'
+                f'<body>\n<h1>{heading}</h1>\n')
+        for _, title, items, fields, empty_text in data.sections():
+            f.write(f'<h2>{html.escape(title)}</h2>\n')
+            if not items:
+                f.write(f'<p>{html.escape(empty_text)}</p>\n')
+                continue
+            f.write('<table>\n<tr>' + ''.join(f'<th>{field}</th>' for field in fields) + '</tr>\n')
+            f.writelines(
+                '<tr>' + ''.join(f'<td>{html.escape(str(item.get(field, "")))}</td>' for field in fields) + '</tr>\n'
+                for item in items
+            )
+            f.write('</table>\n')
+        f.write('</body>\n</html>\n')
+
+
+def configured_formats(config):
+    """Output formats from config, keeping only registered ones"""
+    formats = config.get('output_formats') or DEFAULT_OUTPUT_FORMATS
+    if isinstance(formats, str):
+        formats = [part.strip() for part in formats.split(',')]
+    unknown = [name for name in formats if name not in WRITERS]
+    if unknown:
+        logging.warning(f"Ignoring unknown output formats: {', '.join(unknown)}")
+    return [name for name in dict.fromkeys(formats) if name in WRITERS]
+
+
+def report_basename(config, now=None):
+    """Report file name without extension, following the file_naming setting"""
+    today_str = (now or datetime.now()).strftime('%Y-%m-%d')
+    file_naming = config.get('file_naming', 'date_suffix')
+    if file_naming == 'custom':
+        return os.path.splitext(config.get('single_output_file', 'media_tracker.txt'))[0]
+    if file_naming == 'date_prefix':
+        return f'{today_str}_media_tracker'
+    return f'media_tracker_{today_str}'
+
+
+def report_path(config, writer, now=None):
+    output_dir = config.get('output_directory', './output')
+    if writer.format == 'text' and config.get('file_naming') == 'custom':
+        return os.path.join(output_dir, config.get('single_output_file', 'media_tracker.txt'))
+    return os.path.join(output_dir, report_basename(config, now) + writer.extension)
+
+
+def atomic_write(path, write, newline=None):
+    """Write through a temporary file in the same directory, then rename it over path"""
+    directory = os.path.dirname(path) or '.'
+    fd, temp_path = tempfile.mkstemp(prefix='.' + os.path.basename(path) + '.', suffix='.tmp', dir=directory)
+    try:
+        # mkstemp creates the file private; reports are meant to be shared like before
+        os.chmod(temp_path, 0o644)
+        with os.fdopen(fd, 'w', encoding='utf-8', newline=newline, buffering=BUFFER_SIZE) as f:
+            write(f)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def write_reports(config, movies, tv_shows, scheduled_shows, formats=None, now=None):
+    """Render every configured format from one set of collected data, in parallel.
+    Returns ({format: path}, {format: error message}, {format: seconds})."""
+    now = now or datetime.now()
+    data = ReportData(config, movies, tv_shows, scheduled_shows, now)
+    # Build writers up front so template errors surface before any file is touched
+    writers = [WRITERS[name](config) for name in (formats or configured_formats(config))]
+    os.makedirs(config.get('output_directory', './output'), exist_ok=True)
+
+    def run(writer):
+        path = report_path(config, writer, now)
+        started = time.perf_counter()
+        atomic_write(path, lambda f: writer.write(f, data), newline=writer.newline)
+        return path, time.perf_counter() - started
+
+    written, errors, timings = {}, {}, {}
+    with ThreadPoolExecutor(max_workers=max(1, len(writers)), thread_name_prefix='report-writer') as executor:
+        futures = {writer.format: executor.submit(run, writer) for writer in writers}
+        for name, future in futures.items():
+            try:
+                written[name], timings[name] = future.result()
+            except Exception as e:
+                logging.error(f"Error writing {name} report: {str(e)}")
+                errors[name] = str(e)
+    return written, errors, timings
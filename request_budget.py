@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Upstream request budget checks for MediaTracker methods and Flask routes.
+Each entry point declares the maximum number of upstream requests it may
+make. The checks run against the local Plex/Sonarr stand-in at growing
+library sizes, so any request count that scales with the library (N+1
+fetches) exceeds its budget and fails.
+
+Usage:
+    python request_budget.py                 # check everything at default sizes
+    python request_budget.py --sizes 5 50 500
+"""
+
+import argparse
+import json
+import os
+import sys
+
+from instrumentation import count_requests
+from upstream_stub import SyntheticLibrary, UpstreamStub
+
+# MediaTracker method -> (call, maximum upstream requests per call)
+# The stand-in exposes two library sections (movies and TV shows).
+METHOD_BUDGETS = {
+    'test_plex_connection': (lambda t: t.test_plex_connection(), 1),
+    'test_sonarr_connection': (lambda t: t.test_sonarr_connection(), 1),
+    'get_plex_recent_content': (lambda t: t.get_plex_recent_content(), 3),
+    'get_sonarr_today_schedule': (lambda t: t.get_sonarr_today_schedule(), 1),
+    'get_plex_recent_content_extended': (lambda t: t.get_plex_recent_content_extended(days=7), 1),
+    'get_plex_all_content': (lambda t: t.get_plex_all_content(), 3),
+    'get_sonarr_calendar_extended': (lambda t: t.get_sonarr_calendar_extended(days=7), 1),
+    'get_plex_library_stats': (lambda t: t.get_plex_library_stats(), 3),
+    'get_dashboard_content': (lambda t: t.get_dashboard_content(), 1),
+    'run_daily_sync': (lambda t: t.run_daily_sync(), 4),
+}
+
+# Flask route -> maximum upstream requests per request
+ROUTE_BUDGETS = {
+    '/api/status': 2,
+    # Loads the whole library (movies, shows) and answers any window from the index
+    '/api/recent?days=7': 3,
+    '/api/all_content': 3,
+    '/api/schedule?days=7': 1,
+    '/api/full_sync?days=7': 5,
+    '/api/library_stats': 3,
+    # Count-only stats: Plex sections plus an empty page per movie/show/episode listing, Sonarr series
+    '/api/sources': 5,
+    # Sections, then one streamed page of movies and one of episodes
+    '/api/storage': 3,
+    '/dashboard': 0,
+    '/internal/status': 2,
+    '/internal/all_content': 3,
+    '/internal/schedule?days=7': 1,
+    '/internal/library_stats': 3,
+}
+
+DEFAULT_SIZES = (5, 50, 250)
+
+
+class RequestBudgetExceeded(AssertionError):
+    """Raised when an entry point makes more upstream requests than its budget"""
+
+
+def assert_request_budget(label, budget, func, *args, **kwargs):
+    """Call func and fail if it issues more than `budget` upstream requests.
+    Returns (result, RequestCount)."""
+    with count_requests() as counter:
+        result = func(*args, **kwargs)
+    if counter.requests > budget:
+        endpoints = ', '.join(f'{endpoint} x{count}' for endpoint, count in sorted(counter.endpoints.items()))
+        raise RequestBudgetExceeded(
+            f"{label} made {counter.requests} upstream requests (budget {budget}): {endpoints}"
+        )
+    return result, counter
+
+
+def library_for_size(size):
+    """Synthetic library with `size` movies and a proportional number of shows"""
+    return SyntheticLibrary(movies=size, shows=max(1, size // 5))
+
+
+def tracker_config(upstream_url, output_dir):
+    return {
+        'plex_url': upstream_url,
+        'plex_token': 'budget-token',
+        'sonarr_url': upstream_url,
+        'sonarr_api_key': 'budget-key',
+        'output_directory': output_dir,
+        'github_enabled': False,
+    }
+
+
+def reset_caches():
+    """Drop every in-process cache of upstream data, so each check starts cold and its
+    request count reflects the current library size rather than an earlier one"""
+    from dashboard_events import dashboard_events
+    from facet_index import facet_index
+    from search_index import search_index
+    from sources import source_scheduler
+    from storage_analysis import storage_analyzer
+
+    dashboard_events.clear()
+    facet_index.reset()
+    search_index.reset()
+    source_scheduler.clear_cache()
+    storage_analyzer.clear()
+
+
+def check_methods(stub, sizes, workdir):
+    """Check every MediaTracker method budget at each library size"""
+    from media_tracker import MediaTracker
+
+    results = []
+    for size in sizes:
+        stub.set_library(library_for_size(size))
+        tracker = MediaTracker(tracker_config(stub.url, os.path.join(workdir, 'output')))
+        for name, (call, budget) in METHOD_BUDGETS.items():
+            reset_caches()
+            results.append(_check(f'MediaTracker.{name}', size, budget, call, tracker))
+    return results
+
+
+def check_routes(stub, sizes, workdir):
+    """Check every Flask route budget at each library size via the test client"""
+    from load_test import LOAD_TEST_API_KEY, prepare_workdir
+
+    app_dir = prepare_workdir(stub.url, {'output_directory': os.path.join(workdir, 'output')})
+    # app.py reads config.json and api_keys.json from the working directory
+    os.chdir(app_dir)
+    from app import app
+
+    client = app.test_client()
+    results = []
+    for size in sizes:
+        stub.set_library(library_for_size(size))
+        for path, budget in ROUTE_BUDGETS.items():
+            reset_caches()
+            call = lambda: client.get(path, headers={'X-API-Key': LOAD_TEST_API_KEY})
+            results.append(_check(f'GET {path}', size, budget, call))
+    return results
+
+
+def _check(label, size, budget, func, *args):
+    try:
+        _, counter = assert_request_budget(label, budget, func, *args)
+        return {'label': label, 'size': size, 'budget': budget, 'requests': counter.requests,
+                'bytes': counter.bytes, 'ok': True, 'error': None}
+    except RequestBudgetExceeded as e:
+        return {'label': label, 'size': size, 'budget': budget, 'requests': None,
+                'bytes': None, 'ok': False, 'error': str(e)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check upstream request budgets against a synthetic library')
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES),
+                        help='Synthetic library sizes (movie counts) to check')
+    parser.add_argument('--skip-routes', action='store_true', help='Only check MediaTracker methods')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    args = parser.parse_args()
+
+    import logging
+    import tempfile
+    logging.disable(logging.WARNING)
+
+    cwd = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix='media-tracker-budget-')
+    with UpstreamStub() as stub:
+        try:
+            results = check_methods(stub, args.sizes, workdir)
+            if not args.skip_routes:
+                results += check_routes(stub, args.sizes, workdir)
+        finally:
+            os.chdir(cwd)
+
+    failures = [r for r in results if not r['ok']]
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for r in results:
+            status = 'ok  ' if r['ok'] else 'FAIL'
+            detail = f"{r['requests']}/{r['budget']} requests, {r['bytes']} bytes" if r['ok'] else r['error']
+            print(f"[{status}] size={r['size']:<6} {r['label']:<45} {detail}")
+        print(f"\n{len(results) - len(failures)}/{len(results)} budget checks passed")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,15 +2,34 @@
 """
 Daily media tracker script for cron job execution.
 This script runs the daily sync without starting the web server.
+Use --history to print phase timing trends from previous runs instead.
 """
 
 import sys
+import argparse
 import logging
 from config import ConfigManager
 from media_tracker import MediaTracker
+from sync_history import SyncHistory, history_file_for, schedule_interval_seconds, format_summary
+
+def show_history(limit):
+    """Print the sync phase timing summary"""
+    config = ConfigManager().get_config()
+    history = SyncHistory(history_file_for(config))
+    summary = history.summary(limit=limit, interval_seconds=schedule_interval_seconds(config))
+    print(format_summary(summary))
 
 def main():
     """Main function for daily sync execution"""
+    parser = argparse.ArgumentParser(description='Run the media tracker daily sync')
+    parser.add_argument('--history', action='store_true', help='Show sync timing history instead of running a sync')
+    parser.add_argument('--limit', type=int, default=50, help='Number of past runs to summarize')
+    args = parser.parse_args()
+    
+    if args.history:
+        show_history(args.limit)
+        sys.exit(0)
+    
     # Configure logging for cron job
     logging.basicConfig(
         level=logging.INFO,
@@ -44,6 +63,9 @@ def main():
             logging.info(f"Movies found: {results.get('movies_count', 0)}")
             logging.info(f"TV shows found: {results.get('shows_count', 0)}")
             logging.info(f"Scheduled shows: {results.get('scheduled_count', 0)}")
+            logging.info(f"Duration: {results.get('duration', 0):.2f}s")
+            for phase, seconds in results.get('timings', {}).items():
+                logging.info(f"  {phase}: {seconds:.3f}s")
             sys.exit(0)
         else:
             logging.error(f"Daily sync failed: {results['error']}")
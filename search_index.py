@@ -0,0 +1,270 @@
+import bisect
+import heapq
+import re
+import unicodedata
+from array import array
+from collections import Counter, defaultdict
+
+from dashboard_events import item_key
+from library_index import LibraryIndex, LIST_TYPES
+
+# Weight of a term by the field it appears in; small ints are shared objects, which keeps
+# millions of postings cheap
+FIELD_WEIGHTS = {
+    'title': 10,
+    'original_title': 8,
+    'actors': 4,
+    'director': 4,
+    'genres': 3,
+    'studio': 3,
+    'network': 3,
+    'summary': 1,
+}
+# Score multipliers by how a query term matched an indexed term
+EXACT, PREFIX, TYPO = 1.0, 0.6, 0.4
+# Added to the score of items whose title is the query, or starts with it, so they rank first
+TITLE_BONUS = 1e6
+# Shortest query term matched as a prefix, and the most frequent vocabulary terms a prefix
+# expands to, so short prefixes stay fast
+MIN_PREFIX_LENGTH = 2
+MAX_PREFIX_TERMS = 64
+MAX_PER_PAGE = 100
+
+_TOKEN = re.compile(r'\w+')
+
+
+def tokenize(text):
+    """Lowercase, accent-folded word tokens"""
+    if not text:
+        return []
+    text = str(text).lower()
+    if not text.isascii():
+        folded = unicodedata.normalize('NFKD', text)
+        text = ''.join(c for c in folded if not unicodedata.combining(c))
+    return _TOKEN.findall(text)
+
+
+def max_typos(term):
+    """Edits a query term may be off by: none for short words, one from 4 letters, two from 8"""
+    return 0 if len(term) < 4 else 1 if len(term) < 8 else 2
+
+
+def within_distance(a, b, limit):
+    """Whether a and b are at most limit edits apart, counting a swap of adjacent letters as
+    one edit (optimal string alignment distance), stopping early once they are not"""
+    if abs(len(a) - len(b)) > limit:
+        return False
+    before, previous = None, list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            cost = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb))
+            if i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                cost = min(cost, before[j - 2] + 1)
+            current.append(cost)
+        if min(current) > limit:
+            return False
+        before, previous = previous, current
+    return previous[-1] <= limit
+
+
+def _field_text(item, field):
+    value = item.get(field)
+    if field == 'actors':
+        return ' '.join(actor.get('name', '') for actor in value or [])
+    if isinstance(value, list):
+        return ' '.join(str(v) for v in value)
+    return value or ''
+
+
+def document_terms(item):
+    """{term: weight} for an item, summing field weights over every occurrence"""
+    terms = Counter()
+    for field, weight in FIELD_WEIGHTS.items():
+        tokens = tokenize(_field_text(item, field))
+        # Repeating the tokens lets Counter do the weighting in C
+        terms.update(tokens * weight if weight > 1 else tokens)
+    return terms
+
+
+def _doc_ids():
+    return array('I')
+
+
+def _weights():
+    return array('B')
+
+
+class SearchIndex(LibraryIndex):
+    """Inverted index over the normalized library. Each term's postings are parallel arrays of
+    ascending document ids and field weights; a sorted vocabulary answers prefix lookups with
+    bisect and narrows typo candidates to terms sharing the first letter."""
+
+    name = 'search'
+
+    def __init__(self):
+        super().__init__()
+        self.postings = defaultdict(_doc_ids)
+        self.weights = defaultdict(_weights)
+        self.vocabulary = []
+        self.documents = {}
+        self.doc_ids = {}
+        self._next_id = 0
+
+    def __len__(self):
+        return len(self.documents)
+
+    def _add_term(self, term):
+        bisect.insort(self.vocabulary, term)
+
+    def _remove_term(self, term):
+        index = bisect.bisect_left(self.vocabulary, term)
+        if index < len(self.vocabulary) and self.vocabulary[index] == term:
+            del self.vocabulary[index]
+
+    def _remove(self, key):
+        doc_id = self.doc_ids.pop(key, None)
+        if doc_id is None:
+            return
+        # Items are never mutated in place, so their terms can be derived again instead of stored
+        _, item, _ = self.documents.pop(doc_id)
+        for term in document_terms(item):
+            doc_ids = self.postings[term]
+            if len(doc_ids) == 1:
+                del self.postings[term]
+                del self.weights[term]
+                self._remove_term(term)
+                continue
+            index = bisect.bisect_left(doc_ids, doc_id)
+            del doc_ids[index]
+            del self.weights[term][index]
+
+    def _add(self, item, item_type, keep_sorted=True):
+        key = item_key(item)
+        self._remove(key)
+        # Ids only grow, so appending keeps every postings array sorted
+        doc_id = self._next_id
+        self._next_id += 1
+        self.doc_ids[key] = doc_id
+        self.documents[doc_id] = (item_type, item, ' '.join(tokenize(item.get('title'))))
+        postings, weights = self.postings, self.weights
+        for term, weight in document_terms(item).items():
+            if keep_sorted and term not in postings:
+                self._add_term(term)
+            postings[term].append(doc_id)
+            weights[term].append(min(weight, 255))
+
+    def build(self, library):
+        """Index every movie and show of an all_content payload from scratch"""
+        with self.lock:
+            self.postings, self.weights = defaultdict(_doc_ids), defaultdict(_weights)
+            self.documents, self.doc_ids = {}, {}
+            self.vocabulary = []
+            for field, item_type in LIST_TYPES.items():
+                for item in library.get(field) or []:
+                    self._add(item, item_type, keep_sorted=False)
+            # One sort instead of an insort per new term
+            self.vocabulary = sorted(self.postings)
+            self._built()
+
+    def apply_delta(self, delta):
+        """Apply an all_content delta from DashboardEvents: added, changed and removed items"""
+        with self.lock:
+            for field, item_type in LIST_TYPES.items():
+                changes = delta.get(field)
+                if not changes:
+                    continue
+                for key in changes.get('removed', []):
+                    self._remove(key)
+                for added in changes.get('added', []):
+                    self._add(added['item'], item_type)
+                for item in changes.get('changed', []):
+                    self._add(item, item_type)
+
+    def _prefix_terms(self, prefix):
+        start = bisect.bisect_left(self.vocabulary, prefix)
+        end = bisect.bisect_left(self.vocabulary, prefix + '\uffff', start)
+        if end - start <= MAX_PREFIX_TERMS:
+            return self.vocabulary[start:end]
+        return heapq.nlargest(MAX_PREFIX_TERMS, self.vocabulary[start:end],
+                              key=lambda term: len(self.postings[term]))
+
+    def _typo_terms(self, term):
+        limit = max_typos(term)
+        if not limit:
+            return []
+        start = bisect.bisect_left(self.vocabulary, term[0])
+        end = bisect.bisect_left(self.vocabulary, term[0] + '\uffff', start)
+        return [candidate for candidate in self.vocabulary[start:end]
+                if candidate != term and within_distance(term, candidate, limit)]
+
+    def _matches(self, term, prefix):
+        """{doc_id: score} for documents matching one query term exactly, by prefix or with typos"""
+        expansions = {}
+        if term in self.postings:
+            expansions[term] = EXACT
+        if prefix and len(term) >= MIN_PREFIX_LENGTH:
+            for candidate in self._prefix_terms(term):
+                expansions.setdefault(candidate, PREFIX)
+        # Typos only widen terms that match nothing as typed
+        if not expansions:
+            for candidate in self._typo_terms(term):
+                expansions.setdefault(candidate, TYPO)
+
+        total = len(self.documents) or 1
+        scores = {}
+        for candidate, quality in expansions.items():
+            doc_ids = self.postings[candidate]
+            # Rarer terms count for more
+            factor = quality * (1.0 + (total / len(doc_ids)) ** 0.5 / 10)
+            for doc_id, weight in zip(doc_ids, self.weights[candidate]):
+                score = weight * factor
+                if score > scores.get(doc_id, 0.0):
+                    scores[doc_id] = score
+        return scores
+
+    def search(self, query, item_type=None, page=1, per_page=20):
+        """Ranked page of matches: every query term must match; the last one also as a prefix"""
+        terms = tokenize(query)
+        per_page = max(1, min(per_page, MAX_PER_PAGE))
+        page = max(1, page)
+        if not terms:
+            return {'total': 0, 'results': []}
+
+        with self.lock:
+            self.sync()
+            matched = []
+            for i, term in enumerate(terms):
+                matches = self._matches(term, prefix=(i == len(terms) - 1))
+                if not matches:
+                    return {'total': 0, 'results': []}
+                matched.append(matches)
+            matched.sort(key=len)
+            phrase = ' '.join(terms)
+            scores, ranking = {}, {}
+            for doc_id, score in matched[0].items():
+                kind, _, title = self.documents[doc_id]
+                if item_type and kind != item_type:
+                    continue
+                for other in matched[1:]:
+                    other_score = other.get(doc_id)
+                    if other_score is None:
+                        break
+                    score += other_score
+                else:
+                    scores[doc_id] = score
+                    if title.startswith(phrase):
+                        score += TITLE_BONUS * (2 if title == phrase else 1)
+                    ranking[doc_id] = score
+
+            start = (page - 1) * per_page
+            if start + per_page <= 1000:
+                ranked = heapq.nlargest(start + per_page, ranking, key=ranking.__getitem__)[start:]
+            else:
+                ranked = sorted(ranking, key=ranking.__getitem__, reverse=True)[start:start + per_page]
+            results = [dict(self.documents[doc_id][1], type=self.documents[doc_id][0],
+                            score=round(scores[doc_id], 3)) for doc_id in ranked]
+        return {'total': len(scores), 'results': results}
+
+
+search_index = SearchIndex()
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Long-running soak test for the media tracker web app.
+Boots app.py with the scheduler running on an accelerated interval against
+the local Plex/Sonarr stand-in, keeps a steady request mix flowing and samples
+the server's RSS, open file descriptors, thread count and endpoint latency.
+Fails when any of them trends upward by more than its threshold.
+"""
+
+import argparse
+import csv
+import json
+import os
+import shutil
+import sys
+import time
+
+from load_test import (LoadRunner, free_port, parse_mix, percentile, prepare_workdir,
+                       start_app, stop_app, wait_for_port)
+from sync_history import SyncHistory, history_file_for
+from upstream_stub import SyntheticLibrary, UpstreamStub
+
+# metric -> (CLI option, default, relative?) ; relative thresholds are fractions of the starting level
+THRESHOLDS = {
+    'rss_kb': ('max_rss_growth', 0.25, True),
+    'open_fds': ('max_fd_growth', 10, False),
+    'threads': ('max_thread_growth', 4, False),
+    'p95_ms': ('max_latency_growth', 0.5, True),
+}
+
+
+def _process_tree(pid):
+    """pid plus all descendants (gunicorn workers), read from /proc"""
+    children = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # Fields after the parenthesised command name: state ppid ...
+        parent = int(stat.rsplit(')', 1)[1].split()[1])
+        children.setdefault(parent, []).append(int(entry))
+    tree, pending = [], [pid]
+    while pending:
+        current = pending.pop()
+        tree.append(current)
+        pending.extend(children.get(current, []))
+    return tree
+
+
+def _status_fields(pid):
+    fields = {}
+    with open(f'/proc/{pid}/status') as f:
+        for line in f:
+            name, _, value = line.partition(':')
+            fields[name] = value.split()
+    return fields
+
+
+def process_stats(pid):
+    """Summed RSS (kB), open fds and threads for a process and its children"""
+    totals = {'rss_kb': 0, 'open_fds': 0, 'threads': 0}
+    for member in _process_tree(pid):
+        try:
+            fields = _status_fields(member)
+            totals['rss_kb'] += int(fields.get('VmRSS', ['0'])[0])
+            totals['threads'] += int(fields.get('Threads', ['0'])[0])
+            totals['open_fds'] += len(os.listdir(f'/proc/{member}/fd'))
+        except (OSError, ValueError):
+            continue
+    return totals
+
+
+def linear_trend(times, values):
+    """Least-squares slope and intercept of values over times"""
+    n = len(values)
+    if n < 2:
+        return 0.0, values[0] if values else 0.0
+    mean_t = sum(times) / n
+    mean_v = sum(values) / n
+    denominator = sum((t - mean_t) ** 2 for t in times)
+    if not denominator:
+        return 0.0, mean_v
+    slope = sum((t - mean_t) * (v - mean_v) for t, v in zip(times, values)) / denominator
+    return slope, mean_v - slope * mean_t
+
+
+def evaluate(samples, thresholds, warmup):
+    """Fitted growth of each metric over the post-warmup samples, checked against thresholds"""
+    steady = [sample for sample in samples if sample['elapsed_s'] >= warmup]
+    results = {}
+    if len(steady) < 3:
+        return results
+    times = [sample['elapsed_s'] for sample in steady]
+    span = times[-1] - times[0]
+    for metric, (option, _, relative) in THRESHOLDS.items():
+        values = [sample[metric] for sample in steady]
+        slope, intercept = linear_trend(times, values)
+        start = intercept + slope * times[0]
+        growth = slope * span
+        limit = thresholds[option]
+        measured = growth / start if relative and start > 0 else growth
+        results[metric] = {
+            'start': round(start, 2),
+            'end': round(intercept + slope * times[-1], 2),
+            'slope_per_hour': round(slope * 3600, 3),
+            'growth': round(measured, 4),
+            'limit': limit,
+            'relative': relative,
+            'passed': measured <= limit
+        }
+    return results
+
+
+def print_sample(sample):
+    print(f"[{sample['elapsed_s']:>7.0f}s] rss {sample['rss_kb'] / 1024:7.1f} MiB  fds {sample['open_fds']:4d}  "
+          f"threads {sample['threads']:3d}  reqs {sample['requests']:5d}  err {sample['errors']:3d}  "
+          f"p50 {sample['p50_ms']:7.1f} ms  p95 {sample['p95_ms']:7.1f} ms", flush=True)
+
+
+def print_report(report):
+    print(f"\n=== Soak test: {report['duration_s'] / 60:.1f} min, {report['samples']} samples, "
+          f"{report['requests']} requests ({report['errors']} errors), {report['sync_runs']} scheduled syncs ===")
+    sync = report.get('sync')
+    if sync and sync['runs']:
+        print(f"Sync duration: mean {sync['total']['mean']:.2f}s, p95 {sync['total']['p95']:.2f}s, "
+              f"trend {sync['total']['trend_per_run']:+.4f}s/run, {sync['failures']} failed")
+    print(f"{'metric':<10}{'start':>12}{'end':>12}{'per hour':>12}{'growth':>10}{'limit':>10}  result")
+    for metric, row in report['trends'].items():
+        growth = f"{row['growth']:.1%}" if row['relative'] else f"{row['growth']:+.1f}"
+        limit = f"{row['limit']:.0%}" if row['relative'] else f"{row['limit']:+.0f}"
+        print(f"{metric:<10}{row['start']:>12.1f}{row['end']:>12.1f}{row['slope_per_hour']:>+12.2f}"
+              f"{growth:>10}{limit:>10}  {'ok' if row['passed'] else 'FAIL'}")
+    print('PASSED' if report['passed'] else 'FAILED')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Soak test app.py and its scheduler for memory and latency drift')
+    parser.add_argument('--server', choices=['dev', 'gunicorn'], default='dev',
+                        help='Server configuration to boot app.py under')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn worker processes')
+    parser.add_argument('--threads', type=int, default=4, help='gunicorn threads per worker')
+    parser.add_argument('--duration', type=float, default=3600.0, help='Total seconds to run')
+    parser.add_argument('--sample-interval', type=float, default=30.0, help='Seconds between resource samples')
+    parser.add_argument('--warmup', type=float, default=120.0,
+                        help='Seconds excluded from trend analysis while caches and pools fill')
+    parser.add_argument('--sync-interval', type=int, default=60,
+                        help='Seconds between scheduled syncs (stands in for the daily or hourly schedule)')
+    parser.add_argument('--concurrency', type=int, default=2, help='Concurrent client connections')
+    parser.add_argument('--mix', default='all', help='Endpoint mix, as for load_test.py')
+    parser.add_argument('--movies', type=int, default=200, help='Synthetic library movie count')
+    parser.add_argument('--shows', type=int, default=40, help='Synthetic library show count')
+    parser.add_argument('--upstream-latency', type=float, default=0.0,
+                        help='Seconds of delay the stand-in adds to each upstream response')
+    for metric, (option, default, relative) in THRESHOLDS.items():
+        unit = 'fraction of the starting level' if relative else 'absolute increase'
+        parser.add_argument('--' + option.replace('_', '-'), dest=option, type=float, default=default,
+                            help=f'Maximum fitted {metric} growth over the run ({unit}, default {default})')
+    parser.add_argument('--csv', help='Write every sample to this CSV file')
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+    args = parser.parse_args()
+
+    if not os.path.isdir('/proc/self/fd'):
+        parser.error('soak_test.py reads process statistics from /proc and needs Linux')
+
+    mix = parse_mix(args.mix)
+    thresholds = {option: getattr(args, option) for option, _, _ in THRESHOLDS.values()}
+    samples = []
+    library = SyntheticLibrary(movies=args.movies, shows=args.shows)
+    with UpstreamStub(library, latency=args.upstream_latency) as stub:
+        workdir = prepare_workdir(stub.url, {
+            'scheduler_enabled': True,
+            'schedule_type': 'interval',
+            'interval_seconds': args.sync_interval,
+        })
+        port = free_port()
+        process = start_app(args.server, workdir, port, workers=args.workers, threads=args.threads)
+        try:
+            wait_for_port(port, process)
+            base_url = f'http://127.0.0.1:{port}'
+            started = time.time()
+            while time.time() - started < args.duration:
+                if process.poll() is not None:
+                    raise RuntimeError(f"App server exited with code {process.returncode}")
+                window = min(args.sample_interval, args.duration - (time.time() - started))
+                runner = LoadRunner(base_url, mix, concurrency=args.concurrency, duration=window)
+                runner.run()
+                latencies = sorted(value for values in runner.latencies.values() for value in values)
+                sample = {
+                    'elapsed_s': round(time.time() - started, 1),
+                    'requests': len(latencies),
+                    'errors': sum(runner.errors.values()),
+                    'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+                    'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+                    'upstream_requests': stub.total_requests,
+                }
+                sample.update(process_stats(process.pid))
+                samples.append(sample)
+                if not args.json:
+                    print_sample(sample)
+
+            with open(os.path.join(workdir, 'config.json')) as f:
+                config = json.load(f)
+            history = SyncHistory(history_file_for(config))
+            sync_runs = len(history.load())
+            sync_summary = history.summary(limit=sync_runs or None, interval_seconds=args.sync_interval)
+        finally:
+            stop_app(process)
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    trends = evaluate(samples, thresholds, args.warmup)
+    report = {
+        'duration_s': samples[-1]['elapsed_s'] if samples else 0.0,
+        'samples': len(samples),
+        'requests': sum(sample['requests'] for sample in samples),
+        'errors': sum(sample['errors'] for sample in samples),
+        'sync_runs': sync_runs,
+        'sync': sync_summary,
+        'trends': trends,
+        # Too few post-warmup samples to judge a trend counts as a failure
+        'passed': bool(trends) and all(row['passed'] for row in trends.values()),
+    }
+
+    if args.csv and samples:
+        with open(args.csv, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(samples[0]))
+            writer.writeheader()
+            writer.writerows(samples)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+    sys.exit(0 if report['passed'] else 1)
+
+
+if __name__ == '__main__':
+    main()
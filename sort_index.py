@@ -0,0 +1,118 @@
+import bisect
+from array import array
+
+from library_index import bit_tester, bits_from_slots, set_bits
+
+# Sortable fields, and whether a zero means the value is missing
+SORT_FIELDS = {
+    'rating': False,
+    'year': True,
+    'added_timestamp': True,
+    'duration': True,
+    'episode_count': True,
+}
+
+
+def sort_value(item, field):
+    """Numeric value of a sortable field, or None when the item has none"""
+    try:
+        value = float(item.get(field))
+    except (TypeError, ValueError):
+        return None
+    if value != value or (not value and SORT_FIELDS[field]):
+        return None
+    return value
+
+
+class SortedOrder:
+    """One field's values in ascending order, as parallel arrays of values and slots"""
+
+    def __init__(self, entries=()):
+        entries = sorted(entries)
+        self.values = array('d', [value for value, _ in entries])
+        self.slots = array('I', [slot for _, slot in entries])
+
+    def __len__(self):
+        return len(self.slots)
+
+    def add(self, slot, value):
+        index = bisect.bisect_right(self.values, value)
+        self.values.insert(index, value)
+        self.slots.insert(index, slot)
+
+    def remove(self, slot, value):
+        index = bisect.bisect_left(self.values, value)
+        end = bisect.bisect_right(self.values, value, index)
+        for position in range(index, end):
+            if self.slots[position] == slot:
+                del self.values[position]
+                del self.slots[position]
+                return
+
+    def range(self, low=None, high=None):
+        """Slots with low <= value <= high, in ascending order of value"""
+        start = 0 if low is None else bisect.bisect_left(self.values, low)
+        end = len(self.values) if high is None else bisect.bisect_right(self.values, high)
+        return self.slots[start:end]
+
+    def walk(self, descending=False):
+        """Slots in sort order"""
+        return reversed(self.slots) if descending else iter(self.slots)
+
+
+class SortIndex:
+    """Sorted orders by rating, year, added time, duration and episode count over item slots,
+    with a bitset per field of the slots that have a value. Top-k is a walk from one end of an
+    order, so it costs O(k) (O(k * n / matches) when filtered) rather than a sort of the library."""
+
+    def __init__(self):
+        self.orders = {field: SortedOrder() for field in SORT_FIELDS}
+        self.present = {field: 0 for field in SORT_FIELDS}
+
+    def build(self, entries, size):
+        """Index (slot, item) pairs from scratch; size is the number of slots"""
+        values = {field: [] for field in SORT_FIELDS}
+        for slot, item in entries:
+            for field in SORT_FIELDS:
+                value = sort_value(item, field)
+                if value is not None:
+                    values[field].append((value, slot))
+        self.orders = {field: SortedOrder(pairs) for field, pairs in values.items()}
+        self.present = {field: bits_from_slots((slot for _, slot in pairs), size)
+                        for field, pairs in values.items()}
+
+    def add(self, slot, item):
+        for field, order in self.orders.items():
+            value = sort_value(item, field)
+            if value is not None:
+                order.add(slot, value)
+                self.present[field] |= 1 << slot
+
+    def remove(self, slot, item):
+        for field, order in self.orders.items():
+            value = sort_value(item, field)
+            if value is not None:
+                order.remove(slot, value)
+                self.present[field] &= ~(1 << slot)
+
+    def range_bits(self, field, low=None, high=None, size=0):
+        """Bitset of the slots whose value lies within [low, high]"""
+        return bits_from_slots(self.orders[field].range(low, high), size)
+
+    def top(self, field, bits, descending=True, start=0, count=None):
+        """Slots of the bitset in sort order, skipping `start` and stopping after `count`.
+        Items without a value for the field come last, in slot order."""
+        member = bit_tester(bits)
+        slots = []
+        skipped = 0
+        for slot in self.orders[field].walk(descending):
+            if not member(slot):
+                continue
+            if skipped < start:
+                skipped += 1
+                continue
+            slots.append(slot)
+            if count is not None and len(slots) >= count:
+                return slots
+        remaining = None if count is None else count - len(slots)
+        return slots + set_bits(bits & ~self.present[field], start - skipped, remaining)
@@ -0,0 +1,331 @@
+import contextvars
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from datetime import datetime
+
+import metrics
+from instrumentation import count_requests, count_failure
+from media_tracker import MediaTracker
+from upstream_servers import (plex_servers, sonarr_servers, plex_server_config, sonarr_server_config,
+                              fetch_concurrently, fetch_plex_library, fetch_sonarr_schedule, schedule_identity,
+                              server_phase_timer)
+
+OPERATIONS = ('fetch_full', 'fetch_incremental', 'health_check', 'stats')
+# Operations that run as part of a sync and time their phases into its PhaseTimer
+TIMED_OPERATIONS = ('fetch_full', 'fetch_incremental')
+# Health checks report the current state, so they are never answered from cache
+UNCACHED_OPERATIONS = ('health_check',)
+LIBRARY_FIELDS = ('movies', 'tv_shows')
+SCHEDULE_FIELDS = ('scheduled_shows',)
+# Settings of every source, overridden by its class and then by config['sources'][name]
+DEFAULT_SETTINGS = {
+    'enabled': True,
+    # Upstream calls of the source in flight at once, across all callers
+    'max_concurrency': 4,
+    # How long a run waits for the source before reporting it timed out
+    'time_budget_seconds': 120,
+    # Reuse a result this young instead of fetching again (0: always fetch)
+    'cache_seconds': 0,
+    # When a fetch fails or times out, fall back to a result this young (0: never)
+    'stale_seconds': 0,
+}
+
+
+class Source:
+    """Base for a media source plugin. A source contributes lists to named fields ('movies',
+    'tv_shows', 'scheduled_shows', ...) and implements four operations, each given the config:
+    fetch_full(config, days) -> ({field: items}, per-server summary); schedules reach days ahead
+    fetch_incremental(config, since) -> ({field: items}, per-server summary) of what is new
+        since the epoch time since
+    health_check(config) -> {server name: reachable}
+    stats(config) -> {name: count}, from count-only upstream calls where the service has them
+    The fetch operations also take phase_timer, the sync run's PhaseTimer or None, and pass it
+    to the MediaTrackers they create so their phases reach the sync history."""
+
+    name = None
+    fields = ()
+    settings = {}
+
+    def __init__(self):
+        self._limits = {}
+        self._limits_lock = threading.Lock()
+
+    def servers(self, config):
+        """Upstream instances the source reads, as upstream_servers entries"""
+        return []
+
+    def configured(self, config):
+        return bool(self.servers(config))
+
+    def settings_for(self, config):
+        settings = dict(DEFAULT_SETTINGS, **self.settings)
+        settings.update((config.get('sources') or {}).get(self.name) or {})
+        return settings
+
+    def limit(self, config):
+        """Semaphore bounding the source's upstream calls in flight, shared by every caller"""
+        size = max(1, int(self.settings_for(config)['max_concurrency']))
+        with self._limits_lock:
+            return self._limits.setdefault(size, threading.BoundedSemaphore(size))
+
+    def fetch_full(self, config, days, phase_timer=None):
+        raise NotImplementedError
+
+    def fetch_incremental(self, config, since, phase_timer=None):
+        raise NotImplementedError
+
+    def health_check(self, config):
+        raise NotImplementedError
+
+    def stats(self, config):
+        raise NotImplementedError
+
+
+class PlexSource(Source):
+    """Movies and shows from the configured Plex servers"""
+
+    name = 'plex'
+    fields = LIBRARY_FIELDS
+
+    def servers(self, config):
+        return plex_servers(config)
+
+    def fetch_full(self, config, days=None, phase_timer=None):
+        movies, tv_shows, servers = fetch_plex_library(config, self.limit(config), phase_timer)
+        return {'movies': movies, 'tv_shows': tv_shows}, servers
+
+    def fetch_incremental(self, config, since, phase_timer=None):
+        """Items of each server's recently added lists added on or after the day of since"""
+        since_date = datetime.fromtimestamp(since).strftime('%Y-%m-%d')
+        results = fetch_concurrently(
+            self.servers(config),
+            lambda server: MediaTracker(plex_server_config(config, server),
+                                        phase_timer=server_phase_timer(phase_timer, server)).get_plex_recent_content(),
+            self.limit(config))
+        data = {'movies': [], 'tv_shows': []}
+        servers = {}
+        for server, recent, error, seconds in results:
+            movies, tv_shows = recent or ([], [])
+            data['movies'].extend(item for item in movies if item['added_date'] >= since_date)
+            data['tv_shows'].extend(item for item in tv_shows if item['added_date'] >= since_date)
+            servers[server['name']] = {'movies': len(movies), 'tv_shows': len(tv_shows),
+                                       'error': error, 'seconds': round(seconds, 3)}
+        return data, servers
+
+    def health_check(self, config):
+        return {server['name']: bool(connected) for server, connected, _, _ in fetch_concurrently(
+            self.servers(config),
+            lambda server: MediaTracker(plex_server_config(config, server)).test_plex_connection(),
+            self.limit(config))}
+
+    def stats(self, config):
+        counts = {'movies': 0, 'tv_shows': 0, 'episodes': 0}
+        for _, server_counts, _, _ in fetch_concurrently(
+                self.servers(config),
+                lambda server: MediaTracker(plex_server_config(config, server)).get_plex_library_counts(),
+                self.limit(config)):
+            for name, count in (server_counts or {}).items():
+                counts[name] += count
+        return counts
+
+
+class SonarrSource(Source):
+    """Upcoming episodes from the configured Sonarr instances"""
+
+    name = 'sonarr'
+    fields = SCHEDULE_FIELDS
+    settings = {'time_budget_seconds': 60}
+
+    def servers(self, config):
+        return sonarr_servers(config)
+
+    def fetch_full(self, config, days=7, phase_timer=None):
+        scheduled_shows, servers = fetch_sonarr_schedule(config, days, self.limit(config), phase_timer)
+        return {'scheduled_shows': scheduled_shows}, servers
+
+    def fetch_incremental(self, config, since, phase_timer=None):
+        """Episodes airing today, once each across instances; a schedule has no history to
+        diff against, so since is not used"""
+        results = fetch_concurrently(
+            self.servers(config),
+            lambda server: MediaTracker(sonarr_server_config(config, server),
+                                        phase_timer=server_phase_timer(phase_timer, server)).get_sonarr_today_schedule(),
+            self.limit(config))
+        scheduled_shows, seen = [], set()
+        servers = {}
+        for server, scheduled, error, seconds in results:
+            for item in scheduled or []:
+                key = schedule_identity(item)
+                if key not in seen:
+                    seen.add(key)
+                    scheduled_shows.append(item)
+            servers[server['name']] = {'scheduled_shows': len(scheduled or []), 'error': error,
+                                       'seconds': round(seconds, 3)}
+        return {'scheduled_shows': scheduled_shows}, servers
+
+    def health_check(self, config):
+        return {server['name']: bool(connected) for server, connected, _, _ in fetch_concurrently(
+            self.servers(config),
+            lambda server: MediaTracker(sonarr_server_config(config, server)).test_sonarr_connection(),
+            self.limit(config))}
+
+    def stats(self, config):
+        return {'series': sum(count or 0 for _, count, _, _ in fetch_concurrently(
+            self.servers(config),
+            lambda server: MediaTracker(sonarr_server_config(config, server)).get_sonarr_series_count(),
+            self.limit(config)))}
+
+
+# Registered sources by name, in the order their results are merged
+SOURCES = {}
+
+
+def register_source(source):
+    """Register a source plugin instance; registering a name again replaces the source"""
+    SOURCES[source.name] = source
+    return source
+
+
+def active_sources(config, fields=None):
+    """Registered sources that are enabled and configured, optionally only those
+    contributing to any of fields"""
+    return [source for source in SOURCES.values()
+            if source.settings_for(config)['enabled'] and source.configured(config)
+            and (fields is None or set(source.fields) & set(fields))]
+
+
+class SourceScheduler:
+    """Runs an operation on every active source at once, each in its own thread. A source's
+    upstream calls are bounded by its own concurrency limit, and a run waits for it at most its
+    time budget, so a slow or stuck source never holds up the others or the caller for longer.
+    Results are kept per source and arguments for its cache policy."""
+
+    def __init__(self):
+        self._cache = {}
+        self._cache_lock = threading.Lock()
+
+    def clear_cache(self):
+        with self._cache_lock:
+            self._cache = {}
+
+    def _cache_key(self, source, config, operation, args):
+        servers = tuple((server['name'], server['url']) for server in source.servers(config))
+        return (source.name, operation, args, servers)
+
+    def _cached(self, key, max_age):
+        with self._cache_lock:
+            entry = self._cache.get(key)
+        if entry and max_age > 0 and time.monotonic() - entry[0] <= max_age:
+            return entry[1]
+        return None
+
+    def _call(self, source, settings, config, operation, args, phase_timer=None):
+        """(result, status, error, seconds) of one source operation, run in the source's thread"""
+        cacheable = operation not in UNCACHED_OPERATIONS
+        key = self._cache_key(source, config, operation, args)
+        if cacheable:
+            cached = self._cached(key, settings['cache_seconds'])
+            if cached is not None:
+                return cached, 'cached', None, 0.0
+        started = time.perf_counter()
+        with count_requests() as counter:
+            try:
+                kwargs = {'phase_timer': phase_timer} if phase_timer is not None and operation in TIMED_OPERATIONS else {}
+                result, error = getattr(source, operation)(config, *args, **kwargs), None
+            except Exception as e:
+                logging.error(f"Source {source.name} {operation} failed: {str(e)}")
+                result, error = None, str(e)
+        seconds = time.perf_counter() - started
+        if error is None and counter.errors:
+            error = f'{counter.errors} failed upstream request(s)'
+        if error is None:
+            if cacheable and (settings['cache_seconds'] > 0 or settings['stale_seconds'] > 0):
+                with self._cache_lock:
+                    self._cache[key] = (time.monotonic(), result)
+            return result, 'success', None, seconds
+        if cacheable:
+            stale = self._cached(key, settings['stale_seconds'])
+            if stale is not None:
+                return stale, 'stale', error, seconds
+        return result, 'failure', error, seconds
+
+    def run(self, config, operation, *args, fields=None, phase_timer=None):
+        """{source name: {'result', 'status', 'error', 'seconds'}} of operation(config, *args) on
+        every active source, in registration order. status is success, failure, timeout, cached
+        or stale; result is None when the source timed out with nothing cached to fall back on.
+        A timeout counts as an error in the caller's count_requests() blocks, like a failed
+        upstream request, so partial data is not published as the library. phase_timer
+        receives the phases of the fetch operations."""
+        if operation not in OPERATIONS:
+            raise ValueError(f'Unknown source operation: {operation}')
+        sources = active_sources(config, fields)
+        runs = {}
+        if not sources:
+            return runs
+        executor = ThreadPoolExecutor(max_workers=len(sources), thread_name_prefix='source')
+        try:
+            started = time.perf_counter()
+            pending = []
+            for source in sources:
+                settings = source.settings_for(config)
+                future = executor.submit(contextvars.copy_context().run, self._call, source, settings,
+                                         config, operation, args, phase_timer)
+                pending.append((source, settings, future))
+            for source, settings, future in pending:
+                budget = float(settings['time_budget_seconds'])
+                try:
+                    result, status, error, seconds = future.result(
+                        timeout=max(0.0, started + budget - time.perf_counter()))
+                except FutureTimeoutError:
+                    count_failure()
+                    error = f'exceeded its {budget:g}s time budget'
+                    logging.warning(f"Source {source.name} {operation} {error}")
+                    result, status, seconds = None, 'timeout', time.perf_counter() - started
+                    if operation not in UNCACHED_OPERATIONS:
+                        stale = self._cached(self._cache_key(source, config, operation, args), settings['stale_seconds'])
+                        if stale is not None:
+                            result, status = stale, 'stale'
+                metrics.record_source(source.name, operation, seconds, status)
+                runs[source.name] = {'result': result, 'status': status, 'error': error,
+                                     'seconds': round(seconds, 3)}
+        finally:
+            # A source past its budget finishes in the background; its result still fills the cache
+            executor.shutdown(wait=False)
+        return runs
+
+
+def merged_fields(runs, fields):
+    """({field: items from every source}, {server: summary}) of fetch operation runs"""
+    data = {field: [] for field in fields}
+    servers = {}
+    for run in runs.values():
+        if run['result'] is None:
+            continue
+        values, summary = run['result']
+        for field in fields:
+            data[field].extend(values.get(field) or [])
+        servers.update(summary or {})
+    return data, servers
+
+
+def fetch_library(config):
+    """All movies and shows from the library sources, with the per-server summary"""
+    data, servers = merged_fields(source_scheduler.run(config, 'fetch_full', None, fields=LIBRARY_FIELDS),
+                                  LIBRARY_FIELDS)
+    return data['movies'], data['tv_shows'], servers
+
+
+def fetch_schedule(config, days):
+    """Upcoming episodes from the schedule sources, with the per-server summary"""
+    runs = source_scheduler.run(config, 'fetch_full', days, fields=SCHEDULE_FIELDS)
+    data, servers = merged_fields(runs, SCHEDULE_FIELDS)
+    if len(runs) > 1:
+        data['scheduled_shows'].sort(key=lambda item: (item.get('air_date', ''), item.get('air_time', '')))
+    return data['scheduled_shows'], servers
+
+
+register_source(PlexSource())
+register_source(SonarrSource())
+source_scheduler = SourceScheduler()
@@ -0,0 +1,143 @@
+import hashlib
+import threading
+import time
+from datetime import datetime
+
+# Report dimensions: name -> value of a media version (or its item) to total bytes by
+DIMENSIONS = {
+    'codecs': lambda item, media: media['codec'],
+    'resolutions': lambda item, media: media['resolution'],
+    'containers': lambda item, media: media['container'],
+    'years': lambda item, media: str(item['year']),
+}
+DEFAULT_MAX_AGE = 3600
+DEFAULT_DUPLICATES_LIMIT = 50
+MAX_DUPLICATES_LIMIT = 1000
+
+
+def guid_digest(guid):
+    """Fixed-size key for a guid, so the duplicate index costs the same per item whatever the guid length"""
+    return hashlib.blake2b(guid.encode('utf-8'), digest_size=8).digest()
+
+
+def _buckets(totals):
+    """[{'value', 'media', 'bytes'}] of a {value: [media, bytes]} dict, largest first"""
+    return [{'value': value, 'media': media, 'bytes': size}
+            for value, (media, size) in sorted(totals.items(), key=lambda entry: (-entry[1][1], entry[0]))]
+
+
+class StorageReport:
+    """Running totals of one storage analysis, fed one item at a time. Bytes are summed per
+    library, codec, resolution, container and year. Copies are found with a hash index from
+    guid digest to the item's copies: one small tuple per title until a second copy turns
+    up, so memory per item stays constant and only duplicates keep a list."""
+
+    def __init__(self):
+        self.totals = {'items': 0, 'media': 0, 'parts': 0, 'bytes': 0}
+        self.libraries = {}
+        self.dimensions = {name: {} for name in DIMENSIONS}
+        self._copies = {}
+
+    def add(self, item):
+        self.totals['items'] += 1
+        library = self.libraries.setdefault(item['library'], {'items': 0, 'media': 0, 'bytes': 0})
+        library['items'] += 1
+        copies = []
+        for media in item['media']:
+            self.totals['media'] += 1
+            self.totals['parts'] += media['parts']
+            self.totals['bytes'] += media['bytes']
+            library['media'] += 1
+            library['bytes'] += media['bytes']
+            for name, value in DIMENSIONS.items():
+                entry = self.dimensions[name].setdefault(value(item, media), [0, 0])
+                entry[0] += 1
+                entry[1] += media['bytes']
+            copies.append((item['library'], item['rating_key'], media['resolution'], media['codec'], media['bytes']))
+        if item['guid'] and copies:
+            self._index(item, copies)
+
+    def _index(self, item, copies):
+        key = guid_digest(item['guid'])
+        entry = self._copies.get(key)
+        if entry is None and len(copies) == 1:
+            self._copies[key] = (self._label(item), copies[0])
+            return
+        if entry is None:
+            entry = self._copies[key] = (self._label(item), [])
+        elif not isinstance(entry[1], list):
+            entry = self._copies[key] = (entry[0], [entry[1]])
+        entry[1].extend(copies)
+
+    @staticmethod
+    def _label(item):
+        if item.get('type') == 'episode':
+            return f"{item['show_title']} S{item['season']:02d}E{item['episode']:02d}", item['year']
+        return item['title'], item['year']
+
+    def duplicates(self):
+        """Titles stored more than once, most reclaimable bytes (all but the largest copy) first"""
+        groups = []
+        for (title, year), copies in self._copies.values():
+            if not isinstance(copies, list):
+                continue
+            sizes = [copy[4] for copy in copies]
+            groups.append({
+                'title': title,
+                'year': year,
+                'bytes': sum(sizes),
+                'reclaimable_bytes': sum(sizes) - max(sizes),
+                'copies': [{'library': library, 'rating_key': rating_key, 'resolution': resolution,
+                            'codec': codec, 'bytes': size}
+                           for library, rating_key, resolution, codec, size in copies]
+            })
+        groups.sort(key=lambda group: (-group['reclaimable_bytes'], str(group['title'])))
+        return groups
+
+    def to_dict(self):
+        duplicates = self.duplicates()
+        return {
+            'totals': dict(self.totals),
+            'libraries': [dict(totals, name=name) for name, totals in
+                          sorted(self.libraries.items(), key=lambda entry: (-entry[1]['bytes'], entry[0]))],
+            **{name: _buckets(totals) for name, totals in self.dimensions.items()},
+            'duplicates': {
+                'groups': len(duplicates),
+                'copies': sum(len(group['copies']) for group in duplicates),
+                'reclaimable_bytes': sum(group['reclaimable_bytes'] for group in duplicates),
+                'titles': duplicates
+            }
+        }
+
+
+class StorageAnalyzer:
+    """Latest storage report per Plex server. Analyses hold build_lock, so concurrent
+    requests wait for the one running scan rather than starting their own."""
+
+    def __init__(self):
+        self.build_lock = threading.Lock()
+        self._reports = {}
+
+    def analyze(self, server, items):
+        """Build, keep and return the report of an iterable of MediaTracker.iter_plex_media items"""
+        started = time.perf_counter()
+        report = StorageReport()
+        for item in items:
+            report.add(item)
+        result = dict(report.to_dict(), server=server, generated_at=datetime.now().isoformat(timespec='seconds'),
+                      build_seconds=round(time.perf_counter() - started, 3))
+        self._reports[server] = (time.time(), result)
+        return result
+
+    def clear(self):
+        self._reports = {}
+
+    def latest(self, server, max_age=DEFAULT_MAX_AGE):
+        """The server's last report when it is at most max_age seconds old, otherwise None"""
+        cached = self._reports.get(server)
+        if cached and time.time() - cached[0] <= max_age:
+            return cached[1]
+        return None
+
+
+storage_analyzer = StorageAnalyzer()
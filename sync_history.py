@@ -0,0 +1,253 @@
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+DEFAULT_HISTORY_FILE = 'sync_history.jsonl'
+MAX_HISTORY_ENTRIES = 2000
+
+
+class PhaseTimer:
+    """Accumulates wall-clock time per named phase of a sync run; phases may be timed from
+    several threads at once"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {}
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def add(self, name, seconds):
+        """Record time spent in a phase timed elsewhere, such as on another thread"""
+        with self.lock:
+            self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def scoped(self, prefix):
+        """Timer recording into this one with every phase name prefixed"""
+        return ScopedPhaseTimer(self, prefix)
+
+    @property
+    def total(self):
+        return time.perf_counter() - self.started
+
+    def to_dict(self):
+        with self.lock:
+            return {name: round(seconds, 4) for name, seconds in self.phases.items()}
+
+
+class ScopedPhaseTimer:
+    """View of a PhaseTimer that prefixes the phases it records"""
+
+    def __init__(self, timer, prefix):
+        self.timer = timer
+        self.prefix = prefix
+
+    def phase(self, name):
+        return self.timer.phase(self.prefix + name)
+
+    def add(self, name, seconds):
+        self.timer.add(self.prefix + name, seconds)
+
+    def scoped(self, prefix):
+        return ScopedPhaseTimer(self.timer, self.prefix + prefix)
+
+
+def history_file_for(config):
+    """History file from config, defaulting to the output directory"""
+    return config.get('sync_history_file') or os.path.join(
+        config.get('output_directory', './output'), DEFAULT_HISTORY_FILE)
+
+
+def schedule_interval_seconds(config):
+    """Seconds between scheduled syncs for the configured schedule, or None when disabled"""
+    if not config.get('scheduler_enabled', False):
+        return None
+    schedule_type = config.get('schedule_type', 'daily')
+    if schedule_type == 'hourly':
+        return int(config.get('interval_hours', 1)) * 3600
+    if schedule_type == 'interval':
+        return int(config.get('interval_seconds', 3600))
+    return 86400
+
+
+def _mean(values):
+    return sum(values) / len(values) if values else 0.0
+
+
+def _p95(values):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(0.95 * len(ordered))) - 1)]
+
+
+def _slope(values):
+    """Least-squares change per run"""
+    n = len(values)
+    if n < 2:
+        return 0.0
+    mean_x = (n - 1) / 2.0
+    mean_y = _mean(values)
+    numerator = sum((x - mean_x) * (y - mean_y) for x, y in enumerate(values))
+    denominator = sum((x - mean_x) ** 2 for x in range(n))
+    return numerator / denominator
+
+
+# Per history file, shared by every SyncHistory on it: a lock and the line count once known
+_files = {}
+_files_lock = threading.Lock()
+
+
+def _file_state(history_file):
+    with _files_lock:
+        return _files.setdefault(os.path.abspath(history_file), {'lock': threading.Lock(), 'lines': None})
+
+
+class SyncHistory:
+    """Append-only JSON-lines log of sync run timings"""
+
+    def __init__(self, history_file, max_entries=MAX_HISTORY_ENTRIES):
+        self.history_file = history_file
+        self.max_entries = max_entries
+        self._state = _file_state(history_file)
+        self.lock = self._state['lock']
+
+    def append(self, entry):
+        """Append one run as a single line; compacts the file once it grows past twice max_entries"""
+        try:
+            directory = os.path.dirname(self.history_file)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            line = json.dumps(entry, separators=(',', ':'))
+            with self.lock:
+                if self._state['lines'] is None:
+                    self._state['lines'] = self._count_lines()
+                with open(self.history_file, 'a') as f:
+                    f.write(line + '\n')
+                self._state['lines'] += 1
+                if self._state['lines'] > self.max_entries * 2:
+                    entries = self.load()[-self.max_entries:]
+                    self._rewrite(entries)
+                    self._state['lines'] = len(entries)
+        except Exception as e:
+            # The count may no longer match the file; recount on the next append
+            self._state['lines'] = None
+            logging.error(f"Error writing sync history: {str(e)}")
+
+    def _count_lines(self):
+        if not os.path.exists(self.history_file):
+            return 0
+        with open(self.history_file, 'rb') as f:
+            return sum(1 for _ in f)
+
+    def _rewrite(self, entries):
+        temp_file = self.history_file + '.tmp'
+        with open(temp_file, 'w') as f:
+            for entry in entries:
+                f.write(json.dumps(entry, separators=(',', ':')) + '\n')
+        os.replace(temp_file, self.history_file)
+
+    def load(self, limit=None):
+        if not os.path.exists(self.history_file):
+            return []
+        entries = []
+        with open(self.history_file, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    continue
+        return entries[-limit:] if limit else entries
+
+    def summary(self, limit=50, interval_seconds=None):
+        """Per-phase statistics and trend over the last `limit` runs"""
+        entries = self.load(limit)
+        totals = [entry.get('total', 0.0) for entry in entries]
+        phase_names = []
+        for entry in entries:
+            for name in entry.get('phases', {}):
+                if name not in phase_names:
+                    phase_names.append(name)
+
+        phases = {}
+        for name in phase_names:
+            values = [entry['phases'][name] for entry in entries if name in entry.get('phases', {})]
+            phases[name] = {
+                'last': values[-1],
+                'mean': round(_mean(values), 4),
+                'p95': round(_p95(values), 4),
+                'max': round(max(values), 4),
+                'trend_per_run': round(_slope(values), 5)
+            }
+
+        summary = {
+            'runs': len(entries),
+            'failures': sum(1 for entry in entries if not entry.get('success')),
+            'last_run': entries[-1].get('timestamp') if entries else None,
+            'total': {
+                'last': totals[-1] if totals else None,
+                'mean': round(_mean(totals), 4),
+                'p95': round(_p95(totals), 4),
+                'max': round(max(totals), 4) if totals else None,
+                'trend_per_run': round(_slope(totals), 5)
+            },
+            'phases': phases,
+            'interval_seconds': interval_seconds
+        }
+        if interval_seconds and totals:
+            summary['interval_used'] = round(_p95(totals) / interval_seconds, 4)
+            summary['near_interval'] = _p95(totals) > 0.5 * interval_seconds
+        return summary
+
+
+def build_entry(timer, result, upstream_requests=None):
+    """Compact history record for one sync run"""
+    entry = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'success': bool(result.get('success')),
+        'total': round(timer.total, 4),
+        'phases': timer.to_dict(),
+        'counts': {
+            'movies': result.get('movies_count', 0),
+            'shows': result.get('shows_count', 0),
+            'scheduled': result.get('scheduled_count', 0)
+        }
+    }
+    if upstream_requests is not None:
+        entry['upstream_requests'] = upstream_requests
+    if result.get('error'):
+        entry['error'] = str(result['error'])[:200]
+    return entry
+
+
+def format_summary(summary):
+    """Plain-text table of a summary() result for the CLI"""
+    lines = []
+    total = summary['total']
+    lines.append(f"Sync runs: {summary['runs']} ({summary['failures']} failed), last run: {summary['last_run'] or 'never'}")
+    if not summary['runs']:
+        return '\n'.join(lines)
+    lines.append(f"Total: last {total['last']:.2f}s, mean {total['mean']:.2f}s, p95 {total['p95']:.2f}s, "
+                 f"max {total['max']:.2f}s, trend {total['trend_per_run']:+.3f}s/run")
+    if summary.get('interval_seconds'):
+        warning = '  <-- approaching schedule interval' if summary.get('near_interval') else ''
+        lines.append(f"p95 uses {summary['interval_used']:.1%} of the {summary['interval_seconds']}s schedule interval{warning}")
+    lines.append('')
+    lines.append(f"{'phase':<36}{'last':>9}{'mean':>9}{'p95':>9}{'max':>9}{'trend/run':>11}")
+    for name, stats in summary['phases'].items():
+        lines.append(f"{name:<36}{stats['last']:>9.3f}{stats['mean']:>9.3f}{stats['p95']:>9.3f}"
+                     f"{stats['max']:>9.3f}{stats['trend_per_run']:>+11.4f}")
+    return '\n'.join(lines)
@@ -0,0 +1,192 @@
+import contextvars
+import logging
+from contextlib import nullcontext
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from dashboard_events import schedule_key
+from instrumentation import count_requests
+from media_tracker import MediaTracker
+
+PRIMARY_PLEX = 'plex'
+PRIMARY_SONARR = 'sonarr'
+# External ID schemes that identify the same title across servers
+EXTERNAL_ID_SCHEMES = ('imdb', 'tmdb', 'tvdb')
+
+
+def _server(name, url, credential, timeout):
+    return {'name': name, 'url': (url or '').strip(), 'credential': (credential or '').strip(), 'timeout': timeout}
+
+
+def plex_servers(config):
+    """Plex instances to aggregate: the primary plex_url/plex_token, then each entry of
+    plex_servers ({'name', 'url', 'token', 'timeout'}). Unconfigured ones are left out."""
+    servers = [_server(PRIMARY_PLEX, config.get('plex_url'), config.get('plex_token'),
+                       config.get('upstream_timeout_seconds'))]
+    for index, entry in enumerate(config.get('plex_servers') or [], 2):
+        servers.append(_server(entry.get('name') or f'plex{index}', entry.get('url'), entry.get('token'),
+                               entry.get('timeout', config.get('upstream_timeout_seconds'))))
+    return [server for server in servers if server['url'] and server['credential']]
+
+
+def sonarr_servers(config):
+    """Sonarr instances to aggregate: the primary sonarr_url/sonarr_api_key, then each entry
+    of sonarr_servers ({'name', 'url', 'api_key', 'timeout'})"""
+    servers = [_server(PRIMARY_SONARR, config.get('sonarr_url'), config.get('sonarr_api_key'),
+                       config.get('upstream_timeout_seconds'))]
+    for index, entry in enumerate(config.get('sonarr_servers') or [], 2):
+        servers.append(_server(entry.get('name') or f'sonarr{index}', entry.get('url'), entry.get('api_key'),
+                               entry.get('timeout', config.get('upstream_timeout_seconds'))))
+    return [server for server in servers if server['url'] and server['credential']]
+
+
+def plex_server_config(config, server):
+    """Config for a MediaTracker talking to one Plex instance. Other than the primary, the
+    instance is named in the config so its artwork URLs route back to it."""
+    return dict(config, plex_url=server['url'], plex_token=server['credential'],
+                upstream_timeout_seconds=server['timeout'],
+                plex_server=None if server['name'] == PRIMARY_PLEX else server['name'])
+
+
+def sonarr_server_config(config, server):
+    """Config for a MediaTracker talking to one Sonarr instance"""
+    return dict(config, sonarr_url=server['url'], sonarr_api_key=server['credential'],
+                upstream_timeout_seconds=server['timeout'])
+
+
+def server_phase_timer(phase_timer, server):
+    """Timer for one instance's phases within a sync run: the primary instances keep the plain
+    phase names, so single-server history stays comparable, and others are prefixed by name"""
+    if phase_timer is None or server['name'] in (PRIMARY_PLEX, PRIMARY_SONARR):
+        return phase_timer
+    return phase_timer.scoped(f"{server['name']}.")
+
+
+def find_plex_server(config, name):
+    return next((server for server in plex_servers(config) if server['name'] == name), None)
+
+
+def fetch_concurrently(servers, fetch, limit=None):
+    """[(server, result, error, seconds)] of fetch(server) for every server, in server order.
+    Instances are fetched at once, each call in a copy of the caller's context so request
+    counting and Server-Timing still see its upstream calls. A failed instance reports its
+    error instead of failing the others. Failed upstream requests count as an error even
+    when fetch() handles them itself. limit, a semaphore, bounds the calls in flight."""
+    def run(server):
+        with limit or nullcontext():
+            started = time.perf_counter()
+            with count_requests() as counter:
+                try:
+                    result, error = fetch(server), None
+                except Exception as e:
+                    logging.error(f"Error fetching from {server['name']}: {str(e)}")
+                    result, error = None, str(e)
+        if error is None and counter.errors:
+            error = f'{counter.errors} failed upstream request(s)'
+        return server, result, error, time.perf_counter() - started
+
+    if len(servers) <= 1:
+        return [run(server) for server in servers]
+    with ThreadPoolExecutor(max_workers=len(servers), thread_name_prefix='upstream') as executor:
+        futures = [executor.submit(contextvars.copy_context().run, run, server) for server in servers]
+        return [future.result() for future in futures]
+
+
+def identity_keys(item, item_type):
+    """Hashable keys under which an item is the same title on any server: its plex:// guid,
+    which the Plex agent assigns globally, and its external IDs"""
+    keys = []
+    guid = item.get('guid') or ''
+    if guid.startswith('plex://'):
+        keys.append(guid)
+    for scheme, value in (item.get('external_ids') or {}).items():
+        if scheme in EXTERNAL_ID_SCHEMES and value:
+            keys.append((item_type, scheme, str(value)))
+    return keys
+
+
+def merge_library(results):
+    """One library from every instance's (movies, tv_shows): items found on several servers
+    appear once, with a 'sources' entry per server. Copies within one server, such as a
+    title in both "Movies" and "Movies 4K", stay separate entries, so an item only merges
+    into an entry no item of its own server is in yet. A hash index from identity keys to
+    merged items makes the merge linear. Items are kept as the first server in order that
+    has them; those only on other servers get a plex_key qualified with the server name, so
+    keys stay unique across servers."""
+    merged = {'movies': [], 'tv_shows': []}
+    for field, item_type in (('movies', 'movie'), ('tv_shows', 'show')):
+        # identity key -> [(merged item, names of the servers in it)]
+        index = {}
+        for server, library in results:
+            for item in library[0 if field == 'movies' else 1]:
+                source = {'server': server['name'], 'plex_key': item.get('plex_key', '')}
+                keys = identity_keys(item, item_type)
+                match = next((candidate for key in keys for candidate in index.get(key, ())
+                              if server['name'] not in candidate[1]), None)
+                if match is None:
+                    entry = dict(item, sources=[])
+                    if server['name'] != PRIMARY_PLEX and entry.get('plex_key'):
+                        entry['plex_key'] = f"{server['name']}:{entry['plex_key']}"
+                    merged[field].append(entry)
+                    match = (entry, set())
+                match[0]['sources'].append(source)
+                match[1].add(server['name'])
+                for key in keys:
+                    candidates = index.setdefault(key, [])
+                    if not any(candidate is match for candidate in candidates):
+                        candidates.append(match)
+    return merged['movies'], merged['tv_shows']
+
+
+def carry_sources(item, previous, source):
+    """item with the provenance of the cached copy it replaces, this server's entry refreshed"""
+    others = [entry for entry in (previous or {}).get('sources', []) if entry['server'] != source['server']]
+    return dict(item, sources=[source] + others)
+
+
+def fetch_plex_library(config, limit=None, phase_timer=None):
+    """All movies and shows across the configured Plex instances, merged, with a per-server
+    summary {name: {'movies', 'tv_shows', 'error', 'seconds'}}"""
+    results = fetch_concurrently(plex_servers(config),
+                                 lambda server: MediaTracker(plex_server_config(config, server),
+                                                             phase_timer=server_phase_timer(phase_timer, server)
+                                                             ).get_plex_all_content(),
+                                 limit)
+    summary = {server['name']: {'movies': len(library[0]) if library else 0,
+                                'tv_shows': len(library[1]) if library else 0,
+                                'error': error, 'seconds': round(seconds, 3)}
+               for server, library, error, seconds in results}
+    movies, tv_shows = merge_library([(server, library) for server, library, _, _ in results if library])
+    return movies, tv_shows, summary
+
+
+def schedule_identity(item):
+    """An upcoming episode is the same on any Sonarr when its series' TVDB ID, season and episode match"""
+    if item.get('tvdb_id'):
+        return ('tvdb', item['tvdb_id'], item.get('season'), item.get('episode'))
+    return schedule_key(item)
+
+
+def fetch_sonarr_schedule(config, days, limit=None, phase_timer=None):
+    """Upcoming episodes across the configured Sonarr instances, merged by series and episode,
+    with a per-server summary {name: {'scheduled_shows', 'error', 'seconds'}}"""
+    results = fetch_concurrently(sonarr_servers(config),
+                                 lambda server: MediaTracker(sonarr_server_config(config, server),
+                                                             phase_timer=server_phase_timer(phase_timer, server)
+                                                             ).get_sonarr_calendar_extended(days=days),
+                                 limit)
+    merged, index = [], {}
+    for server, scheduled, _, _ in results:
+        for item in scheduled or []:
+            source = {'server': server['name'], 'episode_id': item.get('episode_id'), 'series_id': item.get('series_id')}
+            key = schedule_identity(item)
+            entry = index.get(key)
+            if entry is None:
+                entry = index[key] = dict(item, sources=[])
+                merged.append(entry)
+            entry['sources'].append(source)
+    if len(results) > 1:
+        merged.sort(key=lambda item: (item.get('air_date', ''), item.get('air_time', '')))
+    summary = {server['name']: {'scheduled_shows': len(scheduled or []), 'error': error, 'seconds': round(seconds, 3)}
+               for server, scheduled, error, seconds in results}
+    return merged, summary
@@ -0,0 +1,858 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Plex, Sonarr and GitHub APIs used by the media tracker.
+Serves a synthetic library of configurable size so the app can be exercised
+without real media servers, keeps an in-memory git repository behind the
+GitHub git data API, pushes Plex notifications over a websocket, and counts
+every upstream request it receives.
+"""
+
+import base64
+import hashlib
+import json
+import random
+import re
+import socket
+import struct
+import threading
+import time
+import zlib
+import xml.etree.ElementTree as ET
+from collections import Counter
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+GENRES = ['Action', 'Comedy', 'Drama', 'Documentary', 'Horror', 'Sci-Fi', 'Thriller', 'Animation']
+STUDIOS = ['Warner Bros.', 'Universal', 'A24', 'Pixar', 'Paramount', 'Lionsgate']
+NETWORKS = ['HBO', 'NBC', 'AMC', 'BBC One', 'Netflix', 'FX']
+CONTENT_RATINGS = ['G', 'PG', 'PG-13', 'R', 'TV-14', 'TV-MA']
+# (videoResolution, videoCodec, kbps) of synthetic media files
+MEDIA_PROFILES = [('sd', 'mpeg4', 1500), ('720', 'h264', 4000), ('1080', 'h264', 8000), ('4k', 'hevc', 20000)]
+MEDIA_CONTAINERS = ['mkv', 'mp4']
+EPISODE_DURATION_MS = 45 * 60000
+# Every this many movies is stored in two versions, as Plex shows a title with two files
+MULTI_VERSION_EVERY = 10
+
+MOVIE_SECTION_KEY = '1'
+SHOW_SECTION_KEY = '2'
+ORIGINAL_IMAGE_BYTES = 150000
+WEBSOCKET_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+
+class SyntheticLibrary:
+    """Deterministic fake Plex library and Sonarr calendar"""
+
+    def __init__(self, movies=100, shows=20, seasons_per_show=3, episodes_per_season=8, seed=1):
+        rng = random.Random(seed)
+        now = int(time.time())
+        self.movies = []
+        self.shows = []
+        self.episodes = {}
+        self.seasons = {}
+
+        for i in range(movies):
+            rating_key = str(1000 + i)
+            self.movies.append({
+                'ratingKey': rating_key,
+                'key': f'/library/metadata/{rating_key}',
+                'guid': f'plex://movie/{rating_key:0>24}',
+                'type': 'movie',
+                'title': f'Synthetic Movie {i}',
+                'year': str(1960 + rng.randint(0, 64)),
+                'rating': f'{rng.uniform(1, 10):.1f}',
+                'summary': f'A synthetic movie number {i} used for load testing.',
+                'duration': str(rng.randint(80, 180) * 60000),
+                'addedAt': str(now - rng.randint(0, 3650) * 86400),
+                'studio': rng.choice(STUDIOS),
+                'contentRating': rng.choice(CONTENT_RATINGS),
+                'thumb': f'/library/metadata/{rating_key}/thumb/1',
+                'art': f'/library/metadata/{rating_key}/art/1',
+                'tagline': 'Synthetic tagline',
+                'originallyAvailableAt': '2000-01-01',
+                'genres': rng.sample(GENRES, 2),
+                'directors': [f'Director {rng.randint(1, 50)}'],
+                'writers': [f'Writer {rng.randint(1, 50)}'],
+                'roles': [(f'Actor {rng.randint(1, 500)}', f'Role {n}') for n in range(5)],
+                'countries': ['United States of America'],
+                'tmdbId': 600000 + i,
+            })
+
+        for i in range(shows):
+            rating_key = str(500000 + i)
+            show = {
+                'ratingKey': rating_key,
+                'key': f'/library/metadata/{rating_key}/children',
+                'guid': f'plex://show/{rating_key:0>24}',
+                'type': 'show',
+                'title': f'Synthetic Show {i}',
+                'year': str(1990 + rng.randint(0, 34)),
+                'rating': f'{rng.uniform(1, 10):.1f}',
+                'summary': f'A synthetic show number {i} used for load testing.',
+                'addedAt': str(now - rng.randint(0, 3650) * 86400),
+                'studio': rng.choice(STUDIOS),
+                'network': rng.choice(NETWORKS),
+                'contentRating': rng.choice(CONTENT_RATINGS),
+                'thumb': f'/library/metadata/{rating_key}/thumb/1',
+                'art': f'/library/metadata/{rating_key}/art/1',
+                'originallyAvailableAt': '2005-01-01',
+                'genres': rng.sample(GENRES, 2),
+                'childCount': str(seasons_per_show),
+                'leafCount': str(seasons_per_show * episodes_per_season),
+                'tvdbId': 70000 + i,
+                'imdbId': f'tt{9000000 + i}',
+            }
+            self.shows.append(show)
+            self.seasons[rating_key] = [
+                {'ratingKey': f'{rating_key}{s:02d}', 'title': f'Season {s}', 'index': str(s)}
+                for s in range(1, seasons_per_show + 1)
+            ]
+            self.episodes[rating_key] = [
+                {
+                    'ratingKey': f'{rating_key}{s:02d}{e:03d}',
+                    'guid': f'plex://episode/{rating_key}{s:02d}{e:03d}',
+                    'title': f'Episode {e}',
+                    'parentIndex': str(s),
+                    'index': str(e),
+                    'addedAt': show['addedAt'],
+                }
+                for s in range(1, seasons_per_show + 1)
+                for e in range(1, episodes_per_season + 1)
+            ]
+
+        today = datetime.now().date()
+        self.calendar = []
+        for i, show in enumerate(self.shows):
+            air_date = today + timedelta(days=i % 7)
+            self.calendar.append({
+                'id': 900000 + i,
+                'seriesId': i + 1,
+                'title': f'Upcoming Episode {i}',
+                'seasonNumber': 1,
+                'episodeNumber': i % 10 + 1,
+                'airDate': air_date.isoformat(),
+                'airDateUtc': f'{air_date.isoformat()}T01:00:00Z',
+                'overview': 'Synthetic upcoming episode.',
+                'monitored': True,
+                'hasFile': False,
+            })
+
+        self.series = [
+            {
+                'id': i + 1,
+                'title': show['title'],
+                'overview': show['summary'],
+                'network': show['network'],
+                'status': 'continuing',
+                'genres': show['genres'],
+                'year': int(show['year']),
+                'runtime': 45,
+                'certification': show['contentRating'],
+                'images': [{'coverType': 'poster', 'url': f'/MediaCover/{i + 1}/poster.jpg'}],
+                'imdbId': show['imdbId'],
+                'tvdbId': show['tvdbId'],
+                'seriesType': 'standard',
+                'qualityProfileId': 1,
+                'monitored': True,
+            }
+            for i, show in enumerate(self.shows)
+        ]
+
+    def item(self, rating_key):
+        """Look up a movie or show by rating key"""
+        for item in self.movies:
+            if item['ratingKey'] == rating_key:
+                return item
+        for item in self.shows:
+            if item['ratingKey'] == rating_key:
+                return item
+        return None
+
+
+def _guid_elements(element, item):
+    for scheme, field in (('imdb', 'imdbId'), ('tmdb', 'tmdbId'), ('tvdb', 'tvdbId')):
+        if item.get(field):
+            ET.SubElement(element, 'Guid', {'id': f'{scheme}://{item[field]}'})
+
+
+def _media_elements(element, rating_key, duration_ms, versions=1):
+    """Media and Part children for an item's files, derived from its rating key so every
+    listing of the item agrees without storing them in the library"""
+    for version in range(versions):
+        profile = zlib.crc32(f'{rating_key}:{version}'.encode('utf-8'))
+        resolution, codec, kbps = MEDIA_PROFILES[profile % len(MEDIA_PROFILES)]
+        container = MEDIA_CONTAINERS[(profile >> 8) % len(MEDIA_CONTAINERS)]
+        media_id = f'{rating_key}{version}'
+        media = ET.SubElement(element, 'Media', {
+            'id': media_id, 'duration': str(duration_ms), 'bitrate': str(kbps), 'videoResolution': resolution,
+            'videoCodec': codec, 'audioCodec': 'aac', 'container': container})
+        ET.SubElement(media, 'Part', {
+            'id': media_id, 'duration': str(duration_ms), 'size': str(kbps * 125 * duration_ms // 1000),
+            'container': container, 'file': f'/media/{rating_key}/version{version}.{container}'})
+
+
+def _movie_element(parent, movie, tag='Video'):
+    attrs = {k: v for k, v in movie.items() if isinstance(v, str)}
+    element = ET.SubElement(parent, tag, attrs)
+    _guid_elements(element, movie)
+    _media_elements(element, movie['ratingKey'], int(movie['duration']),
+                    2 if int(movie['ratingKey']) % MULTI_VERSION_EVERY == 0 else 1)
+    for genre in movie['genres']:
+        ET.SubElement(element, 'Genre', {'tag': genre})
+    for director in movie['directors']:
+        ET.SubElement(element, 'Director', {'tag': director})
+    for writer in movie['writers']:
+        ET.SubElement(element, 'Writer', {'tag': writer})
+    for country in movie['countries']:
+        ET.SubElement(element, 'Country', {'tag': country})
+    for name, role in movie['roles']:
+        ET.SubElement(element, 'Role', {'tag': name, 'role': role})
+    return element
+
+
+def _show_element(parent, show):
+    attrs = {k: v for k, v in show.items() if isinstance(v, str)}
+    element = ET.SubElement(parent, 'Directory', attrs)
+    _guid_elements(element, show)
+    for genre in show['genres']:
+        ET.SubElement(element, 'Genre', {'tag': genre})
+    return element
+
+
+def _websocket_frame(opcode, payload):
+    """Unmasked server-to-client websocket frame"""
+    length = len(payload)
+    if length < 126:
+        header = struct.pack('!BB', 0x80 | opcode, length)
+    elif length < 65536:
+        header = struct.pack('!BBH', 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack('!BBQ', 0x80 | opcode, 127, length)
+    return header + payload
+
+
+def _read_client_frame(rfile):
+    """(opcode, payload) of one masked client frame, or None at end of stream"""
+    head = rfile.read(2)
+    if len(head) < 2:
+        return None
+    opcode, length = head[0] & 0x0F, head[1] & 0x7F
+    if length == 126:
+        length = struct.unpack('!H', rfile.read(2))[0]
+    elif length == 127:
+        length = struct.unpack('!Q', rfile.read(8))[0]
+    mask = rfile.read(4) if head[1] & 0x80 else b'\0\0\0\0'
+    payload = rfile.read(length)
+    return opcode, bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+
+
+def _container(**attrs):
+    return ET.Element('MediaContainer', {k: str(v) for k, v in attrs.items()})
+
+
+def _metadata_json(item):
+    data = {k: v for k, v in item.items() if isinstance(v, str)}
+    for key in ('year', 'duration', 'addedAt', 'leafCount', 'childCount'):
+        if key in data:
+            data[key] = int(data[key])
+    if 'rating' in data:
+        data['rating'] = float(data['rating'])
+    data['Genre'] = [{'tag': g} for g in item.get('genres', [])]
+    data['Director'] = [{'tag': d} for d in item.get('directors', [])]
+    data['Writer'] = [{'tag': w} for w in item.get('writers', [])]
+    data['Country'] = [{'tag': c} for c in item.get('countries', [])]
+    data['Role'] = [{'tag': n, 'role': r} for n, r in item.get('roles', [])]
+    return data
+
+
+def _fake_image(seed, size):
+    """Deterministic JPEG-framed bytes standing in for artwork"""
+    digest = hashlib.sha1(seed.encode('utf-8')).digest()
+    return b'\xff\xd8\xff\xe0' + (digest * (size // len(digest) + 1))[:size] + b'\xff\xd9'
+
+
+def git_blob_sha(content):
+    """SHA-1 git assigns to a blob with this content"""
+    return hashlib.sha1(b'blob %d\0' % len(content) + content).hexdigest()
+
+
+class FakeGitHub:
+    """In-memory repositories answering the subset of the GitHub git data API used for publishing.
+    Trees are stored flat (path -> blob sha); commit and tree shas are stable hashes, blob shas are real."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.repos = {}
+
+    def repo(self, owner, name):
+        with self.lock:
+            repo = self.repos.get((owner, name))
+            if repo is None:
+                repo = self.repos[(owner, name)] = {'blobs': {}, 'trees': {}, 'commits': {}, 'refs': {}}
+                tree_sha = self._store_tree(repo, {})
+                repo['refs']['heads/main'] = self._store_commit(repo, tree_sha, [], 'Initial commit')
+            return repo
+
+    def files(self, owner, name, branch='main'):
+        """{path: content bytes} at the tip of a branch"""
+        repo = self.repo(owner, name)
+        commit = repo['commits'][repo['refs'][f'heads/{branch}']]
+        return {path: repo['blobs'][sha] for path, sha in repo['trees'][commit['tree']].items()}
+
+    def commit_count(self, owner, name):
+        return len(self.repo(owner, name)['commits'])
+
+    def _store_tree(self, repo, entries):
+        sha = hashlib.sha1(json.dumps(sorted(entries.items())).encode('utf-8')).hexdigest()
+        repo['trees'][sha] = dict(entries)
+        return sha
+
+    def _store_commit(self, repo, tree_sha, parents, message):
+        sha = hashlib.sha1(json.dumps([tree_sha, parents, message, len(repo['commits'])]).encode('utf-8')).hexdigest()
+        repo['commits'][sha] = {'tree': tree_sha, 'parents': list(parents), 'message': message}
+        return sha
+
+    def _tree_json(self, repo, sha):
+        return {'sha': sha, 'truncated': False, 'tree': [
+            {'path': path, 'mode': '100644', 'type': 'blob', 'sha': blob_sha, 'size': len(repo['blobs'][blob_sha])}
+            for path, blob_sha in sorted(repo['trees'][sha].items())
+        ]}
+
+    def handle(self, method, path, body):
+        """Return (status, payload) for a /repos/... request"""
+        match = re.fullmatch(r'/repos/([^/]+)/([^/]+)(/.*)?', path)
+        owner, name, rest = match.group(1), match.group(2), match.group(3) or ''
+        repo = self.repo(owner, name)
+        with self.lock:
+            if method == 'GET' and rest == '':
+                return 200, {'full_name': f'{owner}/{name}', 'default_branch': 'main'}
+
+            match = re.fullmatch(r'/git/ref/(heads/.+)', rest)
+            if method == 'GET' and match:
+                sha = repo['refs'].get(match.group(1))
+                if sha is None:
+                    return 404, {'message': 'Not Found'}
+                return 200, {'ref': f'refs/{match.group(1)}', 'object': {'sha': sha, 'type': 'commit'}}
+
+            match = re.fullmatch(r'/git/commits/(\w+)', rest)
+            if method == 'GET' and match:
+                commit = repo['commits'].get(match.group(1))
+                if commit is None:
+                    return 404, {'message': 'Not Found'}
+                return 200, {'sha': match.group(1), 'tree': {'sha': commit['tree']}, 'message': commit['message'],
+                             'parents': [{'sha': parent} for parent in commit['parents']]}
+
+            match = re.fullmatch(r'/git/trees/(\w+)', rest)
+            if method == 'GET' and match:
+                if match.group(1) not in repo['trees']:
+                    return 404, {'message': 'Not Found'}
+                return 200, self._tree_json(repo, match.group(1))
+
+            if method == 'POST' and rest == '/git/blobs':
+                content = body['content'].encode('utf-8')
+                if body.get('encoding') == 'base64':
+                    content = base64.b64decode(content)
+                sha = git_blob_sha(content)
+                repo['blobs'][sha] = content
+                return 201, {'sha': sha}
+
+            if method == 'POST' and rest == '/git/trees':
+                entries = dict(repo['trees'].get(body.get('base_tree'), {}))
+                for entry in body['tree']:
+                    if entry.get('sha') is None and 'content' not in entry:
+                        entries.pop(entry['path'], None)
+                        continue
+                    if 'content' in entry:
+                        content = entry['content'].encode('utf-8')
+                        blob_sha = git_blob_sha(content)
+                        repo['blobs'][blob_sha] = content
+                    else:
+                        blob_sha = entry['sha']
+                        if blob_sha not in repo['blobs']:
+                            return 422, {'message': f'Invalid blob sha {blob_sha}'}
+                    entries[entry['path']] = blob_sha
+                return 201, self._tree_json(repo, self._store_tree(repo, entries))
+
+            if method == 'POST' and rest == '/git/commits':
+                if body['tree'] not in repo['trees']:
+                    return 422, {'message': 'Invalid tree'}
+                sha = self._store_commit(repo, body['tree'], body.get('parents', []), body.get('message', ''))
+                return 201, {'sha': sha, 'tree': {'sha': body['tree']}}
+
+            match = re.fullmatch(r'/git/refs/(heads/.+)', rest)
+            if method == 'PATCH' and match:
+                ref = match.group(1)
+                if ref not in repo['refs']:
+                    return 422, {'message': 'Reference does not exist'}
+                commit = repo['commits'].get(body['sha'])
+                if commit is None:
+                    return 422, {'message': 'Object does not exist'}
+                if not body.get('force') and repo['refs'][ref] not in commit['parents']:
+                    return 422, {'message': 'Update is not a fast forward'}
+                repo['refs'][ref] = body['sha']
+                return 200, {'ref': f'refs/{ref}', 'object': {'sha': body['sha'], 'type': 'commit'}}
+
+        return 404, {'message': 'Not Found'}
+
+
+class UpstreamStub:
+    """Threaded HTTP server that answers like Plex and Sonarr"""
+
+    def __init__(self, library=None, host='127.0.0.1', port=0, latency=0.0):
+        self.library = library or SyntheticLibrary()
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.request_counts = Counter()
+        self.bytes_sent = 0
+        self._cache = {}
+        self.github = FakeGitHub()
+        # Open Plex notification websockets; set websocket_enabled to False to refuse new ones
+        self.websockets = []
+        self.websocket_enabled = True
+        self.server = ThreadingHTTPServer((host, port), self._make_handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    @property
+    def total_requests(self):
+        with self.lock:
+            return sum(self.request_counts.values())
+
+    def set_library(self, library):
+        """Swap in a different synthetic library and drop cached responses"""
+        self.library = library
+        self._cache = {}
+
+    def reset_counts(self):
+        with self.lock:
+            self.request_counts.clear()
+            self.bytes_sent = 0
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, name='upstream-stub', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.close_websockets()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # Plex notification websocket
+
+    @property
+    def websocket_clients(self):
+        with self.lock:
+            return len(self.websockets)
+
+    def notify(self, container):
+        """Send a NotificationContainer to every connected websocket"""
+        payload = json.dumps({'NotificationContainer': container}).encode('utf-8')
+        frame = _websocket_frame(0x1, payload)
+        with self.lock:
+            connections = list(self.websockets)
+        for connection in connections:
+            try:
+                connection.sendall(frame)
+            except OSError:
+                pass
+
+    def notify_timeline(self, entries):
+        """Send library timeline entries, e.g. {'itemID': '1000', 'type': 1, 'state': 5}"""
+        self.notify({'type': 'timeline', 'size': len(entries), 'TimelineEntry': [
+            dict({'identifier': 'com.plexapp.plugins.library', 'sectionID': MOVIE_SECTION_KEY}, **entry)
+            for entry in entries
+        ]})
+
+    def close_websockets(self):
+        """Drop every websocket without a close handshake, like a restarting server"""
+        with self.lock:
+            connections, self.websockets = self.websockets, []
+        for connection in connections:
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def _serve_websocket(self, handler):
+        """Complete the upgrade, then hold the connection until the client closes it"""
+        key = handler.headers.get('Sec-WebSocket-Key', '')
+        accept = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode('ascii')).digest()).decode('ascii')
+        handler.send_response(101, 'Switching Protocols')
+        handler.send_header('Upgrade', 'websocket')
+        handler.send_header('Connection', 'Upgrade')
+        handler.send_header('Sec-WebSocket-Accept', accept)
+        handler.end_headers()
+        handler.wfile.flush()
+        self._record('plex:/:/websockets/notifications', 0)
+        connection = handler.connection
+        with self.lock:
+            self.websockets.append(connection)
+        try:
+            while True:
+                frame = _read_client_frame(handler.rfile)
+                if frame is None:
+                    break
+                opcode, payload = frame
+                if opcode == 0x8:
+                    connection.sendall(_websocket_frame(0x8, payload[:2]))
+                    break
+                if opcode == 0x9:
+                    connection.sendall(_websocket_frame(0xA, payload))
+        except OSError:
+            pass
+        finally:
+            with self.lock:
+                if connection in self.websockets:
+                    self.websockets.remove(connection)
+            handler.close_connection = True
+
+    def _record(self, route, size):
+        with self.lock:
+            self.request_counts[route] += 1
+            self.bytes_sent += size
+
+    def _cached(self, key, build):
+        body = self._cache.get(key)
+        if body is None:
+            body = build()
+            self._cache[key] = body
+        return body
+
+    # Plex responses
+
+    def _plex_sections(self):
+        root = _container(size=2)
+        ET.SubElement(root, 'Directory', {'key': MOVIE_SECTION_KEY, 'type': 'movie', 'title': 'Movies'})
+        ET.SubElement(root, 'Directory', {'key': SHOW_SECTION_KEY, 'type': 'show', 'title': 'TV Shows'})
+        return ET.tostring(root)
+
+    def _plex_section_all(self, section_key):
+        if section_key == MOVIE_SECTION_KEY:
+            root = _container(size=len(self.library.movies))
+            for movie in self.library.movies:
+                _movie_element(root, movie)
+        elif section_key == SHOW_SECTION_KEY:
+            root = _container(size=len(self.library.shows))
+            for show in self.library.shows:
+                _show_element(root, show)
+        else:
+            return None
+        return ET.tostring(root)
+
+    def _plex_section_page(self, section_key, start, size):
+        """One page of a section listing, with the section's totalSize"""
+        if section_key == MOVIE_SECTION_KEY:
+            items, add = self.library.movies, _movie_element
+        elif section_key == SHOW_SECTION_KEY:
+            items, add = self.library.shows, _show_element
+        else:
+            return None
+        root = _container(size=len(items[start:start + size]), totalSize=len(items), offset=start)
+        for item in items[start:start + size]:
+            add(root, item)
+        return ET.tostring(root)
+
+    def _plex_section_episodes(self, start, size):
+        """Every episode of the TV section (type=4), one page of it"""
+        episodes = [(show, episode) for show in self.library.shows
+                    for episode in self.library.episodes.get(show['ratingKey'], [])]
+        root = _container(size=len(episodes[start:start + size]), totalSize=len(episodes), offset=start)
+        for show, episode in episodes[start:start + size]:
+            element = ET.SubElement(root, 'Video', {'type': 'episode', 'key': f"/library/metadata/{episode['ratingKey']}",
+                                                    'grandparentRatingKey': show['ratingKey'],
+                                                    'grandparentTitle': show['title'], **episode})
+            _media_elements(element, episode['ratingKey'], EPISODE_DURATION_MS)
+        return ET.tostring(root)
+
+    def _plex_sections_json(self):
+        return json.dumps({'MediaContainer': {'size': 2, 'Directory': [
+            {'key': MOVIE_SECTION_KEY, 'type': 'movie', 'title': 'Movies'},
+            {'key': SHOW_SECTION_KEY, 'type': 'show', 'title': 'TV Shows'},
+        ]}}).encode('utf-8')
+
+    def _plex_section_all_json(self, section_key):
+        if section_key == MOVIE_SECTION_KEY:
+            items = self.library.movies
+        elif section_key == SHOW_SECTION_KEY:
+            items = self.library.shows
+        else:
+            return None
+        return json.dumps({'MediaContainer': {
+            'size': len(items),
+            'Metadata': [_metadata_json(item) for item in items],
+        }}).encode('utf-8')
+
+    def _plex_recent_items(self, section_key=None):
+        items = []
+        if section_key in (None, MOVIE_SECTION_KEY):
+            items.extend(self.library.movies)
+        if section_key in (None, SHOW_SECTION_KEY):
+            items.extend(self.library.shows)
+        return sorted(items, key=lambda item: int(item['addedAt']), reverse=True)
+
+    def _plex_recent_xml(self, items):
+        root = _container(size=len(items))
+        for item in items:
+            if item['type'] == 'movie':
+                _movie_element(root, item)
+            else:
+                _show_element(root, item)
+        return ET.tostring(root)
+
+    def _plex_metadata(self, rating_key):
+        item = self.library.item(rating_key)
+        if item is None:
+            return self._plex_child_metadata(rating_key)
+        root = _container(size=1)
+        if item['type'] == 'movie':
+            _movie_element(root, item)
+        else:
+            _show_element(root, item)
+        return ET.tostring(root)
+
+    def _plex_children(self, rating_key):
+        seasons = self.library.seasons.get(rating_key)
+        if seasons is None:
+            return None
+        root = _container(size=len(seasons))
+        for season in seasons:
+            ET.SubElement(root, 'Directory', {'type': 'season', 'parentRatingKey': rating_key, **season})
+        return ET.tostring(root)
+
+    def _plex_child_metadata(self, rating_key):
+        """Season or episode metadata, pointing back at its show"""
+        for show_key, seasons in self.library.seasons.items():
+            for season in seasons:
+                if season['ratingKey'] == rating_key:
+                    root = _container(size=1)
+                    ET.SubElement(root, 'Directory', {'type': 'season', 'parentRatingKey': show_key, **season})
+                    return ET.tostring(root)
+        for show_key, episodes in self.library.episodes.items():
+            for episode in episodes:
+                if episode['ratingKey'] == rating_key:
+                    root = _container(size=1)
+                    ET.SubElement(root, 'Video', {'type': 'episode', 'grandparentRatingKey': show_key,
+                                                  'parentRatingKey': f"{show_key}{int(episode['parentIndex']):02d}",
+                                                  **episode})
+                    return ET.tostring(root)
+        return None
+
+    def _plex_all_leaves(self, rating_key):
+        episodes = self.library.episodes.get(rating_key)
+        if episodes is None:
+            return None
+        root = _container(size=len(episodes))
+        for episode in episodes:
+            ET.SubElement(root, 'Video', {'type': 'episode', 'grandparentRatingKey': rating_key, **episode})
+        return ET.tostring(root)
+
+    def _sonarr_calendar(self, params):
+        start = params.get('start', [''])[0]
+        end = params.get('end', [''])[0]
+        include_series = params.get('includeSeries', ['false'])[0] == 'true'
+        series_by_id = {series['id']: series for series in self.library.series}
+        episodes = []
+        for episode in self.library.calendar:
+            if start and episode['airDate'] < start:
+                continue
+            if end and episode['airDate'] > end:
+                continue
+            if include_series:
+                episode = dict(episode, series=series_by_id.get(episode['seriesId'], {}))
+            episodes.append(episode)
+        return episodes
+
+    def _sonarr_episodes(self, params):
+        wanted = {int(value) for values in params.get('episodeIds', []) for value in values.split(',') if value}
+        include_series = params.get('includeSeries', ['false'])[0] == 'true'
+        series_by_id = {series['id']: series for series in self.library.series}
+        episodes = []
+        for episode in self.library.calendar:
+            if episode['id'] not in wanted:
+                continue
+            if include_series:
+                episode = dict(episode, series=series_by_id.get(episode['seriesId'], {}))
+            episodes.append(episode)
+        return episodes
+
+    def handle(self, handler):
+        """Dispatch a request and return (status, content_type, body, route)"""
+        parsed = urlparse(handler.path)
+        path = parsed.path
+        params = parse_qs(parsed.query)
+        wants_json = 'json' in handler.headers.get('Accept', '')
+
+        if path.startswith('/repos/'):
+            status, payload = self.github.handle(handler.command, path, getattr(handler, 'json_body', None))
+            route = 'github:' + re.sub(r'^/repos/[^/]+/[^/]+', '/repos/*/*', re.sub(r'/[0-9a-f]{40}$', '/*', path))
+            return status, 'application/json', json.dumps(payload).encode('utf-8'), route
+
+        if path == '/identity':
+            root = _container(machineIdentifier='upstream-stub', version='1.40.0')
+            return 200, 'application/xml', ET.tostring(root), 'plex:/identity'
+
+        if path == '/library/sections':
+            if wants_json:
+                body = self._cached('sections.json', self._plex_sections_json)
+                return 200, 'application/json', body, 'plex:/library/sections'
+            return 200, 'application/xml', self._cached('sections', self._plex_sections), 'plex:/library/sections'
+
+        match = re.fullmatch(r'/library/sections/(\w+)/all', path)
+        if match and params.get('type') == ['4'] and match.group(1) == SHOW_SECTION_KEY:
+            start = int(params.get('X-Plex-Container-Start', ['0'])[0])
+            size = int(params.get('X-Plex-Container-Size', ['1000000'])[0])
+            return 200, 'application/xml', self._plex_section_episodes(start, size), 'plex:/library/sections/*/all?type=4'
+        if match and 'X-Plex-Container-Size' in params and not wants_json:
+            start = int(params.get('X-Plex-Container-Start', ['0'])[0])
+            size = int(params['X-Plex-Container-Size'][0])
+            body = self._plex_section_page(match.group(1), start, size)
+            if body is None:
+                return 404, 'text/plain', b'Not Found', 'plex:/library/sections/*/all'
+            return 200, 'application/xml', body, 'plex:/library/sections/*/all'
+        if match:
+            if wants_json:
+                body = self._cached(('all.json', match.group(1)), lambda: self._plex_section_all_json(match.group(1)))
+                content_type = 'application/json'
+            else:
+                body = self._cached(('all', match.group(1)), lambda: self._plex_section_all(match.group(1)))
+                content_type = 'application/xml'
+            if body is None:
+                return 404, 'text/plain', b'Not Found', 'plex:/library/sections/*/all'
+            return 200, content_type, body, 'plex:/library/sections/*/all'
+
+        match = re.fullmatch(r'/library(?:/sections/(\w+))?/recentlyAdded', path)
+        if match:
+            start = int(params.get('X-Plex-Container-Start', ['0'])[0])
+            size = int(params.get('X-Plex-Container-Size', ['50'])[0])
+            items = self._plex_recent_items(match.group(1))[start:start + size]
+            route = 'plex:/library/sections/*/recentlyAdded' if match.group(1) else 'plex:/library/recentlyAdded'
+            if wants_json:
+                body = json.dumps({'MediaContainer': {
+                    'size': len(items),
+                    'Metadata': [_metadata_json(item) for item in items],
+                }}).encode('utf-8')
+                return 200, 'application/json', body, route
+            return 200, 'application/xml', self._plex_recent_xml(items), route
+
+        match = re.fullmatch(r'/library/metadata/(\w+)/(thumb|art)(?:/\d+)?', path)
+        if match:
+            route = f'plex:/library/metadata/*/{match.group(2)}'
+            if self.library.item(match.group(1)) is None:
+                return 404, 'text/plain', b'Not Found', route
+            return 200, 'image/jpeg', _fake_image(path, ORIGINAL_IMAGE_BYTES), route
+
+        if path == '/photo/:/transcode':
+            source = params.get('url', [''])[0]
+            match = re.fullmatch(r'/library/metadata/(\w+)/(thumb|art)(?:/\d+)?', source)
+            if not match or self.library.item(match.group(1)) is None:
+                return 404, 'text/plain', b'Not Found', 'plex:/photo/:/transcode'
+            width = int(params.get('width', ['300'])[0])
+            height = int(params.get('height', ['450'])[0])
+            size = min(ORIGINAL_IMAGE_BYTES, width * height // 4)
+            return 200, 'image/jpeg', _fake_image(f'{source}@{width}x{height}', size), 'plex:/photo/:/transcode'
+
+        match = re.fullmatch(r'/library/metadata/(\w+)(/children|/allLeaves)?', path)
+        if match:
+            rating_key, suffix = match.groups()
+            if suffix == '/children':
+                body, route = self._plex_children(rating_key), 'plex:/library/metadata/*/children'
+            elif suffix == '/allLeaves':
+                body, route = self._plex_all_leaves(rating_key), 'plex:/library/metadata/*/allLeaves'
+            else:
+                body, route = self._plex_metadata(rating_key), 'plex:/library/metadata/*'
+            if body is None:
+                return 404, 'text/plain', b'Not Found', route
+            return 200, 'application/xml', body, route
+
+        if path == '/api/v3/system/status':
+            body = json.dumps({'appName': 'Sonarr', 'version': '4.0.0'}).encode('utf-8')
+            return 200, 'application/json', body, 'sonarr:/api/v3/system/status'
+
+        if path == '/api/v3/series':
+            body = self._cached('series', lambda: json.dumps(self.library.series).encode('utf-8'))
+            return 200, 'application/json', body, 'sonarr:/api/v3/series'
+
+        if path == '/api/v3/calendar':
+            body = json.dumps(self._sonarr_calendar(params)).encode('utf-8')
+            return 200, 'application/json', body, 'sonarr:/api/v3/calendar'
+
+        if path == '/api/v3/episode':
+            body = json.dumps(self._sonarr_episodes(params)).encode('utf-8')
+            return 200, 'application/json', body, 'sonarr:/api/v3/episode'
+
+        return 404, 'text/plain', b'Not Found', 'unknown'
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                self.json_body = json.loads(self.rfile.read(length) or b'{}')
+                self.do_GET()
+
+            do_PATCH = do_POST
+
+            def do_GET(self):
+                if urlparse(self.path).path == '/:/websockets/notifications':
+                    if not stub.websocket_enabled or self.headers.get('Upgrade', '').lower() != 'websocket':
+                        self.send_response(503)
+                        self.send_header('Content-Length', '0')
+                        self.end_headers()
+                        return
+                    stub._serve_websocket(self)
+                    return
+                if stub.latency:
+                    time.sleep(stub.latency)
+                status, content_type, body, route = stub.handle(self)
+                stub._record(route, len(body))
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Run a local Plex/Sonarr stand-in')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=32400)
+    parser.add_argument('--movies', type=int, default=100)
+    parser.add_argument('--shows', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds of delay added to every response')
+    args = parser.parse_args()
+
+    library = SyntheticLibrary(movies=args.movies, shows=args.shows)
+    stub = UpstreamStub(library, host=args.host, port=args.port, latency=args.latency)
+    print(f"Upstream stand-in serving {args.movies} movies and {args.shows} shows at {stub.url}")
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(json.dumps(dict(stub.request_counts), indent=2))
+
+
+if __name__ == '__main__':
+    main()
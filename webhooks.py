@@ -0,0 +1,122 @@
+import json
+import logging
+import threading
+import time
+
+import metrics
+
+# Quiet period that ends a burst, and the longest a burst can hold changes back
+DEFAULT_DELAY = 2.0
+DEFAULT_MAX_DELAY = 30.0
+
+# Plex metadata types; seasons and episodes are applied to their show
+PLEX_TYPES = ('movie', 'show', 'season', 'episode')
+PLEX_LIBRARY_EVENTS = ('library.new',)
+# Sonarr events that change an episode's file, and ones that change a whole series
+SONARR_EPISODE_EVENTS = ('Download', 'EpisodeFileDelete')
+SONARR_SERIES_EVENTS = ('SeriesAdd', 'Rename')
+SONARR_SERIES_DELETE = 'SeriesDelete'
+
+
+def plex_webhook_payload(request):
+    """Plex posts multipart/form-data with the event JSON in a 'payload' field"""
+    payload = request.form.get('payload')
+    if payload is not None:
+        return json.loads(payload)
+    return request.get_json(silent=True) or {}
+
+
+def plex_webhook_changes(payload):
+    """{rating key: type} of library items a Plex webhook reports as added or changed,
+    with seasons and episodes resolved to their show"""
+    if payload.get('event') not in PLEX_LIBRARY_EVENTS:
+        return {}
+    metadata = payload.get('Metadata') or {}
+    kind = metadata.get('type')
+    if kind not in PLEX_TYPES:
+        return {}
+    if kind == 'episode':
+        rating_key = metadata.get('grandparentRatingKey') or metadata.get('ratingKey')
+    elif kind == 'season':
+        rating_key = metadata.get('parentRatingKey') or metadata.get('ratingKey')
+    else:
+        rating_key = metadata.get('ratingKey')
+    if not rating_key:
+        return {}
+    return {str(rating_key): 'show' if kind in ('season', 'episode') else kind}
+
+
+def sonarr_webhook_changes(payload):
+    """Changes a Sonarr webhook reports: {('episode', id): 'changed'} for imported or deleted
+    episode files, {('series', id): 'changed' or 'removed'} for added, renamed or deleted series"""
+    event = payload.get('eventType')
+    series_id = (payload.get('series') or {}).get('id')
+    if event in SONARR_EPISODE_EVENTS:
+        return {('episode', episode['id']): 'changed' for episode in payload.get('episodes') or []
+                if episode.get('id') is not None}
+    if event in SONARR_SERIES_EVENTS and series_id is not None:
+        return {('series', series_id): 'changed'}
+    if event == SONARR_SERIES_DELETE and series_id is not None:
+        return {('series', series_id): 'removed'}
+    return {}
+
+
+class EventBatcher:
+    """Coalesces changes by key and hands them to apply() as one batch once no new change has
+    arrived for `delay` seconds, or `max_delay` seconds after the first, so a burst such as a
+    season pack import is applied once. A later change to the same key replaces an earlier one."""
+
+    def __init__(self, name, apply, delay=DEFAULT_DELAY, max_delay=DEFAULT_MAX_DELAY):
+        self.name = name
+        self.apply = apply
+        self.delay = delay
+        self.max_delay = max_delay
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.stats = {'received': 0, 'coalesced': 0, 'batches': 0}
+        self._timer = None
+        self._first_at = None
+
+    def add(self, changes):
+        """Queue changes; returns how many are now waiting"""
+        with self.lock:
+            for key, change in changes.items():
+                self.stats['received'] += 1
+                if key in self.pending:
+                    self.stats['coalesced'] += 1
+                self.pending[key] = change
+            if not self.pending:
+                return 0
+            now = time.monotonic()
+            if self._first_at is None:
+                self._first_at = now
+            wait = min(self.delay, max(0.0, self._first_at + self.max_delay - now))
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(wait, self.flush)
+            self._timer.name = f'webhook-{self.name}'
+            self._timer.daemon = True
+            self._timer.start()
+            return len(self.pending)
+
+    def flush(self):
+        """Apply everything pending now"""
+        with self.lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            batch, self.pending = self.pending, {}
+            self._first_at = None
+        if not batch:
+            return
+        self.stats['batches'] += 1
+        started = time.perf_counter()
+        success = False
+        try:
+            self.apply(batch)
+            success = True
+            logging.info(f"Applied {len(batch)} {self.name} webhook change(s)")
+        except Exception as e:
+            logging.error(f"Error applying {self.name} webhook changes: {str(e)}")
+        finally:
+            metrics.record_job(f'webhook_{self.name}', time.perf_counter() - started, success)